@@ -1,56 +1,46 @@
+import itertools
 import os
 import requests
-from bs4 import BeautifulSoup
-from google.ads.googleads.client import GoogleAdsClient
 from google.ads.googleads.errors import GoogleAdsException
-from google.oauth2.credentials import Credentials
-
-# Set up environment variables for Google Ads API and OpenAI API
-DEVELOPER_TOKEN = os.getenv("DEVELOPER_TOKEN")
-GCLIENT_ID = os.getenv("GCLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-REFRESH_TOKEN = os.getenv("GCP_REFRESH_TOKEN")
-ACCOUNT_ID = os.getenv("ACCOUNT_ID")
-MANAGER_CUSTOMER_ID = os.getenv("MANAGER_CUSTOMER_ID")
+
+from contentindex import ContentIndex
+from htmlcleaner import clean_html
+from httpcache import cached_get
+from keywordideas import dedupe_keyword_ideas
+from keywordideaservice import get_default_idea_service
+from rsagenerator import generate_structured_responsive_search_ad
+from rsaparser import format_responsive_search_ad
+from sitemapdiscovery import SitemapDiscovery, is_sitemap
+
+# Set up environment variables for the OpenAI API
 API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Default location and language settings for keyword generation
-_DEFAULT_LOCATION_IDS = ["2840"]  # United States
-_DEFAULT_LANGUAGE_ID = "1000"  # English
+_SITEMAP_BATCH_SIZE = 100  # Sitemap pages whose keyword ideas are requested together
 EXCLUDE_KEYWORDS = [
     "amazon",
     "reddit",
 ]  # Examples of keywords to exclude from suggestions
 
 
-def create_google_ads_client():
-    """Initializes and returns the Google Ads API client."""
-    credentials = Credentials.from_authorized_user_info(
-        {
-            "client_id": GCLIENT_ID,
-            "client_secret": CLIENT_SECRET,
-            "refresh_token": REFRESH_TOKEN,
-            "token_uri": "https://oauth2.googleapis.com/token",
-        }
-    )
-    return GoogleAdsClient(
-        credentials=credentials,
-        developer_token=DEVELOPER_TOKEN,
-        login_customer_id=MANAGER_CUSTOMER_ID,
-    )
-
-
 def clean_description(html_content):
-    """Cleans HTML content and returns readable text."""
-    soup = BeautifulSoup(html_content, "html.parser")
-    cleaned_text = soup.get_text()
-    return cleaned_text
+    """
+    Cleans HTML content and returns readable text.
+
+    The text is the same as BeautifulSoup's `get_text()` of the page except for
+    whitespace: text fragments are stripped and joined with single spaces. The
+    raw `get_text()` glued words from neighbouring elements together (e.g.
+    "Weight1.2 kg") and kept the page's indentation, which only costs prompt
+    tokens, and its whitespace-only strings cannot be reproduced by the faster
+    engines, whose parsers build those nodes differently. Script, style and
+    template contents are left out, as get_text() already does.
+    """
+    return clean_html(html_content, remove_tags=("script", "style"))
 
 
 def fetch_and_clean_url_content(url):
     """Fetches the URL content, cleans it, and returns the text."""
     try:
-        response = requests.get(url)
+        response = cached_get(url)
         response.raise_for_status()  # Raise an exception for HTTP errors
         cleaned_text = clean_description(response.text)
         return cleaned_text
@@ -59,37 +49,24 @@ def fetch_and_clean_url_content(url):
         return ""
 
 
-def generate_keyword_ideas(url):
-    """Generates keyword ideas from a URL using the Google Ads API."""
-    client = create_google_ads_client()
-    keyword_plan_idea_service = client.get_service("KeywordPlanIdeaService")
-    request = client.get_type("GenerateKeywordIdeasRequest")
-
-    # Set up the request parameters
-    request.customer_id = ACCOUNT_ID
-    request.language = client.get_service("GoogleAdsService").language_constant_path(
-        _DEFAULT_LANGUAGE_ID
-    )
-    for location_id in _DEFAULT_LOCATION_IDS:
-        request.geo_target_constants.append(
-            client.get_service("GeoTargetConstantService").geo_target_constant_path(
-                location_id
-            )
-        )
-    request.include_adult_keywords = False
-    request.keyword_plan_network = client.enums.KeywordPlanNetworkEnum.GOOGLE_SEARCH
-    request.url_seed.url = url
+def _filter_keyword_ideas(raw_ideas):
+    """Drops excluded terms and merges ideas that differ only in case, plurals or word order."""
+    return [
+        {
+            "text": idea["text"],
+            "avg_monthly_searches": idea["avg_monthly_searches"],
+        }
+        for idea in dedupe_keyword_ideas(raw_ideas, exclude=EXCLUDE_KEYWORDS)
+    ]
+
 
+def generate_keyword_ideas(url, idea_service=None):
+    """Generates keyword ideas from a URL using the Google Ads API."""
+    idea_service = idea_service or get_default_idea_service()
+    if not idea_service:
+        return []
     try:
-        response = keyword_plan_idea_service.generate_keyword_ideas(request=request)
-        keyword_ideas = [
-            {
-                "text": idea.text,
-                "avg_monthly_searches": idea.keyword_idea_metrics.avg_monthly_searches,
-            }
-            for idea in response.results
-            if not any(exclude_word in idea.text for exclude_word in EXCLUDE_KEYWORDS)
-        ]
+        keyword_ideas = _filter_keyword_ideas(idea_service.generate(url=url))
 
         # Print out the keywords (optional)
         print("Generated Keywords:")
@@ -104,78 +81,94 @@ def generate_keyword_ideas(url):
         return []
 
 
-def generate_responsive_search_ad(description, api_key, keyword_ideas):
-    """Generates responsive search ad suggestions and a page title using GPT-4o."""
-    keywords = [idea["text"] for idea in keyword_ideas]
-    keyword_list = ", ".join(keywords)
-
-    # Craft a detailed prompt for GPT-4o
-    prompt = (
-        f"Generate SEO-optimized Responsive Search Ad content using the provided keywords, emphasizing the most relevant keywords. "
-        f"Ensure that the generated content strictly adheres to the following character limits, including spaces and punctuation:\n"
-        f"1. Headlines: Create 15 brief headlines, each no longer than 29 characters, including spaces and punctuation. Do not include numbering; just list each headline as a separate sentence.\n"
-        f"2. Descriptions: Create 4 descriptions, each no longer than 89 characters, including spaces and punctuation. Again, do not include numbering; just list each description as a separate sentence.\n"
-        f"3. Broad Match Keywords: Recommend broad match keywords from the list.\n"
-        f"4. Phrase Match Keywords: Recommend phrase match keywords from the list.\n"
-        f"5. Exact Match Keywords: Recommend exact match keywords from the list.\n"
-        f"6. Page Title: Suggest an SEO-optimized page title no longer than 60 characters, including spaces and punctuation, using the keywords.\n"
-        f"\nKeywords: {keyword_list}\n\nProduct Description: {description}"
-    )
+def generate_keyword_ideas_bulk(seeds, idea_service=None, max_workers=4):
+    """Generates filtered keyword ideas for many URL or keyword seeds, returned in seed order."""
+    idea_service = idea_service or get_default_idea_service()
+    if not idea_service:
+        return [[] for _ in seeds]
+    return [
+        _filter_keyword_ideas(raw_ideas)
+        for raw_ideas in idea_service.generate_many(seeds, max_workers=max_workers)
+    ]
 
-    headers = {"Authorization": f"Bearer {api_key}"}
-    data = {
-        "model": "gpt-4o",
-        "messages": [
-            {
-                "role": "system",
-                "content": "Generate responsive search ad content and a page title based on the provided description and keywords.",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        "temperature": 0.9,
-        "max_tokens": 1500,
-    }
 
-    try:
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions", json=data, headers=headers
-        )
-        response.raise_for_status()
-        content = response.json()
-        message_content = (
-            content.get("choices", [{}])[0].get("message", {}).get("content", "")
+def process_url(url, content_index, keyword_ideas=None):
+    """
+    Generates and prints ad suggestions for one page, returning True on success.
+
+    `keyword_ideas` are the page's ideas when they were already requested, e.g.
+    by generate_keyword_ideas_bulk; otherwise they are generated here.
+    """
+    # Fetch and clean URL content
+    cleaned_content = fetch_and_clean_url_content(url)
+    stored = content_index.lookup(url, cleaned_content) if cleaned_content else None
+    if not cleaned_content:
+        print("Failed to fetch and clean URL content.")
+        return False
+    if stored:
+        # The page text is unchanged since the last run, so reuse the previous output
+        print(
+            "Page content is unchanged since the last run; reusing stored ad suggestions."
         )
-        return message_content
-    except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP error occurred: {http_err} - {http_err.response.text}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        print("Responsive Search Ad Suggestions and Page Title:")
+        print(stored["ad_suggestions"])
+        return True
 
-    return ""
+    # Generate keyword ideas from URL
+    if keyword_ideas is None:
+        keyword_ideas = generate_keyword_ideas(url)
+    if not keyword_ideas:
+        print("Failed to generate keyword ideas.")
+        return False
+
+    # Generate the ad as JSON and repair any headline or description that breaks
+    # the Google Ads limits, so the printed ad can be pushed as it is
+    sections = generate_structured_responsive_search_ad(
+        cleaned_content, API_KEY, keyword_ideas
+    )
+    ad_suggestions = format_responsive_search_ad(sections)
+    if not ad_suggestions:
+        print("Failed to generate responsive search ad suggestions and page title.")
+        return False
+    print("Responsive Search Ad Suggestions and Page Title:")
+    print(ad_suggestions)
+    content_index.store(
+        url,
+        cleaned_content,
+        {"keyword_ideas": keyword_ideas, "ad_suggestions": ad_suggestions},
+    )
+    return True
+
+
+def process_sitemap(url, content_index):
+    """
+    Generates ad suggestions for every new or changed page of a sitemap.
+
+    Pages are taken in batches of _SITEMAP_BATCH_SIZE, and the keyword ideas of
+    each batch are requested in parallel through the shared idea service.
+    Only pages that were processed successfully are recorded as done.
+    """
+    discovery = SitemapDiscovery()
+    pages = discovery.discover(url)
+    processed = []
+    while True:
+        batch = list(itertools.islice(pages, _SITEMAP_BATCH_SIZE))
+        if not batch:
+            break
+        for page_url, keyword_ideas in zip(batch, generate_keyword_ideas_bulk(batch)):
+            if process_url(page_url, content_index, keyword_ideas):
+                processed.append(page_url)
+    discovery.commit(processed)
+    return processed
 
 
 if __name__ == "__main__":
-    # Get the URL to process from the user (or you can hardcode it here)
-    url = input("Enter the URL to process: ")
+    # Get the URL or sitemap to process from the user (or you can hardcode it here)
+    url = input("Enter the URL or sitemap to process: ")
 
-    # Fetch and clean URL content
-    cleaned_content = fetch_and_clean_url_content(url)
-    if not cleaned_content:
-        print("Failed to fetch and clean URL content.")
+    content_index = ContentIndex()
+    if is_sitemap(url):
+        # Only pages that are new or changed since the last run are processed
+        process_sitemap(url, content_index)
     else:
-        # Generate keyword ideas from URL
-        keyword_ideas = generate_keyword_ideas(url)
-        if not keyword_ideas:
-            print("Failed to generate keyword ideas.")
-        else:
-            # Generate responsive search ad suggestions and a page title using GPT-4
-            ad_suggestions = generate_responsive_search_ad(
-                cleaned_content, API_KEY, keyword_ideas
-            )
-            if ad_suggestions:
-                print("Responsive Search Ad Suggestions and Page Title:")
-                print(ad_suggestions)
-            else:
-                print(
-                    "Failed to generate responsive search ad suggestions and page title."
-                )
+        process_url(url, content_index)
@@ -1,31 +1,256 @@
+import os
+import queue
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from urllib.parse import urlsplit
+
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from htmlcleaner import clean_html
+from httpcache import cached_get
+
+# Defaults for batch crawling
+_DEFAULT_MAX_WORKERS = 32  # Total concurrent requests across all hosts
+_DEFAULT_PER_HOST_LIMIT = 4  # Concurrent requests allowed against a single origin
+_DEFAULT_TIMEOUT = 30  # Seconds to wait for a page before giving up
 
 
-def fetch_and_clean_url_content(url):
+def create_session(per_host_limit=_DEFAULT_PER_HOST_LIMIT):
     """
-    Fetches content from the specified URL and cleans it using BeautifulSoup.
+    Creates a requests session with pooled keep-alive connections.
+
+    Args:
+        per_host_limit (int): The number of connections to keep open per host.
+
+    Returns:
+        requests.Session: A session that reuses connections between requests.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=100, pool_maxsize=per_host_limit)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def clean_html_content(html_content):
+    """
+    Cleans raw HTML and returns the readable text.
+
+    Scripts, styles, navigation, headers and footers are dropped. The work is done
+    by the fastest installed engine in htmlcleaner (selectolax, lxml or
+    BeautifulSoup), which all produce the same text.
+
+    Args:
+        html_content (bytes or str): The HTML of the page.
+
+    Returns:
+        str: The cleaned text content of the page.
+    """
+    return clean_html(html_content)
+
+
+def fetch_url_content(url, session=None, timeout=None):
+    """
+    Fetches the raw HTML of the specified URL without cleaning it.
 
     Args:
         url (str): The URL of the product page.
+        session (requests.Session, optional): A session to reuse connections from.
+        timeout (float, optional): Seconds to wait for the server before giving up.
 
     Returns:
-        str: The cleaned text content of the page, or an empty string if an error occurs.
+        bytes: The raw body of the page, or empty bytes if an error occurs.
     """
     try:
-        response = requests.get(url)
+        response = cached_get(url, session=session, timeout=timeout)
         response.raise_for_status()  # Raise an exception for bad HTTP status codes
+        return response.content
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching URL content: {e}")
+        return b""
+
+
+def fetch_and_clean_url_content(url, session=None, timeout=None):
+    """
+    Fetches content from the specified URL and cleans it.
 
-        soup = BeautifulSoup(response.content, "html.parser")
+    Pages are read through the on-disk HTTP cache, so unchanged pages are served
+    from disk or revalidated with a conditional GET.
 
-        # Remove unwanted elements like scripts, styles, and navigation
-        for script in soup(["script", "style", "nav", "header", "footer"]):
-            script.extract()
+    Args:
+        url (str): The URL of the product page.
+        session (requests.Session, optional): A session to reuse connections from.
+        timeout (float, optional): Seconds to wait for the server before giving up.
 
-        # Get the cleaned text, joining elements with spaces and stripping extra whitespace
-        cleaned_text = soup.get_text(separator=" ", strip=True)
-        return cleaned_text
+    Returns:
+        str: The cleaned text content of the page, or an empty string if an error occurs.
+    """
+    try:
+        response = cached_get(url, session=session, timeout=timeout)
+        response.raise_for_status()  # Raise an exception for bad HTTP status codes
+
+        return clean_html_content(response.content)
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching or cleaning URL content: {e}")
         return ""
+
+
+def _map_urls_concurrently(
+    fetch_func, urls, max_workers, per_host_limit, session, timeout
+):
+    """
+    Applies fetch_func(url, session, timeout) to many URLs on a bounded thread pool.
+
+    No more than `per_host_limit` calls run against any single host, and the input
+    is consumed lazily so very large catalogs never sit in memory.
+
+    Yields:
+        tuple: A (url, result) pair in completion order.
+    """
+    session = session or create_session(per_host_limit)
+    host_semaphores = {}
+    host_lock = threading.Lock()
+
+    def get_host_semaphore(url):
+        host = urlsplit(url).netloc.lower()
+        with host_lock:
+            if host not in host_semaphores:
+                host_semaphores[host] = threading.BoundedSemaphore(per_host_limit)
+            return host_semaphores[host]
+
+    def fetch(url):
+        with get_host_semaphore(url):
+            return url, fetch_func(url, session=session, timeout=timeout)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for url in urls:
+            pending.add(executor.submit(fetch, url))
+
+            # Keep a bounded window of queued work instead of submitting everything
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def fetch_and_clean_urls(
+    urls,
+    max_workers=_DEFAULT_MAX_WORKERS,
+    per_host_limit=_DEFAULT_PER_HOST_LIMIT,
+    session=None,
+    timeout=_DEFAULT_TIMEOUT,
+):
+    """
+    Fetches and cleans many URLs concurrently, yielding results as they finish.
+
+    URLs are fetched on a bounded thread pool that shares one pooled session, and
+    no more than `per_host_limit` requests are in flight against any single host.
+    The input is consumed lazily, so very large catalogs never sit in memory.
+
+    Args:
+        urls (iterable of str): The URLs of the product pages.
+        max_workers (int): The total number of concurrent requests.
+        per_host_limit (int): The number of concurrent requests allowed per host.
+        session (requests.Session, optional): A session to reuse connections from.
+        timeout (float): Seconds to wait for each page before giving up.
+
+    Yields:
+        tuple: A (url, cleaned_text) pair in completion order. cleaned_text is an
+        empty string if the page could not be fetched.
+    """
+    yield from _map_urls_concurrently(
+        fetch_and_clean_url_content, urls, max_workers, per_host_limit, session, timeout
+    )
+
+
+def fetch_and_clean_urls_parallel(
+    urls,
+    clean_workers=None,
+    max_pending=None,
+    max_workers=_DEFAULT_MAX_WORKERS,
+    per_host_limit=_DEFAULT_PER_HOST_LIMIT,
+    session=None,
+    timeout=_DEFAULT_TIMEOUT,
+):
+    """
+    Fetches and cleans many URLs as two pipeline stages, cleaning on all CPU cores.
+
+    The fetch stage runs on a thread pool like fetch_and_clean_urls(), but hands
+    the raw HTML bytes to a ProcessPoolExecutor instead of cleaning them under the
+    GIL. The stages are connected by a bounded queue of at most `max_pending`
+    pages, so fetching pauses when cleaning falls behind and memory stays flat.
+
+    Args:
+        urls (iterable of str): The URLs of the product pages.
+        clean_workers (int, optional): The number of cleaning processes. Defaults
+            to the number of CPU cores.
+        max_pending (int, optional): The number of fetched pages allowed to wait
+            for cleaning. Defaults to four per cleaning process.
+        max_workers (int): The total number of concurrent requests.
+        per_host_limit (int): The number of concurrent requests allowed per host.
+        session (requests.Session, optional): A session to reuse connections from.
+        timeout (float): Seconds to wait for each page before giving up.
+
+    Yields:
+        tuple: A (url, cleaned_text) pair. cleaned_text is an empty string if the
+        page could not be fetched.
+    """
+    clean_workers = clean_workers or os.cpu_count() or 1
+    pages = queue.Queue(maxsize=max_pending or clean_workers * 4)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        # Block while the queue is full, but give up once the consumer has stopped
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    with ProcessPoolExecutor(max_workers=clean_workers) as pool:
+
+        def fetch_stage():
+            try:
+                for url, html in _map_urls_concurrently(
+                    fetch_url_content,
+                    urls,
+                    max_workers,
+                    per_host_limit,
+                    session,
+                    timeout,
+                ):
+                    future = pool.submit(clean_html, html) if html else None
+                    if not put((url, future)):
+                        break
+            finally:
+                put(done)
+
+        fetcher = threading.Thread(target=fetch_stage, daemon=True)
+        fetcher.start()
+        try:
+            while True:
+                item = pages.get()
+                if item is done:
+                    break
+                url, future = item
+                yield url, future.result() if future else ""
+        finally:
+            stop.set()
+            fetcher.join()
@@ -0,0 +1,284 @@
+import itertools
+import json
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_API_PREFIX = "/v1"
+
+
+def _echo_reply(body):
+    """Answers a chat completion request with the text of its last message."""
+    return f"Reply to: {body['messages'][-1]['content']}"
+
+
+def _chat_completion(content):
+    return {
+        "object": "chat.completion",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"total_tokens": len(content.split())},
+    }
+
+
+def _chat_completion_events(content, chunk_size=8):
+    """Returns `content` as a server-sent event stream of chat completion chunks."""
+    events = [
+        {
+            "object": "chat.completion.chunk",
+            "choices": [{"delta": {"role": "assistant"}}],
+        }
+    ]
+    for start in range(0, len(content), chunk_size):
+        delta = {"content": content[start : start + chunk_size]}
+        events.append(
+            {"object": "chat.completion.chunk", "choices": [{"delta": delta}]}
+        )
+    lines = [f"data: {json.dumps(event)}\n\n" for event in events]
+    return ("".join(lines) + "data: [DONE]\n\n").encode("utf-8")
+
+
+class FakeBatchServer:
+    """
+    A local stand-in for the OpenAI /files, /batches and /chat/completions endpoints.
+
+    Uploaded JSONL files are kept in memory. A batch reports "in_progress" for
+    `polls_before_complete` status checks, then "completed" with an output file
+    holding one response per input line. `fail_ids` lists custom_ids that get
+    an error response instead. The `calls` counter records how many uploads,
+    batch creations, status checks, downloads and chat completions were made.
+
+    Chat completions are answered with `respond`, as JSON or, for `stream: true`
+    requests, as server-sent events. `chat_failures` lists status codes (e.g.
+    429 or 503) returned, in order, before the next requests succeed; they
+    carry a Retry-After header of `retry_after` seconds.
+
+    Usage:
+        with FakeBatchServer() as server:
+            job = BatchJob(state_dir, "test-key", base_url=server.base_url, poll_interval=0)
+            results = job.run(batch_requests)
+    """
+
+    def __init__(
+        self,
+        polls_before_complete=1,
+        respond=_echo_reply,
+        fail_ids=(),
+        chat_failures=(),
+        retry_after="0",
+        port=0,
+    ):
+        self.polls_before_complete = polls_before_complete
+        self.respond = respond
+        self.fail_ids = set(fail_ids)
+        self.chat_failures = list(chat_failures)
+        self.retry_after = retry_after
+        self.files = {}
+        self.batches = {}
+        self.chat_requests = []
+        self.calls = {"upload": 0, "create": 0, "poll": 0, "download": 0, "chat": 0}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{_API_PREFIX}"
+
+    def start(self):
+        """Serves requests on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serves requests on the calling thread until interrupted."""
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _new_id(self, prefix):
+        with self._lock:
+            return f"{prefix}-{next(self._ids)}"
+
+    def _output_file(self, input_file_id):
+        """Builds the batch output file for an uploaded input file."""
+        lines = []
+        for line in self.files[input_file_id].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            custom_id = request["custom_id"]
+            if custom_id in self.fail_ids:
+                response = {
+                    "status_code": 500,
+                    "body": {"error": {"message": "Fake failure"}},
+                }
+            else:
+                response = {
+                    "status_code": 200,
+                    "body": _chat_completion(self.respond(request["body"])),
+                }
+            lines.append(
+                json.dumps(
+                    {
+                        "id": f"req-{custom_id}",
+                        "custom_id": custom_id,
+                        "response": response,
+                    }
+                )
+            )
+        file_id = self._new_id("file")
+        self.files[file_id] = ("\n".join(lines) + "\n").encode("utf-8")
+        return file_id
+
+    def _upload(self, handler):
+        """Stores the "file" part of a multipart upload."""
+        length = int(handler.headers.get("Content-Length", 0))
+        header = f"Content-Type: {handler.headers['Content-Type']}\r\n\r\n".encode()
+        message = BytesParser(policy=HTTP).parsebytes(
+            header + handler.rfile.read(length)
+        )
+        for part in message.iter_parts():
+            if part.get_param("name", header="content-disposition") == "file":
+                file_id = self._new_id("file")
+                self.files[file_id] = part.get_payload(decode=True)
+                self.calls["upload"] += 1
+                return 200, {"id": file_id, "object": "file", "purpose": "batch"}
+        return 400, {"error": {"message": "Missing file"}}
+
+    def _create_batch(self, handler):
+        length = int(handler.headers.get("Content-Length", 0))
+        body = json.loads(handler.rfile.read(length))
+        if body.get("input_file_id") not in self.files:
+            return 404, {"error": {"message": "Unknown input file"}}
+        batch_id = self._new_id("batch")
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "status": "in_progress",
+            "input_file_id": body["input_file_id"],
+            "output_file_id": None,
+            "error_file_id": None,
+            "polls": 0,
+        }
+        self.calls["create"] += 1
+        return 200, self._batch_view(batch_id)
+
+    def _batch_view(self, batch_id):
+        batch = self.batches[batch_id]
+        total = len(self.files[batch["input_file_id"]].splitlines())
+        done = total if batch["status"] == "completed" else 0
+        view = {key: value for key, value in batch.items() if key != "polls"}
+        view["request_counts"] = {"total": total, "completed": done, "failed": 0}
+        return view
+
+    def _poll_batch(self, batch_id):
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return 404, {"error": {"message": "Unknown batch"}}
+        self.calls["poll"] += 1
+        batch["polls"] += 1
+        if (
+            batch["status"] != "completed"
+            and batch["polls"] > self.polls_before_complete
+        ):
+            batch["status"] = "completed"
+            batch["output_file_id"] = self._output_file(batch["input_file_id"])
+        return 200, self._batch_view(batch_id)
+
+    def _chat(self, handler):
+        """Answers a chat completion, after any scripted failures."""
+        length = int(handler.headers.get("Content-Length", 0))
+        body = json.loads(handler.rfile.read(length))
+        with self._lock:
+            self.calls["chat"] += 1
+            self.chat_requests.append(body)
+            status = self.chat_failures.pop(0) if self.chat_failures else None
+        if status is not None:
+            handler.send_response(status)
+            handler.send_header("Retry-After", self.retry_after)
+            payload = json.dumps({"error": {"message": "Fake failure"}}).encode()
+            handler.send_header("Content-Length", str(len(payload)))
+            handler.end_headers()
+            handler.wfile.write(payload)
+            return
+
+        content = self.respond(body)
+        if not body.get("stream"):
+            handler._send(200, _chat_completion(content))
+            return
+        payload = _chat_completion_events(content)
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # Keep test output quiet
+
+            def _send(self, status, body):
+                payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _path(self):
+                path = self.path.split("?", 1)[0]
+                if path.startswith(_API_PREFIX):
+                    path = path[len(_API_PREFIX) :]
+                return path.strip("/").split("/")
+
+            def do_POST(self):
+                path = self._path()
+                if path == ["files"]:
+                    self._send(*server._upload(self))
+                elif path == ["batches"]:
+                    self._send(*server._create_batch(self))
+                elif path == ["chat", "completions"]:
+                    server._chat(self)
+                else:
+                    self._send(404, {"error": {"message": "Not found"}})
+
+            def do_GET(self):
+                path = self._path()
+                if len(path) == 2 and path[0] == "batches":
+                    self._send(*server._poll_batch(path[1]))
+                elif len(path) == 3 and path[0] == "files" and path[2] == "content":
+                    if path[1] not in server.files:
+                        self._send(404, {"error": {"message": "Unknown file"}})
+                        return
+                    server.calls["download"] += 1
+                    self._send(200, server.files[path[1]])
+                else:
+                    self._send(404, {"error": {"message": "Not found"}})
+
+        return Handler
+
+
+if __name__ == "__main__":
+    # Point OPENAI_BASE_URL at this server to try the scripts without an API key
+    server = FakeBatchServer(port=8000)
+    print(f"Fake OpenAI API listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,147 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from resourceindex import quote_gaql
+
+# Default location of the geo target cache
+_DEFAULT_CACHE_PATH = os.getenv(
+    "GEO_TARGET_CACHE_PATH", os.path.join(".cache", "geotargets.sqlite3")
+)
+_DEFAULT_TTL = 30 * 24 * 60 * 60  # Geo target constants change rarely
+
+
+class GeoTargetResolver:
+    """
+    Resolves locations to geo target constant resource names, with a persistent cache.
+
+    Lookups are keyed by country code, target type (Country, State, City, ...)
+    and name, and stored in SQLite so later runs resolve them without a query.
+    The resolver also remembers which locations each campaign targets, so
+    set_geo_targeting can skip campaigns that are already targeted.
+
+    Usage:
+        resolver = GeoTargetResolver(client, customer_id)
+        resolver.resolve("US")  # The country itself
+        resolver.resolve("US", name="Arizona", target_type="State")
+    """
+
+    def __init__(self, client, customer_id, path=_DEFAULT_CACHE_PATH, ttl=_DEFAULT_TTL):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.client = client
+        self.customer_id = customer_id
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._campaign_locations = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS geo_targets (
+                key TEXT PRIMARY KEY,
+                resource_names TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """)
+        self._connection.commit()
+
+    def resolve(self, country_code, name=None, target_type=None):
+        """
+        Returns the geo target constants matching a location.
+
+        Args:
+            country_code (str): The two-letter country code, e.g. "US".
+            name (str, optional): The location name, e.g. "Arizona". Without a
+                name, the country itself is resolved.
+            target_type (str, optional): The target type, e.g. "State" or "City".
+
+        Returns:
+            list of str: The geo target constant resource names.
+        """
+        if not name:
+            target_type = target_type or "Country"
+        key = "|".join(
+            [country_code.upper(), (target_type or "").lower(), (name or "").lower()]
+        )
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT resource_names, updated_at FROM geo_targets WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row and time.time() - row[1] < self.ttl:
+            return json.loads(row[0])
+
+        conditions = [
+            f"geo_target_constant.country_code = {quote_gaql(country_code.upper())}",
+            "geo_target_constant.status = 'ENABLED'",
+        ]
+        if target_type:
+            conditions.append(
+                f"geo_target_constant.target_type = {quote_gaql(target_type)}"
+            )
+        if name:
+            conditions.append(f"geo_target_constant.name = {quote_gaql(name)}")
+        query = (
+            "SELECT geo_target_constant.resource_name FROM geo_target_constant WHERE "
+            + " AND ".join(conditions)
+        )
+        ga_service = self.client.get_service("GoogleAdsService")
+        response = ga_service.search(customer_id=self.customer_id, query=query)
+        resource_names = [row.geo_target_constant.resource_name for row in response]
+
+        if resource_names:
+            with self._lock:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO geo_targets (key, resource_names, updated_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(resource_names), time.time()),
+                )
+                self._connection.commit()
+        return resource_names
+
+    def campaign_locations(self, campaign_id):
+        """
+        Returns the geo target constants a campaign already targets.
+
+        The criteria are queried once per campaign and then kept in memory.
+
+        Args:
+            campaign_id (str): The campaign ID.
+
+        Returns:
+            set of str: The targeted geo target constant resource names.
+        """
+        campaign_id = str(campaign_id)
+        with self._lock:
+            locations = self._campaign_locations.get(campaign_id)
+        if locations is not None:
+            return locations
+
+        query = f"""
+        SELECT
+            campaign_criterion.location.geo_target_constant
+        FROM
+            campaign_criterion
+        WHERE
+            campaign.id = {int(campaign_id)}
+            AND campaign_criterion.type = 'LOCATION'
+            AND campaign_criterion.negative = FALSE
+        """
+        ga_service = self.client.get_service("GoogleAdsService")
+        response = ga_service.search(customer_id=self.customer_id, query=query)
+        locations = {
+            row.campaign_criterion.location.geo_target_constant for row in response
+        }
+        with self._lock:
+            self._campaign_locations[campaign_id] = locations
+        return locations
+
+    def add_campaign_locations(self, campaign_id, locations):
+        """Records locations that were added to a campaign."""
+        with self._lock:
+            self._campaign_locations.setdefault(str(campaign_id), set()).update(
+                locations
+            )
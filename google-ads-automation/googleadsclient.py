@@ -0,0 +1,156 @@
+import datetime
+import os
+import threading
+
+import requests
+from google.ads.googleads.client import GoogleAdsClient
+from google.oauth2.credentials import Credentials
+
+from adsscheduler import ScheduledService, get_default_scheduler
+
+# None uses the newest API version the installed google-ads library supports
+API_VERSION = os.getenv("GOOGLE_ADS_API_VERSION") or None
+_TOKEN_URL = "https://www.googleapis.com/oauth2/v4/token"
+_REFRESH_MARGIN = datetime.timedelta(minutes=5)  # Refresh this long before expiry
+
+# Credentials and clients are shared across threads and cached per
+# (developer token, login customer) so each worker only pays for OAuth once.
+_lock = threading.Lock()
+_credentials = {}
+_clients = {}
+
+
+class _ScheduledGoogleAdsClient(GoogleAdsClient):
+    """A GoogleAdsClient whose service calls are paced and retried by the shared AdsScheduler."""
+
+    def get_service(self, name, *args, **kwargs):
+        service = super().get_service(name, *args, **kwargs)
+        return ScheduledService(service, get_default_scheduler(), self.developer_token)
+
+
+def _utcnow():
+    # google-auth compares expiry against naive UTC datetimes
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _resolve_account(developer_token, login_customer_id):
+    developer_token = developer_token or os.getenv("DEVELOPER_TOKEN")
+    login_customer_id = login_customer_id or os.getenv("MANAGER_CUSTOMER_ID")
+    if login_customer_id:
+        login_customer_id = login_customer_id.replace("-", "")  # Ensure no dashes
+    return developer_token, login_customer_id
+
+
+def _get_credentials(key):
+    """Returns the shared OAuth credentials for an account key. Call with _lock held."""
+    credentials = _credentials.get(key)
+    if credentials is None:
+        credentials = Credentials(
+            token=None,
+            refresh_token=os.getenv("GCP_REFRESH_TOKEN"),
+            token_uri=_TOKEN_URL,
+            client_id=os.getenv("GCLIENT_ID"),
+            client_secret=os.getenv("CLIENT_SECRET"),
+        )
+        _credentials[key] = credentials
+    return credentials
+
+
+def _refresh_access_token(credentials):
+    """Exchanges the refresh token for a new access token. Call with _lock held."""
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    data = {
+        "client_id": credentials.client_id,
+        "client_secret": credentials.client_secret,
+        "refresh_token": credentials.refresh_token,
+        "grant_type": "refresh_token",
+    }
+    try:
+        response = requests.post(_TOKEN_URL, headers=headers, data=data)
+        response.raise_for_status()  # Raise an exception for bad responses
+        payload = response.json()
+    except requests.exceptions.RequestException as e:
+        print(f"Error: Failed to obtain access token: {e}")
+        return False
+
+    credentials.token = payload.get("access_token")
+    credentials.expiry = _utcnow() + datetime.timedelta(
+        seconds=payload.get("expires_in", 3600)
+    )
+    return bool(credentials.token)
+
+
+def get_access_token(developer_token=None, login_customer_id=None, force_refresh=False):
+    """
+    Returns a cached access token, refreshing it only shortly before it expires.
+
+    Args:
+        developer_token (str, optional): The Google Ads developer token. Defaults to
+            the DEVELOPER_TOKEN environment variable.
+        login_customer_id (str, optional): The manager account used to log in.
+            Defaults to the MANAGER_CUSTOMER_ID environment variable.
+        force_refresh (bool): Refresh the token even if it is still valid.
+
+    Returns:
+        str: The access token, or None if it could not be obtained.
+    """
+    key = _resolve_account(developer_token, login_customer_id)
+    with _lock:
+        credentials = _get_credentials(key)
+        if (
+            force_refresh
+            or not credentials.token
+            or credentials.expiry is None
+            or credentials.expiry - _REFRESH_MARGIN <= _utcnow()
+        ):
+            if not _refresh_access_token(credentials):
+                return None
+        return credentials.token
+
+
+def create_google_ads_client(
+    developer_token=None, login_customer_id=None, version=API_VERSION
+):
+    """
+    Returns a shared Google Ads API client for the account.
+
+    The client and its access token are built once per (developer token, login
+    customer) and reused by later calls from any thread. The token is refreshed
+    only when it is about to expire. Every service call made through the client
+    is paced and retried by the shared adsscheduler.AdsScheduler.
+
+    Args:
+        developer_token (str, optional): The Google Ads developer token. Defaults to
+            the DEVELOPER_TOKEN environment variable.
+        login_customer_id (str, optional): The manager account used to log in.
+            Defaults to the MANAGER_CUSTOMER_ID environment variable.
+        version (str, optional): The Google Ads API version, e.g. "v25". Defaults
+            to GOOGLE_ADS_API_VERSION, or the library's newest version if it is unset.
+
+    Returns:
+        GoogleAdsClient: The client, or None if no access token is available.
+    """
+    if not get_access_token(developer_token, login_customer_id):
+        print("Error: No access token available.")
+        return None
+
+    key = _resolve_account(developer_token, login_customer_id)
+    with _lock:
+        client = _clients.get((key, version))
+        if client is None:
+            client = _ScheduledGoogleAdsClient(
+                credentials=_get_credentials(key),
+                developer_token=key[0],
+                login_customer_id=key[1],
+                use_proto_plus=True,
+                version=version,
+            )
+            _clients[(key, version)] = client
+        return client
+
+
+def clear_cache():
+    """Drops all cached clients and tokens, e.g. after rotating credentials."""
+    with _lock:
+        _credentials.clear()
+        _clients.clear()
@@ -0,0 +1,235 @@
+import re
+from collections import Counter, defaultdict
+
+_DEFAULT_CLUSTER_SIZE = 20  # Keywords per cluster, about one ad group
+_DEFAULT_PROMPT_KEYWORDS = 40  # Keywords passed to an LLM prompt
+_HEAD_TOKEN_SHARE = 0.5  # Tokens in more ideas than this share every theme
+
+# Words that do not change the meaning of a keyword idea
+_STOPWORDS = {
+    "a",
+    "an",
+    "and",
+    "at",
+    "by",
+    "for",
+    "in",
+    "of",
+    "on",
+    "the",
+    "to",
+    "with",
+}
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _singular(token):
+    """Reduces a plural token to its singular form with a few English rules."""
+    if len(token) <= 3 or token.endswith(("ss", "us", "is")):
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith(("sses", "xes", "ches", "shes", "zes")):
+        return token[:-2]
+    if token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def normalize_keyword(text):
+    """
+    Returns the normalized tokens of a keyword idea.
+
+    Case, punctuation, plurals, stopwords and word order are ignored, so
+    "Running Shoes", "shoe for running" and "running-shoe" share the same tokens.
+
+    Args:
+        text (str): The keyword text.
+
+    Returns:
+        tuple of str: The sorted, distinct tokens.
+    """
+    tokens = {
+        _singular(token)
+        for token in _TOKEN_PATTERN.findall(text.lower())
+        if token not in _STOPWORDS
+    }
+    return tuple(sorted(tokens))
+
+
+def _trie_pattern(node):
+    """Turns a character trie into a regular expression matching any of its words."""
+    # A word ending here already matches, so longer words through this node add nothing
+    if "" in node:
+        return ""
+    alternatives = [
+        re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items())
+    ]
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return "(?:" + "|".join(alternatives) + ")"
+
+
+def compile_exclude_pattern(terms):
+    """
+    Compiles exclude terms into a single trie-shaped regular expression.
+
+    Terms sharing a prefix share a branch, so each keyword is scanned once
+    however many terms there are, instead of once per term.
+
+    Args:
+        terms (list of str): Terms to exclude, matched case-insensitively anywhere
+            in a keyword.
+
+    Returns:
+        re.Pattern: The compiled pattern, or None if there are no terms.
+    """
+    trie = {}
+    for term in terms:
+        term = term.strip().lower()
+        if not term:
+            continue
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    if not trie:
+        return None
+    return re.compile(_trie_pattern(trie))
+
+
+def dedupe_keyword_ideas(keyword_ideas, exclude=()):
+    """
+    Removes excluded and near-duplicate keyword ideas.
+
+    Ideas with the same normalized tokens are merged into the one with the most
+    searches, which keeps its text and the highest avg_monthly_searches.
+
+    Args:
+        keyword_ideas (list of dict): Keyword ideas, each with "text" and "avg_monthly_searches".
+        exclude (list of str): Terms whose ideas are dropped.
+
+    Returns:
+        list of dict: The remaining ideas, sorted by avg_monthly_searches, each
+        with an added "tokens" key.
+    """
+    pattern = compile_exclude_pattern(exclude)
+    best = {}
+    for idea in keyword_ideas:
+        if pattern and pattern.search(idea["text"].lower()):
+            continue
+        tokens = normalize_keyword(idea["text"])
+        if not tokens:
+            continue
+        searches = idea.get("avg_monthly_searches") or 0
+        current = best.get(tokens)
+        if current is None or searches > current["avg_monthly_searches"]:
+            best[tokens] = dict(idea, avg_monthly_searches=searches, tokens=tokens)
+    return sorted(
+        best.values(), key=lambda idea: (-idea["avg_monthly_searches"], idea["text"])
+    )
+
+
+def _split_cluster(ideas, used, max_size):
+    """Splits ideas that share the `used` tokens by their most common other token."""
+    if len(ideas) <= max_size:
+        return [(used, ideas)]
+
+    frequencies = Counter(
+        token for idea in ideas for token in idea["tokens"] if token not in used
+    )
+    groups = defaultdict(list)
+    rest = []
+    for idea in ideas:
+        tokens = [token for token in idea["tokens"] if token not in used]
+        if not tokens:
+            rest.append(idea)
+            continue
+        theme = max(tokens, key=lambda token: (frequencies[token], token))
+        groups[theme].append(idea)
+
+    clusters = []
+    for theme, members in groups.items():
+        # Themes with a single idea carry no shared signal and stay with the parent
+        if len(members) == 1:
+            rest.extend(members)
+        else:
+            clusters.extend(_split_cluster(members, used + (theme,), max_size))
+    rest.sort(key=lambda idea: (-idea["avg_monthly_searches"], idea["text"]))
+    for start in range(0, len(rest), max_size):
+        clusters.append((used, rest[start : start + max_size]))
+    return clusters
+
+
+def cluster_keyword_ideas(keyword_ideas, max_size=_DEFAULT_CLUSTER_SIZE):
+    """
+    Groups deduplicated keyword ideas into ad-group-sized themes.
+
+    Tokens shared by most ideas (usually the product itself) are ignored. Every
+    idea joins the theme of its most common remaining token, and themes larger
+    than `max_size` are split the same way on their next most common token, so
+    the ideas of a cluster share all of its theme tokens. Each pass counts
+    tokens once over the ideas involved, so 100k ideas cluster in seconds.
+
+    Args:
+        keyword_ideas (list of dict): Ideas from dedupe_keyword_ideas.
+        max_size (int): The largest number of keywords in a cluster.
+
+    Returns:
+        list of dict: Clusters with "theme", "keywords" (ideas sorted by
+        searches) and "avg_monthly_searches" (their sum), largest first.
+    """
+    if not keyword_ideas:
+        return []
+    document_frequencies = Counter(
+        token for idea in keyword_ideas for token in idea["tokens"]
+    )
+    head_tokens = tuple(
+        sorted(
+            token
+            for token, count in document_frequencies.items()
+            if count > len(keyword_ideas) * _HEAD_TOKEN_SHARE
+        )
+    )
+
+    clusters = []
+    for used, ideas in _split_cluster(list(keyword_ideas), head_tokens, max_size):
+        ideas.sort(key=lambda idea: (-idea["avg_monthly_searches"], idea["text"]))
+        # Head tokens are not in every idea of a cluster, so they are left out of its name
+        theme = " ".join(used[len(head_tokens) :])
+        clusters.append(
+            {
+                "theme": theme or ideas[0]["text"],
+                "keywords": ideas,
+                "avg_monthly_searches": sum(
+                    idea["avg_monthly_searches"] for idea in ideas
+                ),
+            }
+        )
+    clusters.sort(key=lambda cluster: -cluster["avg_monthly_searches"])
+    return clusters
+
+
+def select_prompt_keywords(keyword_ideas, limit=_DEFAULT_PROMPT_KEYWORDS):
+    """
+    Picks a short, varied keyword list for an LLM prompt.
+
+    Ideas are deduplicated and clustered, then the top idea of each cluster is
+    taken in turn, so the list covers every theme before repeating one.
+
+    Args:
+        keyword_ideas (list of dict): Keyword ideas, each with "text" and "avg_monthly_searches".
+        limit (int): The largest number of keywords to return.
+
+    Returns:
+        list of str: The selected keyword texts.
+    """
+    clusters = cluster_keyword_ideas(dedupe_keyword_ideas(keyword_ideas))
+    keywords = []
+    for rank in range(max((len(c["keywords"]) for c in clusters), default=0)):
+        for cluster in clusters:
+            if rank < len(cluster["keywords"]):
+                keywords.append(cluster["keywords"][rank]["text"])
+                if len(keywords) == limit:
+                    return keywords
+    return keywords
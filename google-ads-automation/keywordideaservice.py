@@ -0,0 +1,222 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.ads.googleads.errors import GoogleAdsException
+
+from googleadsclient import create_google_ads_client
+
+# Default location of the keyword idea cache
+_DEFAULT_CACHE_PATH = os.getenv(
+    "KEYWORD_IDEA_CACHE_PATH", os.path.join(".cache", "keywordideas.sqlite3")
+)
+_DEFAULT_TTL = 7 * 24 * 60 * 60  # Search volumes are monthly averages
+_DEFAULT_LOCATION_IDS = ["2840"]  # United States
+_DEFAULT_LANGUAGE_ID = "1000"  # English
+_DEFAULT_WORKERS = 4  # Seeds requested at once by generate_many
+_PAGE_SIZE = 10000  # The largest page the API returns
+_MAX_KEYWORD_SEEDS = 20  # Keywords allowed in one request's seed
+
+_default_service = None
+_default_service_lock = threading.Lock()
+
+
+def _normalize_seed(seed):
+    """Returns a seed as a (url, sorted keywords) tuple."""
+    if isinstance(seed, str):
+        url, keywords = seed, ()
+    elif isinstance(seed, tuple) and len(seed) == 2 and not isinstance(seed[1], str):
+        url, keywords = seed
+    else:
+        url, keywords = None, seed
+    keywords = {keyword.strip() for keyword in keywords or () if keyword.strip()}
+    return url or None, tuple(sorted(keywords))
+
+
+class KeywordIdeaService:
+    """
+    Generates keyword ideas for URL and keyword seeds with one client and a persistent cache.
+
+    The language and location resource names are built once, every page of
+    the results is read, and responses are cached in SQLite per (seed,
+    language, locations, network), so repeated or identical seeds across a
+    catalog cost no further API calls until the cache entry expires.
+
+    Usage:
+        service = KeywordIdeaService(client, customer_id)
+        service.generate(url="https://example.com/product")
+        service.generate_many(["https://example.com/a", ["running shoes", "trail shoes"]])
+    """
+
+    def __init__(
+        self,
+        client,
+        customer_id,
+        language_id=_DEFAULT_LANGUAGE_ID,
+        location_ids=_DEFAULT_LOCATION_IDS,
+        network="GOOGLE_SEARCH",
+        path=_DEFAULT_CACHE_PATH,
+        ttl=_DEFAULT_TTL,
+    ):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.client = client
+        self.customer_id = customer_id
+        self.ttl = ttl
+        self._idea_service = client.get_service("KeywordPlanIdeaService")
+        self._language = client.get_service("GoogleAdsService").language_constant_path(
+            language_id
+        )
+        geo_target_service = client.get_service("GeoTargetConstantService")
+        self._locations = [
+            geo_target_service.geo_target_constant_path(location_id)
+            for location_id in location_ids
+        ]
+        self._network = network
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS keyword_ideas (
+                key TEXT PRIMARY KEY,
+                ideas TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """)
+        self._connection.commit()
+
+    def _cache_key(self, url, keywords):
+        return json.dumps(
+            [url or "", list(keywords), self._language, self._locations, self._network]
+        )
+
+    def _request(self, url, keywords):
+        request = self.client.get_type("GenerateKeywordIdeasRequest")
+        request.customer_id = self.customer_id
+        request.language = self._language
+        request.geo_target_constants.extend(self._locations)
+        request.include_adult_keywords = False
+        request.keyword_plan_network = getattr(
+            self.client.enums.KeywordPlanNetworkEnum, self._network
+        )
+        request.page_size = _PAGE_SIZE
+        if url and keywords:
+            request.keyword_and_url_seed.url = url
+            request.keyword_and_url_seed.keywords.extend(keywords)
+        elif url:
+            request.url_seed.url = url
+        else:
+            request.keyword_seed.keywords.extend(keywords)
+        return request
+
+    def generate(self, url=None, keywords=()):
+        """
+        Returns the keyword ideas for a URL, a list of seed keywords, or both.
+
+        Seed lists longer than the API allows are split over several requests
+        and their ideas merged.
+
+        Args:
+            url (str, optional): The page to generate ideas for.
+            keywords (list of str, optional): Seed keywords.
+
+        Returns:
+            list of dict: Ideas with "text" and "avg_monthly_searches".
+
+        Raises:
+            GoogleAdsException: If a request fails.
+        """
+        url, keywords = _normalize_seed((url, keywords))
+        if not url and not keywords:
+            return []
+        key = self._cache_key(url, keywords)
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT ideas, updated_at FROM keyword_ideas WHERE key = ?", (key,)
+            ).fetchone()
+        if row and time.time() - row[1] < self.ttl:
+            return json.loads(row[0])
+
+        ideas = {}
+        chunks = [
+            keywords[start : start + _MAX_KEYWORD_SEEDS]
+            for start in range(0, len(keywords), _MAX_KEYWORD_SEEDS)
+        ] or [[]]
+        for chunk in chunks:
+            # Iterating the pager itself, not .results, reads every page
+            response = self._idea_service.generate_keyword_ideas(
+                request=self._request(url, chunk)
+            )
+            for idea in response:
+                searches = idea.keyword_idea_metrics.avg_monthly_searches
+                if idea.text not in ideas or searches > ideas[idea.text]:
+                    ideas[idea.text] = searches
+        ideas = [
+            {"text": text, "avg_monthly_searches": searches}
+            for text, searches in ideas.items()
+        ]
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO keyword_ideas (key, ideas, updated_at) VALUES (?, ?, ?)",
+                (key, json.dumps(ideas), time.time()),
+            )
+            self._connection.commit()
+        return ideas
+
+    def generate_many(self, seeds, max_workers=_DEFAULT_WORKERS):
+        """
+        Generates keyword ideas for many seeds concurrently.
+
+        Identical seeds are requested once. A seed that fails is reported and
+        returns an empty list without stopping the others.
+
+        Args:
+            seeds (list): URLs (str), seed keyword lists, or (url, keywords) tuples.
+            max_workers (int): The number of seeds requested at once.
+
+        Returns:
+            list of list: The ideas for each seed, in the order of `seeds`.
+        """
+        normalized = [_normalize_seed(seed) for seed in seeds]
+
+        def generate_seed(seed):
+            try:
+                return self.generate(*seed)
+            except GoogleAdsException as ex:
+                print(
+                    f'Keyword ideas for {seed[0] or ", ".join(seed[1])} failed '
+                    f'(request ID "{ex.request_id}"): {ex.error.message}'
+                )
+                return []
+
+        unique_seeds = list(dict.fromkeys(normalized))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = dict(zip(unique_seeds, executor.map(generate_seed, unique_seeds)))
+        return [results[seed] for seed in normalized]
+
+
+def get_default_idea_service():
+    """
+    Returns the process-wide keyword idea service for ACCOUNT_ID, creating it on first use.
+
+    Returns:
+        KeywordIdeaService: The shared service, or None if the Google Ads client
+        could not be created. Creation is retried on the next call.
+    """
+    global _default_service
+    with _default_service_lock:
+        if _default_service is None:
+            client = create_google_ads_client()
+            if not client:
+                print("Failed to create Google Ads client.")
+                return None
+            _default_service = KeywordIdeaService(
+                client, os.getenv("ACCOUNT_ID", "").replace("-", "")
+            )
+        return _default_service
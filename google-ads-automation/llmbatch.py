@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import time
+
+from llmclient import OPENAI_BASE_URL, get_message_content, get_session
+
+_BATCH_ENDPOINT = "/v1/chat/completions"
+_COMPLETION_WINDOW = "24h"
+_MAX_REQUESTS_PER_BATCH = 50000  # OpenAI's per-batch request limit
+_DEFAULT_POLL_INTERVAL = 60  # Seconds between status checks
+_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchJob:
+    """
+    Runs chat completion requests through the OpenAI Batch API.
+
+    The job writes the requests to JSONL files, uploads them, creates one batch
+    per file, polls until every batch finishes and maps the results back by
+    custom_id. Progress is saved to `state_dir/state.json` after each step, so a
+    job that is interrupted (or whose process is restarted the next morning)
+    resumes where it stopped instead of resubmitting the work.
+
+    Usage:
+        job = BatchJob("batches/2024-06-01", api_key)
+        results = job.run({"sku-1": data1, "sku-2": data2})
+    """
+
+    def __init__(
+        self,
+        state_dir,
+        api_key=None,
+        base_url=None,
+        poll_interval=_DEFAULT_POLL_INTERVAL,
+        max_requests_per_batch=_MAX_REQUESTS_PER_BATCH,
+    ):
+        self.state_dir = state_dir
+        self.base_url = (base_url or OPENAI_BASE_URL).rstrip("/")
+        self.poll_interval = poll_interval
+        self.max_requests_per_batch = max_requests_per_batch
+        self._headers = {
+            "Authorization": f"Bearer {api_key or os.getenv('OPENAI_API_KEY')}"
+        }
+        self._state_path = os.path.join(state_dir, "state.json")
+        os.makedirs(state_dir, exist_ok=True)
+        self.state = self._load_state()
+
+    def run(self, batch_requests):
+        """
+        Submits the requests (or resumes a previous submission) and waits for the results.
+
+        Args:
+            batch_requests (dict): Request bodies for /v1/chat/completions keyed by
+                custom_id, e.g. a product SKU or URL.
+
+        Returns:
+            dict: The generated message text keyed by custom_id. Requests that
+            failed inside the batch map to None.
+
+        Raises:
+            ValueError: If the state directory belongs to a job with different requests.
+            requests.exceptions.RequestException: If an API call fails.
+        """
+        self._prepare(batch_requests)
+        for part in self.state["parts"]:
+            self._submit(part)
+        for part in self.state["parts"]:
+            self._wait(part)
+            self._download(part)
+        return self.results()
+
+    def results(self):
+        """Returns the results downloaded so far, keyed by custom_id."""
+        results = {}
+        for part in self.state["parts"]:
+            for custom_id in part["custom_ids"]:
+                results[custom_id] = None
+            output_path = part.get("output_path")
+            if not output_path or not os.path.exists(output_path):
+                continue
+            with open(output_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    response = record.get("response") or {}
+                    if response.get("status_code") == 200:
+                        results[record["custom_id"]] = get_message_content(
+                            response.get("body", {})
+                        )
+        return results
+
+    def _load_state(self):
+        if os.path.exists(self._state_path):
+            with open(self._state_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save_state(self):
+        temp_path = self._state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(temp_path, self._state_path)
+
+    def _prepare(self, batch_requests):
+        """Writes the JSONL input files, or checks that they match a resumed job."""
+        digest = hashlib.sha256(
+            json.dumps(batch_requests, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        if self.state:
+            if self.state["requests_sha256"] != digest:
+                raise ValueError(
+                    f"{self.state_dir} holds a batch job for different requests. "
+                    "Use a new state directory for each job."
+                )
+            return
+
+        custom_ids = list(batch_requests)
+        parts = []
+        for start in range(0, len(custom_ids), self.max_requests_per_batch):
+            chunk = custom_ids[start : start + self.max_requests_per_batch]
+            input_path = os.path.join(self.state_dir, f"input-{len(parts)}.jsonl")
+            with open(input_path, "w", encoding="utf-8") as f:
+                for custom_id in chunk:
+                    line = {
+                        "custom_id": custom_id,
+                        "method": "POST",
+                        "url": _BATCH_ENDPOINT,
+                        "body": batch_requests[custom_id],
+                    }
+                    f.write(json.dumps(line) + "\n")
+            parts.append({"input_path": input_path, "custom_ids": chunk})
+
+        self.state = {"requests_sha256": digest, "parts": parts}
+        self._save_state()
+
+    def _submit(self, part):
+        """Uploads a part's input file and creates its batch, skipping finished steps."""
+        session = get_session()
+        if "input_file_id" not in part:
+            with open(part["input_path"], "rb") as f:
+                response = session.post(
+                    f"{self.base_url}/files",
+                    headers=self._headers,
+                    data={"purpose": "batch"},
+                    files={"file": (os.path.basename(part["input_path"]), f)},
+                )
+            response.raise_for_status()
+            part["input_file_id"] = response.json()["id"]
+            self._save_state()
+
+        if "batch_id" not in part:
+            response = session.post(
+                f"{self.base_url}/batches",
+                headers=self._headers,
+                json={
+                    "input_file_id": part["input_file_id"],
+                    "endpoint": _BATCH_ENDPOINT,
+                    "completion_window": _COMPLETION_WINDOW,
+                },
+            )
+            response.raise_for_status()
+            part["batch_id"] = response.json()["id"]
+            self._save_state()
+            print(
+                f"Submitted batch {part['batch_id']} ({len(part['custom_ids'])} requests)"
+            )
+
+    def _wait(self, part):
+        """Polls a part's batch until it reaches a final status."""
+        session = get_session()
+        while part.get("status") not in _FINAL_STATUSES:
+            response = session.get(
+                f"{self.base_url}/batches/{part['batch_id']}", headers=self._headers
+            )
+            response.raise_for_status()
+            batch = response.json()
+            part["status"] = batch.get("status")
+            part["output_file_id"] = batch.get("output_file_id")
+            part["error_file_id"] = batch.get("error_file_id")
+            self._save_state()
+
+            if part["status"] not in _FINAL_STATUSES:
+                counts = batch.get("request_counts") or {}
+                print(
+                    f"Batch {part['batch_id']} is {part['status']}: "
+                    f"{counts.get('completed', 0)}/{counts.get('total', 0)} requests done"
+                )
+                time.sleep(self.poll_interval)
+
+        if part["status"] != "completed":
+            print(
+                f"Batch {part['batch_id']} ended with status '{part['status']}'; "
+                "requests without output will be returned as None."
+            )
+
+    def _download(self, part):
+        """Downloads a part's output file once."""
+        if part.get("output_path") or not part.get("output_file_id"):
+            return
+        response = get_session().get(
+            f"{self.base_url}/files/{part['output_file_id']}/content",
+            headers=self._headers,
+        )
+        response.raise_for_status()
+        index = self.state["parts"].index(part)
+        output_path = os.path.join(self.state_dir, f"output-{index}.jsonl")
+        with open(output_path, "wb") as f:
+            f.write(response.content)
+        part["output_path"] = output_path
+        self._save_state()
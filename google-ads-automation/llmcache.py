@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Defaults for the response cache
+# Backend is one of memory, sqlite or filesystem
+_DEFAULT_BACKEND = os.getenv("LLM_CACHE_BACKEND", "sqlite")
+_DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm"))
+_DEFAULT_TTL = 30 * 24 * 60 * 60  # Seconds a cached completion stays valid
+_DEFAULT_MAX_ENTRIES = (
+    100000  # Completions kept before the least recently used are evicted
+)
+
+# Request fields that do not change what the model generates
+_UNKEYED_FIELDS = {"stream", "stream_options", "user"}
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def request_key(data):
+    """
+    Returns the content address of a chat completion request.
+
+    The key is a SHA-256 of the model, messages, temperature, max_tokens and any
+    other generation parameters, serialized canonically so that dict ordering
+    does not matter.
+
+    Args:
+        data (dict): The request body for the chat completions endpoint.
+
+    Returns:
+        str: The hex digest identifying the request.
+    """
+    keyed = {name: value for name, value in data.items() if name not in _UNKEYED_FIELDS}
+    canonical = json.dumps(
+        keyed, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """An in-process LRU backend, useful for a single long-running job."""
+
+    def __init__(self, max_entries=_DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteBackend:
+    """A persistent backend storing completions in a single SQLite file."""
+
+    def __init__(
+        self, path=_DEFAULT_CACHE_PATH + ".sqlite3", max_entries=_DEFAULT_MAX_ENTRIES
+    ):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS completions_accessed_at ON completions (accessed_at)"
+        )
+        self._connection.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, stored_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._connection.execute(
+                    "UPDATE completions SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+                self._connection.commit()
+            return row
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO completions (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._connection.execute(
+                """
+                DELETE FROM completions WHERE key IN (
+                    SELECT key FROM completions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._connection.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._connection.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self._connection.commit()
+
+
+class FilesystemBackend:
+    """A persistent backend storing one JSON file per completion, sharded by key prefix."""
+
+    def __init__(self, directory=_DEFAULT_CACHE_PATH, max_entries=_DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._count = len(self._list_entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _list_entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        entries.append((os.path.getmtime(path), path))
+                    except OSError:
+                        pass
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # The modification time doubles as the LRU timestamp
+        except (OSError, ValueError):
+            return None
+        return entry["value"], entry["stored_at"]
+
+    def set(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        is_new = not os.path.exists(path)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"value": value, "stored_at": time.time()}, f)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            if is_new:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            return
+        with self._lock:
+            self._count -= 1
+
+    def _evict(self):
+        """Removes the least recently used files, leaving 10% headroom. Call with _lock held."""
+        entries = sorted(self._list_entries())
+        keep = int(self.max_entries * 0.9)
+        for _, path in entries[: max(0, len(entries) - keep)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._count = min(len(entries), keep)
+
+
+class LLMCache:
+    """
+    A content-addressed cache of chat completion responses.
+
+    Completions are stored under request_key(data), so identical requests (same
+    model, messages, temperature and max_tokens) are answered without calling
+    the API. Entries older than `ttl` seconds are treated as missing.
+
+    Attributes:
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that had to call the API.
+    """
+
+    def __init__(self, backend=None, ttl=_DEFAULT_TTL):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, data):
+        """Returns the cached completion text for a request, or None on a miss."""
+        key = request_key(data)
+        entry = self.backend.get(key)
+        if entry is not None and self.ttl and time.time() - entry[1] > self.ttl:
+            self.backend.delete(key)
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry[0]
+
+    def set(self, data, content):
+        """Stores the completion text for a request."""
+        self.backend.set(request_key(data), content)
+
+    def stats(self):
+        """Returns a dictionary with the hit and miss counters and the hit rate."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def create_backend(
+    name=_DEFAULT_BACKEND, path=_DEFAULT_CACHE_PATH, max_entries=_DEFAULT_MAX_ENTRIES
+):
+    """
+    Creates a cache backend by name.
+
+    Args:
+        name (str): "memory", "sqlite" or "filesystem".
+        path (str): The base path for persistent backends. The SQLite backend
+            appends ".sqlite3"; the filesystem backend uses it as a directory.
+        max_entries (int): The number of completions kept before eviction.
+
+    Returns:
+        The backend instance.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if name == "memory":
+        return MemoryBackend(max_entries)
+    if name == "sqlite":
+        return SQLiteBackend(path + ".sqlite3", max_entries)
+    if name == "filesystem":
+        return FilesystemBackend(path, max_entries)
+    raise ValueError(
+        f"Unknown LLM cache backend '{name}'. Use memory, sqlite or filesystem."
+    )
+
+
+def get_default_cache():
+    """Returns the process-wide completion cache configured by LLM_CACHE_BACKEND/LLM_CACHE_PATH."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(create_backend())
+        return _default_cache
@@ -0,0 +1,440 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# OpenAI endpoint settings; point OPENAI_BASE_URL at a mock server for local testing
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+_CHAT_COMPLETIONS_PATH = "/chat/completions"
+
+# Defaults for the async client
+_DEFAULT_MAX_IN_FLIGHT = 16  # Concurrent requests to the API
+_DEFAULT_MAX_RETRIES = 5  # Retries for 429 and 5xx responses
+_DEFAULT_TIMEOUT = 120  # Seconds to wait for a completion
+_CHARS_PER_TOKEN = 4  # Rough estimate used to budget prompt tokens
+_RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class ChatCompletionError(Exception):
+    """Raised when the chat completions API returns an error that cannot be retried."""
+
+    def __init__(self, status_code, body):
+        super().__init__(f"Chat completion failed with status {status_code}: {body}")
+        self.status_code = status_code
+        self.body = body
+
+
+def get_session():
+    """Returns a process-wide requests session that keeps connections to the API open."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount("https://", HTTPAdapter(pool_maxsize=_DEFAULT_MAX_IN_FLIGHT))
+            _session.mount("http://", HTTPAdapter(pool_maxsize=_DEFAULT_MAX_IN_FLIGHT))
+        return _session
+
+
+def chat_completions_url():
+    """Returns the chat completions endpoint for the configured base URL."""
+    return OPENAI_BASE_URL.rstrip("/") + _CHAT_COMPLETIONS_PATH
+
+
+def get_message_content(content):
+    """Extracts the first choice's message text from a chat completion response."""
+    return content.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+
+def _backoff(attempt, retry_after=None):
+    """Returns the delay before the next attempt, preferring the server's Retry-After."""
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(60.0, 2**attempt) * (0.5 + random.random() / 2)
+
+
+def create_chat_completion(data, api_key=None, max_retries=_DEFAULT_MAX_RETRIES):
+    """
+    Sends a chat completion request through the shared session.
+
+    Rate limits (429) and server errors are retried with backoff, honoring the
+    Retry-After header, as are dropped connections and timeouts.
+
+    Args:
+        data (dict): The request body for the chat completions endpoint.
+        api_key (str, optional): The OpenAI API key. Defaults to OPENAI_API_KEY.
+        max_retries (int): The number of retries after the first attempt.
+
+    Returns:
+        dict: The decoded JSON response.
+
+    Raises:
+        ChatCompletionError: If the API returns a non-retryable error, or a
+            retryable one after all retries are used up.
+        requests.exceptions.RequestException: If the connection fails after all retries.
+    """
+    headers = {"Authorization": f"Bearer {api_key or os.getenv('OPENAI_API_KEY')}"}
+    for attempt in range(max_retries + 1):
+        try:
+            response = get_session().post(
+                chat_completions_url(),
+                json=data,
+                headers=headers,
+                timeout=_DEFAULT_TIMEOUT,
+            )
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == max_retries:
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+
+        if response.status_code == 200:
+            return response.json()
+        if (
+            response.status_code not in _RETRYABLE_STATUS_CODES
+            or attempt == max_retries
+        ):
+            raise ChatCompletionError(response.status_code, response.text)
+        time.sleep(_backoff(attempt, response.headers.get("Retry-After")))
+
+
+def complete_chat(data, api_key=None, cache=None, bypass_cache=False):
+    """
+    Returns the first choice's message text for a chat completion request.
+
+    The blocking counterpart of AsyncChatClient.complete: the request is sent
+    with create_chat_completion, so it gets the same timeout and retries.
+
+    Args:
+        data (dict): The request body for the chat completions endpoint.
+        api_key (str, optional): The OpenAI API key. Defaults to OPENAI_API_KEY.
+        cache (LLMCache, optional): Answers repeated requests and stores new ones.
+        bypass_cache (bool): Always call the API, e.g. to get a fresh variation.
+            The new completion still replaces the cached one.
+
+    Returns:
+        str: The generated text.
+
+    Raises:
+        ChatCompletionError, requests.exceptions.RequestException: As raised by
+            create_chat_completion.
+    """
+    if cache is not None and not bypass_cache:
+        cached = cache.get(data)
+        if cached is not None:
+            return cached
+
+    message_content = get_message_content(create_chat_completion(data, api_key))
+    if cache is not None and message_content:
+        cache.set(data, message_content)
+    return message_content
+
+
+def stream_chat_completion(data, api_key=None):
+    """
+    Streams a chat completion, yielding the generated text as it arrives.
+
+    The request is sent with `stream: true` and the server-sent events are
+    decoded incrementally, so callers can show output long before the whole
+    completion is finished.
+
+    Args:
+        data (dict): The request body for the chat completions endpoint.
+        api_key (str, optional): The OpenAI API key. Defaults to OPENAI_API_KEY.
+
+    Yields:
+        str: Chunks of the first choice's message text.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails.
+    """
+    headers = {"Authorization": f"Bearer {api_key or os.getenv('OPENAI_API_KEY')}"}
+    response = get_session().post(
+        chat_completions_url(),
+        json={**data, "stream": True},
+        headers=headers,
+        stream=True,
+        timeout=_DEFAULT_TIMEOUT,
+    )
+    with response:
+        response.raise_for_status()
+        response.encoding = "utf-8"  # Event streams are always UTF-8
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[len("data:") :].strip()
+            if payload == "[DONE]":
+                break
+            choices = json.loads(payload).get("choices") or [{}]
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+
+def estimate_tokens(data):
+    """Estimates the tokens a request will consume: its prompt plus max_tokens."""
+    prompt_chars = sum(
+        len(message.get("content") or "") for message in data.get("messages", [])
+    )
+    return prompt_chars // _CHARS_PER_TOKEN + data.get("max_tokens", 0)
+
+
+class _TokenBucket:
+    """A token bucket that refills continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.available = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(
+            self.capacity, self.available + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def wait_time(self, amount):
+        """Returns the seconds until `amount` units are available (0 if they are now)."""
+        self._refill()
+        # Requests bigger than the whole bucket are let through once it is full
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def consume(self, amount):
+        self.available -= amount
+
+    def refund(self, amount):
+        self.available = min(self.capacity, self.available + amount)
+
+
+class RateBudget:
+    """
+    Paces requests to stay within requests-per-minute and tokens-per-minute limits.
+
+    Token usage is reserved up front from an estimate and corrected once the
+    response reports the real usage.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self._requests = (
+            _TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self._tokens = _TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens):
+        """Waits until one request and `tokens` tokens fit in the budget, then reserves them."""
+        async with self._lock:
+            while True:
+                delay = max(
+                    self._requests.wait_time(1) if self._requests else 0.0,
+                    self._tokens.wait_time(tokens) if self._tokens else 0.0,
+                )
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            if self._requests:
+                self._requests.consume(1)
+            if self._tokens:
+                self._tokens.consume(tokens)
+
+    def settle(self, reserved_tokens, used_tokens):
+        """Corrects the token budget once the actual usage is known."""
+        if not self._tokens:
+            return
+        if used_tokens > reserved_tokens:
+            self._tokens.consume(used_tokens - reserved_tokens)
+        else:
+            self._tokens.refund(reserved_tokens - used_tokens)
+
+
+class AsyncChatClient:
+    """
+    An asyncio client for the chat completions API built on a pooled httpx client.
+
+    At most `max_in_flight` requests run at once, and requests are paced to the
+    configured per-minute budgets so large batches run right up to the rate
+    limit instead of triggering waves of 429 responses. Rate-limited and 5xx
+    responses are retried with exponential backoff, honoring Retry-After. When a
+    `cache` (see llmcache.LLMCache) is given, complete() answers repeated
+    requests from it.
+
+    Usage:
+        async with AsyncChatClient(api_key, requests_per_minute=500) as client:
+            text = await client.complete(data)
+    """
+
+    def __init__(
+        self,
+        api_key=None,
+        base_url=None,
+        max_in_flight=_DEFAULT_MAX_IN_FLIGHT,
+        requests_per_minute=None,
+        tokens_per_minute=None,
+        max_retries=_DEFAULT_MAX_RETRIES,
+        timeout=_DEFAULT_TIMEOUT,
+        cache=None,
+    ):
+        self.max_retries = max_retries
+        self.cache = cache
+        self.budget = RateBudget(requests_per_minute, tokens_per_minute)
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._http = httpx.AsyncClient(
+            base_url=(base_url or OPENAI_BASE_URL).rstrip("/"),
+            headers={
+                "Authorization": f"Bearer {api_key or os.getenv('OPENAI_API_KEY')}"
+            },
+            limits=httpx.Limits(
+                max_connections=max_in_flight, max_keepalive_connections=max_in_flight
+            ),
+            timeout=timeout,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Closes the pooled connections."""
+        await self._http.aclose()
+
+    async def create(self, data):
+        """
+        Sends a chat completion request.
+
+        Args:
+            data (dict): The request body, as sent to /v1/chat/completions.
+
+        Returns:
+            dict: The decoded JSON response.
+
+        Raises:
+            ChatCompletionError: If the API returns a non-retryable error, or a
+                retryable one after all retries are used up.
+            httpx.HTTPError: If the connection fails after all retries.
+        """
+        reserved_tokens = estimate_tokens(data)
+        for attempt in range(self.max_retries + 1):
+            await self.budget.acquire(reserved_tokens)
+            try:
+                async with self._semaphore:
+                    response = await self._http.post(_CHAT_COMPLETIONS_PATH, json=data)
+            except httpx.TransportError:
+                self.budget.settle(reserved_tokens, 0)
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code == 200:
+                content = response.json()
+                used_tokens = content.get("usage", {}).get(
+                    "total_tokens", reserved_tokens
+                )
+                self.budget.settle(reserved_tokens, used_tokens)
+                return content
+
+            self.budget.settle(reserved_tokens, 0)
+            if (
+                response.status_code not in _RETRYABLE_STATUS_CODES
+                or attempt == self.max_retries
+            ):
+                raise ChatCompletionError(response.status_code, response.text)
+            await asyncio.sleep(
+                self._backoff(attempt, response.headers.get("Retry-After"))
+            )
+
+    async def complete(self, data, bypass_cache=False):
+        """
+        Returns the first choice's message text for a chat completion request.
+
+        Args:
+            data (dict): The request body, as sent to /v1/chat/completions.
+            bypass_cache (bool): Always call the API, e.g. to get a fresh variation.
+                The new completion still replaces the cached one.
+
+        Returns:
+            str: The generated text.
+        """
+        if self.cache is not None and not bypass_cache:
+            cached = self.cache.get(data)
+            if cached is not None:
+                return cached
+
+        message_content = get_message_content(await self.create(data))
+        if self.cache is not None and message_content:
+            self.cache.set(data, message_content)
+        return message_content
+
+    _backoff = staticmethod(_backoff)
+
+
+def gather_with_client(calls, api_key=None, cache=None, **client_options):
+    """
+    Runs many coroutines concurrently against one shared AsyncChatClient.
+
+    Args:
+        calls (list of callable): Functions that take the client and return an
+            awaitable, e.g. functools.partial(generate_async, description).
+        api_key (str, optional): The OpenAI API key. Defaults to OPENAI_API_KEY.
+        cache (LLMCache, optional): Passed on to the client.
+        **client_options: Other AsyncChatClient arguments, such as max_in_flight,
+            requests_per_minute or tokens_per_minute.
+
+    Returns:
+        list: The result of each call, in input order.
+    """
+
+    async def run():
+        async with AsyncChatClient(api_key, cache=cache, **client_options) as client:
+            return await asyncio.gather(*(call(client) for call in calls))
+
+    return asyncio.run(run())
+
+
+def complete_batch(batch_requests, api_key, state_dir, poll_interval=60, cache=None):
+    """
+    Answers many chat completion requests offline through the OpenAI Batch API.
+
+    Args:
+        batch_requests (dict): Request bodies keyed by a custom ID.
+        api_key (str): The OpenAI API key.
+        state_dir (str): The directory holding the batch files and progress.
+        poll_interval (int): Seconds between batch status checks.
+        cache (LLMCache, optional): Stores the results, so later interactive
+            runs answer the same requests without calling the API.
+
+    Returns:
+        dict: The generated text keyed by custom ID, with an empty string for
+        each request that failed.
+    """
+    from llmbatch import BatchJob  # llmbatch imports this module
+
+    results = BatchJob(state_dir, api_key, poll_interval=poll_interval).run(
+        batch_requests
+    )
+    if cache is not None:
+        for custom_id, message_content in results.items():
+            if message_content:
+                cache.set(batch_requests[custom_id], message_content)
+    return {
+        custom_id: message_content or ""
+        for custom_id, message_content in results.items()
+    }
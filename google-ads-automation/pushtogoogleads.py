@@ -1,65 +1,39 @@
 import os
 import datetime
-import requests
-from google.ads.googleads.client import GoogleAdsClient
 from google.ads.googleads.errors import GoogleAdsException
-import time
-from google.api_core.exceptions import ResourceExhausted
+import grpc
+import requests
 import sys
 
-# Environment variables for authentication
-DEVELOPER_TOKEN = os.getenv("DEVELOPER_TOKEN")
-GCLIENT_ID = os.getenv("GCLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-REFRESH_TOKEN = os.getenv("GCP_REFRESH_TOKEN")
-MANAGER_CUSTOMER_ID = os.getenv("MANAGER_CUSTOMER_ID").replace(
-    "-", ""
-)  # Ensure no dashes
-API_VERSION = "v16"
-
-_DATE_FORMAT = "%Y%m%d"
-
-
-def get_access_token():
-    """Obtains a fresh access token using the refresh token."""
-    url = "https://www.googleapis.com/oauth2/v4/token"
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    data = {
-        "client_id": GCLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "refresh_token": REFRESH_TOKEN,
-        "grant_type": "refresh_token",
-    }
-    try:
-        response = requests.post(url, headers=headers, data=data)
-        response.raise_for_status()
-        access_token = response.json().get("access_token")
-        return access_token
-    except requests.exceptions.HTTPError as e:
-        print(f"Failed to obtain access token. HTTP error: {e.response.status_code}")
-    except Exception as e:
-        print(f"Failed to obtain access token. Unexpected error: {e}")
-    return None
-
-
-def create_google_ads_client():
-    """Creates a Google Ads API client using the obtained access token."""
-    access_token = get_access_token()
-    if not access_token:
-        print("No access token available. Exiting function.")
-        return None
-
-    credentials = {
-        "developer_token": DEVELOPER_TOKEN,
-        "client_id": GCLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "refresh_token": REFRESH_TOKEN,
-        "login_customer_id": MANAGER_CUSTOMER_ID,
-        "access_token": access_token,
-        "use_proto_plus": True,
-    }
-    client = GoogleAdsClient.load_from_dict(credentials, version=API_VERSION)
-    return client
+from geotargets import GeoTargetResolver
+from googleadsclient import create_google_ads_client
+from htmlcleaner import clean_html
+from httpcache import cached_get
+from resourceindex import ResourceIndex, quote_gaql
+from rsagenerator import generate_structured_responsive_search_ad
+from rsaparser import MIN_ASSETS, missing_assets, validate_responsive_search_ad
+
+_DATE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"  # Campaign start_date_time/end_date_time
+_DEFAULT_BUDGET_MICROS = 10000000  # Daily budget for new campaigns, $10
+_DEFAULT_AD_GROUP_CPC_MICROS = 1000000  # Ad group bid, $1 = 1,000,000 micros
+_DEFAULT_KEYWORD_CPC_MICROS = 140000  # Keyword bid in micros
+_MAX_MUTATE_OPERATIONS = 10000  # Operations allowed per GoogleAdsService.Mutate call
+
+# Operations that set up a campaign; they go first when its operations are split
+_SETUP_OPERATIONS = {
+    "campaign_budget_operation",
+    "campaign_operation",
+    "campaign_criterion_operation",
+    "ad_group_operation",
+}
+# Fields through which an operation refers to an entity created before it
+_REFERENCE_FIELDS = {
+    "campaign_operation": "campaign_budget",
+    "campaign_criterion_operation": "campaign",
+    "ad_group_operation": "campaign",
+    "ad_group_ad_operation": "ad_group",
+    "ad_group_criterion_operation": "ad_group",
+}
 
 
 def get_existing_campaign_id(client, customer_id, campaign_name):
@@ -71,7 +45,7 @@ def get_existing_campaign_id(client, customer_id, campaign_name):
     FROM
         campaign
     WHERE
-        campaign.name = '{campaign_name}'
+        campaign.name = {quote_gaql(campaign_name)}
     """
     ga_service = client.get_service("GoogleAdsService")
     response = ga_service.search(customer_id=customer_id, query=query)
@@ -89,8 +63,8 @@ def get_existing_ad_group_id(client, customer_id, campaign_id, ad_group_name):
     FROM
         ad_group
     WHERE
-        ad_group.campaign = 'customers/{customer_id}/campaigns/{campaign_id}'
-        AND ad_group.name = '{ad_group_name}'
+        ad_group.campaign = 'customers/{customer_id}/campaigns/{int(campaign_id)}'
+        AND ad_group.name = {quote_gaql(ad_group_name)}
     """
     ga_service = client.get_service("GoogleAdsService")
     response = ga_service.search(customer_id=customer_id, query=query)
@@ -122,8 +96,8 @@ def create_campaign_budget(client, customer_id, budget_amount):
         return None
 
 
-def create_campaign(client, customer_id, campaign_name, budget_id):
-    """Creates a new search campaign with the specified name and budget."""
+def create_campaign(client, customer_id, campaign_name, budget_id, resource_index=None):
+    """Creates a new search campaign with the specified name and budget, recording it in the index if given."""
     campaign_service = client.get_service("CampaignService")
     campaign_operation = client.get_type("CampaignOperation")
     campaign = campaign_operation.create
@@ -138,23 +112,27 @@ def create_campaign(client, customer_id, campaign_name, budget_id):
     campaign.network_settings.target_search_network = True
     campaign.network_settings.target_content_network = True
     campaign.network_settings.target_partner_search_network = False
-    campaign.start_date = (
+    campaign.start_date_time = (
         datetime.datetime.now() + datetime.timedelta(days=1)
-    ).strftime(_DATE_FORMAT)
-    campaign.end_date = (
+    ).strftime(_DATE_TIME_FORMAT)
+    campaign.end_date_time = (
         datetime.datetime.now() + datetime.timedelta(days=365)
-    ).strftime(_DATE_FORMAT)
+    ).strftime(_DATE_TIME_FORMAT)
 
     campaign_response = campaign_service.mutate_campaigns(
         customer_id=customer_id, operations=[campaign_operation]
     )
     campaign_id = campaign_response.results[0].resource_name.split("/")[-1]
     print(f"Created Campaign with ID: {campaign_id}")
+    if resource_index:
+        resource_index.add_campaign(campaign_name, campaign_id)
     return campaign_id
 
 
-def create_ad_group(client, customer_id, campaign_id, ad_group_name):
-    """Creates a new ad group within the specified campaign."""
+def create_ad_group(
+    client, customer_id, campaign_id, ad_group_name, resource_index=None
+):
+    """Creates a new ad group within the specified campaign, recording it in the index if given."""
     ad_group_service = client.get_service("AdGroupService")
     ad_group_operation = client.get_type("AdGroupOperation")
     ad_group = ad_group_operation.create
@@ -163,7 +141,7 @@ def create_ad_group(client, customer_id, campaign_id, ad_group_name):
         customer_id, campaign_id
     )
     ad_group.type = client.enums.AdGroupTypeEnum.SEARCH_STANDARD
-    ad_group.cpc_bid_micros = 1000000  # Example bid value, $1 = 1,000,000 micros
+    ad_group.cpc_bid_micros = _DEFAULT_AD_GROUP_CPC_MICROS
     ad_group.status = client.enums.AdGroupStatusEnum.ENABLED
 
     ad_group_response = ad_group_service.mutate_ad_groups(
@@ -171,6 +149,8 @@ def create_ad_group(client, customer_id, campaign_id, ad_group_name):
     )
     ad_group_id = ad_group_response.results[0].resource_name.split("/")[-1]
     print(f"Created Ad Group with ID: {ad_group_id}")
+    if resource_index:
+        resource_index.add_ad_group(campaign_id, ad_group_name, ad_group_id)
     return ad_group_id
 
 
@@ -180,32 +160,54 @@ def create_search_ad(
     campaign_name,
     ad_group_name,
     final_url,
-    headline_part1,
-    headline_part2,
-    headline_part3,
-    description1,
-    description2,
+    headlines,
+    descriptions,
     keyword_list,
+    resource_index=None,
+    geo_resolver=None,
 ):
     ad_group_service = client.get_service("AdGroupService")
     ad_group_ad_service = client.get_service("AdGroupAdService")
 
     """Creates a new responsive search ad within the specified ad group."""
 
-    # Get existing campaign ID
-    campaign_id = get_existing_campaign_id(client, customer_id, campaign_name)
+    # Check the text assets first, so an over-length or duplicate asset fails
+    # here instead of in the API after the campaign and ad group were created
+    sections, rejected = validate_responsive_search_ad(
+        {"headlines": headlines, "descriptions": descriptions}
+    )
+    missing = missing_assets(sections)
+    for asset in rejected:
+        print(f"Invalid {asset['section'][:-1]} \"{asset['text']}\": {asset['reason']}")
+    if rejected or any(missing.values()):
+        print(
+            f"A responsive search ad needs at least {MIN_ASSETS['headlines']} valid "
+            f"headlines and {MIN_ASSETS['descriptions']} valid descriptions."
+        )
+        return
+
+    # Get existing campaign ID, from the prefetched index when one is given
+    if resource_index:
+        campaign_id = resource_index.campaign_id(campaign_name)
+    else:
+        campaign_id = get_existing_campaign_id(client, customer_id, campaign_name)
     if not campaign_id:
-        budget_id = create_campaign_budget(
-            client, customer_id, 10000000
-        )  # Example budget amount
-        campaign_id = create_campaign(client, customer_id, campaign_name, budget_id)
+        budget_id = create_campaign_budget(client, customer_id, _DEFAULT_BUDGET_MICROS)
+        campaign_id = create_campaign(
+            client, customer_id, campaign_name, budget_id, resource_index
+        )
 
     # Get existing ad group ID
-    ad_group_id = get_existing_ad_group_id(
-        client, customer_id, campaign_id, ad_group_name
-    )
+    if resource_index:
+        ad_group_id = resource_index.ad_group_id(campaign_id, ad_group_name)
+    else:
+        ad_group_id = get_existing_ad_group_id(
+            client, customer_id, campaign_id, ad_group_name
+        )
     if not ad_group_id:
-        ad_group_id = create_ad_group(client, customer_id, campaign_id, ad_group_name)
+        ad_group_id = create_ad_group(
+            client, customer_id, campaign_id, ad_group_name, resource_index
+        )
 
     # Create Responsive Search Ad
     ad_group_ad_operation = client.get_type("AdGroupAdOperation")
@@ -218,23 +220,14 @@ def create_search_ad(
     ad.final_urls.append(final_url)
 
     # Properly create AdTextAsset instances
-    headline_asset1 = client.get_type("AdTextAsset")
-    headline_asset1.text = headline_part1
-    headline_asset2 = client.get_type("AdTextAsset")
-    headline_asset2.text = headline_part2
-    headline_asset3 = client.get_type("AdTextAsset")
-    headline_asset3.text = headline_part3
-    description_asset1 = client.get_type("AdTextAsset")
-    description_asset1.text = description1
-    description_asset2 = client.get_type("AdTextAsset")
-    description_asset2.text = description2
-
-    ad.responsive_search_ad.headlines.extend(
-        [headline_asset1, headline_asset2, headline_asset3]
-    )
-    ad.responsive_search_ad.descriptions.extend(
-        [description_asset1, description_asset2]
-    )
+    for text in sections["headlines"]:
+        headline_asset = client.get_type("AdTextAsset")
+        headline_asset.text = text
+        ad.responsive_search_ad.headlines.append(headline_asset)
+    for text in sections["descriptions"]:
+        description_asset = client.get_type("AdTextAsset")
+        description_asset.text = text
+        ad.responsive_search_ad.descriptions.append(description_asset)
 
     ad_group_ad_response = ad_group_ad_service.mutate_ad_group_ads(
         customer_id=customer_id, operations=[ad_group_ad_operation]
@@ -248,7 +241,7 @@ def create_search_ad(
     add_keywords(client, customer_id, ad_group_id, keyword_list)
 
     # Set location targeting to the United States
-    set_geo_targeting(client, customer_id, campaign_id)
+    set_geo_targeting(client, customer_id, campaign_id, geo_resolver)
 
 
 def add_keywords(client, customer_id, ad_group_id, keyword_list):
@@ -265,7 +258,7 @@ def add_keywords(client, customer_id, ad_group_id, keyword_list):
         criterion.keyword.text = keyword
         criterion.keyword.match_type = client.enums.KeywordMatchTypeEnum.BROAD
         criterion.status = client.enums.AdGroupCriterionStatusEnum.ENABLED
-        criterion.cpc_bid_micros = 140000  # Set the CPC bid in micros
+        criterion.cpc_bid_micros = _DEFAULT_KEYWORD_CPC_MICROS
         operations.append(criterion_operation)
 
     ad_group_criterion_service.mutate_ad_group_criteria(
@@ -274,13 +267,20 @@ def add_keywords(client, customer_id, ad_group_id, keyword_list):
     print(f"Added {len(operations)} keywords to Ad Group ID: {ad_group_id}")
 
 
-def set_geo_targeting(client, customer_id, campaign_id):
-    query = 'SELECT geo_target_constant.resource_name FROM geo_target_constant WHERE geo_target_constant.country_code = "US"'
-    location_criteria = []
-    ga_service = client.get_service("GoogleAdsService")
-    response = ga_service.search(customer_id=customer_id, query=query)
-    for row in response:
-        location_criteria.append(row.geo_target_constant.resource_name)
+def set_geo_targeting(
+    client, customer_id, campaign_id, geo_resolver=None, country_code="US"
+):
+    """Targets the campaign to a country, skipping the mutate if it is already targeted."""
+    geo_resolver = geo_resolver or GeoTargetResolver(client, customer_id)
+    existing_locations = geo_resolver.campaign_locations(campaign_id)
+    location_criteria = [
+        location
+        for location in geo_resolver.resolve(country_code)
+        if location not in existing_locations
+    ]
+    if not location_criteria:
+        print(f"Geo-targeting for Campaign ID {campaign_id} is already set.")
+        return
 
     campaign_criterion_operations = []
     for location in location_criteria:
@@ -298,11 +298,373 @@ def set_geo_targeting(client, customer_id, campaign_id):
         campaign_criterion_service.mutate_campaign_criteria(
             customer_id=customer_id, operations=campaign_criterion_operations
         )
+        geo_resolver.add_campaign_locations(campaign_id, location_criteria)
         print(f"Set geo-targeting for Campaign ID: {campaign_id}")
     except GoogleAdsException as ex:
         handle_googleads_exception(ex)
 
 
+def build_search_ad_operations(client, customer_id, ads, resource_index, locations):
+    """
+    Builds the mutate operations that create many responsive search ads.
+
+    New budgets, campaigns and ad groups get temporary (negative) IDs, so the
+    operations that depend on them can reference them before they exist. The
+    operations are grouped per campaign, because temporary IDs can only be
+    resolved within a single mutate request.
+
+    Args:
+        client (GoogleAdsClient): The Google Ads client.
+        customer_id (str): The customer ID without dashes.
+        ads (list of dict): The ads, each with "campaign_name", "ad_group_name",
+            "final_url", "headlines", "descriptions" and "keywords".
+        resource_index (ResourceIndex): The customer's existing campaigns and ad groups.
+        locations (list of str): Geo target constants for new campaigns.
+
+    Returns:
+        list of list: The MutateOperations for each campaign, in dependency order.
+    """
+    budget_service = client.get_service("CampaignBudgetService")
+    campaign_service = client.get_service("CampaignService")
+    ad_group_service = client.get_service("AdGroupService")
+    start_date_time = (datetime.datetime.now() + datetime.timedelta(days=1)).strftime(
+        _DATE_TIME_FORMAT
+    )
+    end_date_time = (datetime.datetime.now() + datetime.timedelta(days=365)).strftime(
+        _DATE_TIME_FORMAT
+    )
+    timestamp = datetime.datetime.now().isoformat()
+
+    next_temp_id = -1
+    groups = {}
+    campaign_paths = {}
+    ad_group_paths = {}
+    for ad in ads:
+        campaign_name = ad["campaign_name"]
+        operations = groups.setdefault(campaign_name, [])
+
+        if campaign_name not in campaign_paths:
+            campaign_id = resource_index.campaign_id(campaign_name)
+            if campaign_id:
+                campaign_paths[campaign_name] = campaign_service.campaign_path(
+                    customer_id, campaign_id
+                )
+            else:
+                # New campaign: budget, campaign and geo targeting with temporary IDs
+                budget_operation = client.get_type("MutateOperation")
+                campaign_budget = budget_operation.campaign_budget_operation.create
+                campaign_budget.resource_name = budget_service.campaign_budget_path(
+                    customer_id, next_temp_id
+                )
+                campaign_budget.name = f"Budget {campaign_name} {timestamp}"
+                campaign_budget.amount_micros = _DEFAULT_BUDGET_MICROS
+                campaign_budget.delivery_method = (
+                    client.enums.BudgetDeliveryMethodEnum.STANDARD
+                )
+                campaign_budget.explicitly_shared = False
+                operations.append(budget_operation)
+
+                campaign_operation = client.get_type("MutateOperation")
+                campaign = campaign_operation.campaign_operation.create
+                campaign.resource_name = campaign_service.campaign_path(
+                    customer_id, next_temp_id - 1
+                )
+                campaign.name = campaign_name
+                campaign.advertising_channel_type = (
+                    client.enums.AdvertisingChannelTypeEnum.SEARCH
+                )
+                campaign.status = client.enums.CampaignStatusEnum.PAUSED
+                campaign.manual_cpc.enhanced_cpc_enabled = True
+                campaign.campaign_budget = campaign_budget.resource_name
+                campaign.network_settings.target_google_search = True
+                campaign.network_settings.target_search_network = True
+                campaign.network_settings.target_content_network = True
+                campaign.network_settings.target_partner_search_network = False
+                campaign.start_date_time = start_date_time
+                campaign.end_date_time = end_date_time
+                operations.append(campaign_operation)
+                campaign_paths[campaign_name] = campaign.resource_name
+                next_temp_id -= 2
+
+                for location in locations:
+                    criterion_operation = client.get_type("MutateOperation")
+                    criterion = criterion_operation.campaign_criterion_operation.create
+                    criterion.campaign = campaign.resource_name
+                    criterion.location.geo_target_constant = location
+                    criterion.status = client.enums.CampaignCriterionStatusEnum.ENABLED
+                    operations.append(criterion_operation)
+
+        ad_group_key = (campaign_name, ad["ad_group_name"])
+        if ad_group_key not in ad_group_paths:
+            ad_group_id = resource_index.ad_group_id(
+                resource_index.campaign_id(campaign_name), ad["ad_group_name"]
+            )
+            if ad_group_id:
+                ad_group_paths[ad_group_key] = ad_group_service.ad_group_path(
+                    customer_id, ad_group_id
+                )
+            else:
+                ad_group_operation = client.get_type("MutateOperation")
+                ad_group = ad_group_operation.ad_group_operation.create
+                ad_group.resource_name = ad_group_service.ad_group_path(
+                    customer_id, next_temp_id
+                )
+                ad_group.name = ad["ad_group_name"]
+                ad_group.campaign = campaign_paths[campaign_name]
+                ad_group.type_ = client.enums.AdGroupTypeEnum.SEARCH_STANDARD
+                ad_group.cpc_bid_micros = _DEFAULT_AD_GROUP_CPC_MICROS
+                ad_group.status = client.enums.AdGroupStatusEnum.ENABLED
+                operations.append(ad_group_operation)
+                ad_group_paths[ad_group_key] = ad_group.resource_name
+                next_temp_id -= 1
+
+        ad_group_ad_operation = client.get_type("MutateOperation")
+        ad_group_ad = ad_group_ad_operation.ad_group_ad_operation.create
+        ad_group_ad.ad_group = ad_group_paths[ad_group_key]
+        ad_group_ad.status = client.enums.AdGroupAdStatusEnum.PAUSED
+        ad_group_ad.ad.final_urls.append(ad["final_url"])
+        for text in ad["headlines"]:
+            headline_asset = client.get_type("AdTextAsset")
+            headline_asset.text = text
+            ad_group_ad.ad.responsive_search_ad.headlines.append(headline_asset)
+        for text in ad["descriptions"]:
+            description_asset = client.get_type("AdTextAsset")
+            description_asset.text = text
+            ad_group_ad.ad.responsive_search_ad.descriptions.append(description_asset)
+        operations.append(ad_group_ad_operation)
+
+        for keyword in ad["keywords"]:
+            keyword_operation = client.get_type("MutateOperation")
+            criterion = keyword_operation.ad_group_criterion_operation.create
+            criterion.ad_group = ad_group_paths[ad_group_key]
+            criterion.keyword.text = keyword
+            criterion.keyword.match_type = client.enums.KeywordMatchTypeEnum.BROAD
+            criterion.status = client.enums.AdGroupCriterionStatusEnum.ENABLED
+            criterion.cpc_bid_micros = _DEFAULT_KEYWORD_CPC_MICROS
+            operations.append(keyword_operation)
+
+    return list(groups.values())
+
+
+def _operation_type(operation):
+    """Returns the name of the operation set in a MutateOperation, e.g. "ad_group_operation"."""
+    return type(operation).pb(operation).WhichOneof("operation")
+
+
+def _is_temporary(resource_name):
+    return resource_name.rsplit("/", 1)[-1].startswith("-")
+
+
+def _pack_operation_groups(groups, max_operations):
+    """
+    Packs per-campaign operation groups into as few requests as possible.
+
+    A group larger than `max_operations` is split over several requests. Its
+    budget, campaign, geo targeting and ad group creates are moved to the
+    front, so they are created by the first request, and the ads and keywords
+    of the later requests refer to them by the real resource names that
+    _resolve_references() fills in.
+    """
+    batches = [[]]
+    for operations in groups:
+        if len(operations) > max_operations:
+            operations = sorted(
+                operations, key=lambda op: _operation_type(op) not in _SETUP_OPERATIONS
+            )
+            batches.extend(
+                operations[start : start + max_operations]
+                for start in range(0, len(operations), max_operations)
+            )
+            batches.append([])
+            continue
+        if batches[-1] and len(batches[-1]) + len(operations) > max_operations:
+            batches.append([])
+        batches[-1].extend(operations)
+    return [batch for batch in batches if batch]
+
+
+def _resolve_references(operations, created):
+    """
+    Replaces temporary resource names created by earlier requests with the real ones.
+
+    Operations whose parent was meant to be created by an earlier request but
+    failed are dropped, since the API could not resolve their reference.
+
+    Args:
+        operations (list): The MutateOperations of one request.
+        created (dict): Real resource names keyed by temporary resource name.
+
+    Returns:
+        list: The operations that can be sent.
+    """
+    local = set()
+    for operation in operations:
+        operation_type = _operation_type(operation)
+        create = getattr(operation, operation_type).create
+        if create.resource_name:
+            local.add(create.resource_name)
+
+    resolved = []
+    for operation in operations:
+        operation_type = _operation_type(operation)
+        field = _REFERENCE_FIELDS.get(operation_type)
+        if field:
+            create = getattr(operation, operation_type).create
+            reference = getattr(create, field)
+            if reference in created:
+                setattr(create, field, created[reference])
+            elif _is_temporary(reference) and reference not in local:
+                print(f"Skipping {operation_type}: {reference} was not created.")
+                continue
+        resolved.append(operation)
+    return resolved
+
+
+def _created_resource_names(operations, response, failed):
+    """Maps the temporary resource names of a request's creates to the real ones."""
+    created = {}
+    for index, (operation, result) in enumerate(
+        zip(operations, response.mutate_operation_responses)
+    ):
+        create = getattr(operation, _operation_type(operation)).create
+        if index in failed or not create.resource_name:
+            continue
+        result_type = type(result).pb(result).WhichOneof("response")
+        created[create.resource_name] = getattr(result, result_type).resource_name
+    return created
+
+
+def _report_partial_failures(client, response):
+    """Prints the failed operations of a partial-failure mutate and returns their indexes."""
+    failed = set()
+    if not response.partial_failure_error.code:
+        return failed
+    failure_type = type(client.get_type("GoogleAdsFailure"))
+    for detail in response.partial_failure_error.details:
+        failure = failure_type.deserialize(detail.value)
+        for error in failure.errors:
+            index = error.location.field_path_elements[0].index
+            failed.add(index)
+            print(f'\tOperation {index} failed with message "{error.message}".')
+    return failed
+
+
+def create_search_ads_bulk(
+    client,
+    customer_id,
+    ads,
+    resource_index=None,
+    geo_resolver=None,
+    partial_failure=True,
+    max_operations=_MAX_MUTATE_OPERATIONS,
+):
+    """
+    Creates many responsive search ads with a handful of RPCs.
+
+    Existing campaigns and ad groups come from a ResourceIndex, which is loaded
+    once if not given, and the geo targets from a GeoTargetResolver. Every budget, campaign, geo criterion, ad group,
+    ad and keyword is then created through GoogleAdsService.Mutate in as few
+    requests as the operation limit allows, instead of up to eight RPCs per ad.
+
+    Args:
+        client (GoogleAdsClient): The Google Ads client.
+        customer_id (str): The customer ID without dashes.
+        ads (list of dict): The ads, each with "campaign_name", "ad_group_name",
+            "final_url", "headlines", "descriptions" and "keywords".
+        resource_index (ResourceIndex, optional): A prefetched index of the
+            customer's campaigns and ad groups. It is updated with the new entities.
+        geo_resolver (GeoTargetResolver, optional): The resolver for the geo
+            targets of new campaigns.
+        partial_failure (bool): Create the valid operations of a request even if
+            some fail. With False, each request is applied atomically.
+        max_operations (int): The maximum number of operations per request.
+
+    Returns:
+        list of str: The resource names of the created ads.
+    """
+    valid_ads = []
+    for ad in ads:
+        sections, rejected = validate_responsive_search_ad(
+            {"headlines": ad["headlines"], "descriptions": ad["descriptions"]}
+        )
+        if rejected or any(missing_assets(sections).values()):
+            print(
+                f"Skipping ad for {ad['final_url']}: invalid headlines or descriptions."
+            )
+            continue
+        valid_ads.append({**ad, **sections})
+
+    resource_index = resource_index or ResourceIndex(client, customer_id)
+    locations = []
+    if any(not resource_index.campaign_id(ad["campaign_name"]) for ad in valid_ads):
+        geo_resolver = geo_resolver or GeoTargetResolver(client, customer_id)
+        locations = geo_resolver.resolve("US")
+
+    groups = build_search_ad_operations(
+        client, customer_id, valid_ads, resource_index, locations
+    )
+    ga_service = client.get_service("GoogleAdsService")
+    ad_resource_names = []
+    created = {}
+    for operations in _pack_operation_groups(groups, max_operations):
+        operations = _resolve_references(operations, created)
+        if not operations:
+            continue
+        try:
+            response = ga_service.mutate(
+                customer_id=customer_id,
+                mutate_operations=operations,
+                partial_failure=partial_failure,
+            )
+        except GoogleAdsException as ex:
+            handle_googleads_exception(ex)
+            continue
+
+        failed = _report_partial_failures(client, response)
+        created.update(_created_resource_names(operations, response, failed))
+        resource_index.update_from_mutate(operations, response, failed)
+        for index, result in enumerate(response.mutate_operation_responses):
+            if index not in failed and result.ad_group_ad_result.resource_name:
+                ad_resource_names.append(result.ad_group_ad_result.resource_name)
+        print(
+            f"Applied {len(operations) - len(failed)} of {len(operations)} operations."
+        )
+
+    print(f"Created {len(ad_resource_names)} Responsive Search Ads.")
+    return ad_resource_names
+
+
+def generate_search_ad_assets(final_url, keyword_list, api_key=None):
+    """
+    Writes validated headlines and descriptions for the page an ad links to.
+
+    Args:
+        final_url (str): The landing page, whose text describes the product.
+        keyword_list (list of str): The ad group's keywords, used in the prompt.
+        api_key (str, optional): The OpenAI API key. Defaults to OPENAI_API_KEY.
+
+    Returns:
+        dict: Lists of headlines and descriptions (and the other sections of
+        rsaparser.SECTION_TITLES) that fit the Google Ads limits, or an empty
+        dict if the page or the ad could not be generated.
+    """
+    try:
+        response = cached_get(final_url)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching URL content: {e}")
+        return {}
+
+    description = clean_html(response.text, remove_tags=("script", "style"))
+    keyword_ideas = [
+        {"text": keyword.strip('[]"'), "avg_monthly_searches": 0}
+        for keyword in keyword_list
+    ]
+    return generate_structured_responsive_search_ad(
+        description, api_key or os.getenv("OPENAI_API_KEY"), keyword_ideas
+    )
+
+
 def handle_googleads_exception(exception):
     print(
         f'Request with ID "{exception.request_id}" failed with status '
@@ -326,12 +688,6 @@ if __name__ == "__main__":
     campaign_name = "Power control Solutions"
     ad_group_name = "Power Control"
     final_url = "https://www.rfwel.com/us/index.php/4g-lte-frequency-bands"
-    headline_part1 = "Control Power Remotely"
-    headline_part2 = "Smart Power Monitoring"
-    headline_part3 = "Reliable Power Switches"
-    description1 = "Manage power outlets with ease using our remote control solutions."
-    description2 = "Ensure your devices are always powered with advanced monitoring."
-
     # Sample  Broad Match Keywords
     broad_match_keywords = [
         "remote power switch",
@@ -360,6 +716,17 @@ if __name__ == "__main__":
     # Combine all keywords into one list
     keyword_list = broad_match_keywords + phrase_match_keywords + exact_match_keywords
 
+    # Write the headlines and descriptions from the landing page, validated
+    # against the Google Ads limits and repaired where they break them
+    assets = generate_search_ad_assets(final_url, keyword_list)
+    if not assets:
+        print("Failed to generate headlines and descriptions.")
+        sys.exit(1)
+    headlines = assets["headlines"]
+    descriptions = assets["descriptions"]
+
+    # Quota errors are retried per call by the client's scheduler (adsscheduler.py),
+    # so the whole ad is never re-run and no entity is created twice
     try:
         create_search_ad(
             client,
@@ -367,28 +734,16 @@ if __name__ == "__main__":
             campaign_name,
             ad_group_name,
             final_url,
-            headline_part1,
-            headline_part2,
-            headline_part3,
-            description1,
-            description2,
+            headlines,
+            descriptions,
             keyword_list,
         )
         print("Successfully created Google Responsive Search Ad.")
-    except ResourceExhausted as e:
-        print("Quota exceeded: Retrying after a delay.")
-        time.sleep(60)  # Wait for 60 seconds before retrying
-        # Retry the operation
-        create_search_ad(
-            client,
-            customer_id,
-            campaign_name,
-            ad_group_name,
-            final_url,
-            headline_part1,
-            headline_part2,
-            headline_part3,
-            description1,
-            description2,
-            keyword_list,
+    except GoogleAdsException as ex:
+        handle_googleads_exception(ex)
+    except grpc.RpcError as ex:
+        if ex.code() != grpc.StatusCode.RESOURCE_EXHAUSTED:
+            raise
+        print(
+            "Quota exceeded: the request was retried but the quota is still exhausted."
         )
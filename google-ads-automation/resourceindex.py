@@ -0,0 +1,125 @@
+import threading
+
+_CAMPAIGN_QUERY = """
+    SELECT
+        campaign.id,
+        campaign.name
+    FROM
+        campaign
+    WHERE
+        campaign.status != 'REMOVED'
+    """
+_AD_GROUP_QUERY = """
+    SELECT
+        campaign.id,
+        ad_group.id,
+        ad_group.name
+    FROM
+        ad_group
+    WHERE
+        ad_group.status != 'REMOVED'
+        AND campaign.status != 'REMOVED'
+    """
+
+
+def quote_gaql(value):
+    """Quotes a string literal for a GAQL query, escaping quotes and backslashes."""
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _resource_id(resource_name):
+    return int(resource_name.split("/")[-1])
+
+
+class ResourceIndex:
+    """
+    An in-memory index of a customer's campaigns and ad groups, keyed by name.
+
+    The index is loaded with two streamed GAQL queries, one for campaigns and one
+    for ad groups, instead of a search per pushed ad. Entities created later are
+    added with add_campaign/add_ad_group (or update_from_mutate for bulk
+    requests), so the index stays current without further read RPCs.
+    """
+
+    def __init__(self, client, customer_id, load=True):
+        self.client = client
+        self.customer_id = customer_id
+        self._lock = threading.Lock()
+        self._campaigns = {}
+        self._ad_groups = {}
+        if load:
+            self.load()
+
+    def load(self):
+        """(Re)loads every campaign and ad group of the customer."""
+        ga_service = self.client.get_service("GoogleAdsService")
+        campaigns = {}
+        for batch in ga_service.search_stream(
+            customer_id=self.customer_id, query=_CAMPAIGN_QUERY
+        ):
+            for row in batch.results:
+                campaigns[row.campaign.name] = row.campaign.id
+
+        ad_groups = {}
+        for batch in ga_service.search_stream(
+            customer_id=self.customer_id, query=_AD_GROUP_QUERY
+        ):
+            for row in batch.results:
+                ad_groups[(row.campaign.id, row.ad_group.name)] = row.ad_group.id
+
+        with self._lock:
+            self._campaigns = campaigns
+            self._ad_groups = ad_groups
+        print(f"Indexed {len(campaigns)} campaigns and {len(ad_groups)} ad groups.")
+
+    def campaign_id(self, campaign_name):
+        """Returns the ID of the campaign with the given name, or None."""
+        with self._lock:
+            return self._campaigns.get(campaign_name)
+
+    def ad_group_id(self, campaign_id, ad_group_name):
+        """Returns the ID of the named ad group within the campaign, or None."""
+        if campaign_id is None:
+            return None
+        with self._lock:
+            return self._ad_groups.get((int(campaign_id), ad_group_name))
+
+    def add_campaign(self, campaign_name, campaign_id):
+        """Records a newly created campaign."""
+        with self._lock:
+            self._campaigns[campaign_name] = int(campaign_id)
+
+    def add_ad_group(self, campaign_id, ad_group_name, ad_group_id):
+        """Records a newly created ad group."""
+        with self._lock:
+            self._ad_groups[(int(campaign_id), ad_group_name)] = int(ad_group_id)
+
+    def update_from_mutate(self, operations, response, failed=()):
+        """
+        Records the campaigns and ad groups created by a GoogleAdsService.Mutate call.
+
+        Args:
+            operations (list): The MutateOperations that were sent.
+            response (MutateGoogleAdsResponse): The response to the request.
+            failed (set of int): Indexes of operations that failed under partial failure.
+        """
+        # Temporary resource names map to the real ones in the same request
+        created = {}
+        for index, (operation, result) in enumerate(
+            zip(operations, response.mutate_operation_responses)
+        ):
+            if index in failed:
+                continue
+            if operation.campaign_operation.create.name:
+                campaign = operation.campaign_operation.create
+                resource_name = result.campaign_result.resource_name
+                created[campaign.resource_name] = resource_name
+                self.add_campaign(campaign.name, _resource_id(resource_name))
+            elif operation.ad_group_operation.create.name:
+                ad_group = operation.ad_group_operation.create
+                campaign = created.get(ad_group.campaign, ad_group.campaign)
+                self.add_ad_group(
+                    _resource_id(campaign),
+                    ad_group.name,
+                    _resource_id(result.ad_group_result.resource_name),
+                )
@@ -0,0 +1,388 @@
+import functools
+
+import requests
+
+from keywordideas import select_prompt_keywords
+from llmcache import get_default_cache
+from llmclient import (
+    ChatCompletionError,
+    complete_batch,
+    complete_chat,
+    gather_with_client,
+    stream_chat_completion,
+)
+from rsaparser import (
+    ASSET_MAX_LENGTHS,
+    DESCRIPTION_MAX_LENGTH,
+    HEADLINE_MAX_LENGTH,
+    REPAIR_RESPONSE_FORMAT,
+    RESPONSE_FORMAT,
+    SECTION_TITLES,
+    ResponsiveSearchAdParser,
+    missing_assets,
+    parse_responsive_search_ad_json,
+    validate_responsive_search_ad,
+)
+
+_DEFAULT_MAX_REPAIRS = 2  # Follow-up calls allowed for rejected ad assets
+
+
+def build_responsive_search_ad_request(description, keyword_ideas, structured=False):
+    """
+    Builds the chat completion request for responsive search ad suggestions.
+
+    Args:
+        description (str): The product description.
+        keyword_ideas (list of dict): A list of keyword ideas, each with "text" and "avg_monthly_searches".
+        structured (bool): Request JSON matching rsaparser.RESPONSE_FORMAT instead of text.
+
+    Returns:
+        dict: The request body for the chat completions endpoint.
+    """
+    # A deduplicated sample across themes instead of every raw idea
+    keywords = select_prompt_keywords(keyword_ideas)
+    keyword_list = ", ".join(keywords)
+
+    prompt = (
+        f"Generate SEO-optimized Responsive Search Ad content using the provided keywords, emphasizing the most relevant keywords. "
+        f"Ensure that the generated content strictly adheres to the following character limits, including spaces and punctuation:\n"
+        f"1. Headlines: Create 15 brief headlines, each no longer than 29 characters, including spaces and punctuation. Do not include numbering; just list each headline as a separate sentence.\n"
+        f"2. Descriptions: Create 4 descriptions, each no longer than 89 characters, including spaces and punctuation. Again, do not include numbering; just list each description as a separate sentence.\n"
+        f"3. Broad Match Keywords: Recommend broad match keywords from the list.\n"
+        f"4. Phrase Match Keywords: Recommend phrase match keywords from the list.\n"
+        f"5. Exact Match Keywords: Recommend exact match keywords from the list.\n"
+        f"6. Page Title: Suggest an SEO-optimized page title no longer than 60 characters, including spaces and punctuation, using the keywords.\n"
+        f"\nKeywords: {keyword_list}\n\nProduct Description: {description}"
+    )
+
+    data = {
+        "model": "gpt-4o",  # Or your preferred GPT-4 model
+        "messages": [
+            {
+                "role": "system",
+                "content": "Generate responsive search ad content and a page title based on the provided description and keywords.",
+            },
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.9,
+        "max_tokens": 1500,
+    }
+
+    if structured:
+        # Ask for JSON matching rsaparser.RESPONSE_FORMAT instead of markdown text
+        data["response_format"] = RESPONSE_FORMAT
+        data["messages"][1]["content"] += (
+            "\n\nReturn the content as JSON with the fields headlines, descriptions, "
+            "broad_match_keywords, phrase_match_keywords, exact_match_keywords and page_title."
+        )
+
+    return data
+
+
+def generate_responsive_search_ad(
+    description, api_key, keyword_ideas, cache=None, bypass_cache=False
+):
+    """
+    Generates responsive search ad suggestions and a page title using GPT-4.
+
+    Args:
+        description (str): The product description.
+        api_key (str): The OpenAI API key.
+        keyword_ideas (list of dict): A list of keyword ideas, each with "text" and "avg_monthly_searches".
+        cache (LLMCache, optional): The completion cache. Defaults to the shared cache.
+        bypass_cache (bool): Always call the API, e.g. to get fresh ad variations.
+
+    Returns:
+        str: The generated ad content and page title, or an empty string on error.
+    """
+    data = build_responsive_search_ad_request(description, keyword_ideas)
+    return _request_completion(data, api_key, cache, bypass_cache)
+
+
+def _request_completion(data, api_key, cache=None, bypass_cache=False):
+    """Sends a chat completion request through the completion cache and returns its text."""
+    try:
+        # Identical requests are answered from the completion cache unless bypassed
+        return complete_chat(data, api_key, cache or get_default_cache(), bypass_cache)
+    except ChatCompletionError as e:
+        print(f"HTTP error occurred: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+    return ""
+
+
+def build_asset_repair_request(description, sections, rejected, missing=None):
+    """
+    Builds a follow-up request that regenerates only the rejected assets.
+
+    Args:
+        description (str): The product description.
+        sections (dict): The valid sections of the ad so far.
+        rejected (list of dict): The assets reported by validate_responsive_search_ad.
+        missing (dict): The number of headlines and descriptions the ad still needs
+            to reach the Google Ads minimum, as returned by missing_assets.
+
+    Returns:
+        dict: The request body for the chat completions endpoint.
+    """
+    # Replace every rejected asset, and ask for more if the ad is below the minimum
+    counts = {}
+    for section in ASSET_MAX_LENGTHS:
+        replaced = sum(1 for asset in rejected if asset["section"] == section)
+        counts[section] = max(replaced, (missing or {}).get(section, 0))
+
+    lines = [
+        f"- {SECTION_TITLES[asset['section']][:-1]} \"{asset['text']}\": {asset['reason']}"
+        for asset in rejected
+    ]
+    prompt = (
+        "Some responsive search ad assets were rejected:\n"
+        + "\n".join(lines)
+        + f"\n\nWrite {counts['headlines']} new headlines of at most {HEADLINE_MAX_LENGTH} characters "
+        f"and {counts['descriptions']} new descriptions of at most {DESCRIPTION_MAX_LENGTH} characters, "
+        f"including spaces and punctuation. They must differ from these existing headlines: "
+        f"{'; '.join(sections.get('headlines', []))}\n\nProduct Description: {description}"
+    )
+
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {
+                "role": "system",
+                "content": "Rewrite responsive search ad assets so they fit Google Ads character limits.",
+            },
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.7,
+        "max_tokens": 400,
+        "response_format": REPAIR_RESPONSE_FORMAT,
+    }
+
+
+def generate_structured_responsive_search_ad(
+    description,
+    api_key,
+    keyword_ideas,
+    cache=None,
+    bypass_cache=False,
+    max_repairs=_DEFAULT_MAX_REPAIRS,
+):
+    """
+    Generates a responsive search ad as validated, structured sections.
+
+    The ad is requested as JSON, so no text parsing can go wrong, and every
+    headline and description is checked against the 30/90 character limits and
+    for duplicates. Rejected assets are replaced with small follow-up calls that
+    regenerate only those assets, instead of regenerating the whole ad.
+
+    Args:
+        description (str): The product description.
+        api_key (str): The OpenAI API key.
+        keyword_ideas (list of dict): A list of keyword ideas, each with "text" and "avg_monthly_searches".
+        cache (LLMCache, optional): The completion cache. Defaults to the shared cache.
+        bypass_cache (bool): Always call the API, e.g. to get fresh ad variations.
+        max_repairs (int): The number of follow-up calls allowed for rejected assets.
+
+    Returns:
+        dict: Lists of valid item strings keyed by rsaparser.SECTION_TITLES keys, or
+        an empty dict on error. Assets still invalid after the repairs are dropped.
+    """
+    data = build_responsive_search_ad_request(
+        description, keyword_ideas, structured=True
+    )
+    sections = parse_responsive_search_ad_json(
+        _request_completion(data, api_key, cache, bypass_cache)
+    )
+    if sections is None:
+        print("Failed to parse the structured ad content.")
+        return {}
+
+    sections, rejected = validate_responsive_search_ad(sections)
+    for _ in range(max_repairs):
+        missing = missing_assets(sections)
+        if not rejected and not any(missing.values()):
+            break
+        if rejected:
+            print(f"Regenerating {len(rejected)} rejected ad assets.")
+        if any(missing.values()):
+            print(
+                f"Requesting {missing['headlines']} more headlines and "
+                f"{missing['descriptions']} more descriptions to reach the Google Ads minimum."
+            )
+        repair = parse_responsive_search_ad_json(
+            _request_completion(
+                build_asset_repair_request(description, sections, rejected, missing),
+                api_key,
+                cache,
+                bypass_cache,
+            )
+        )
+        if repair is None:
+            break
+        # Revalidate the kept assets together with the replacements, so a
+        # replacement that duplicates a kept headline is caught as well
+        sections, rejected = validate_responsive_search_ad(
+            {
+                **sections,
+                **{
+                    section: sections[section] + repair[section]
+                    for section in ASSET_MAX_LENGTHS
+                },
+            }
+        )
+
+    for asset in rejected:
+        print(f"Dropped {asset['section'][:-1]} \"{asset['text']}\": {asset['reason']}")
+    return sections
+
+
+def stream_responsive_search_ad(
+    description, api_key, keyword_ideas, cache=None, bypass_cache=False
+):
+    """
+    Streams responsive search ad suggestions and a page title using GPT-4o.
+
+    Headlines, descriptions and the other sections are yielded one line at a
+    time as soon as the model has written them, so interactive callers can show
+    the first headline without waiting for the whole completion. The full text
+    is stored in the completion cache once the stream ends.
+
+    Args:
+        description (str): The product description.
+        api_key (str): The OpenAI API key.
+        keyword_ideas (list of dict): A list of keyword ideas, each with "text" and "avg_monthly_searches".
+        cache (LLMCache, optional): The completion cache. Defaults to the shared cache.
+        bypass_cache (bool): Always call the API, but still store the new completion.
+
+    Yields:
+        tuple: (section, text) pairs, where section is a key of rsaparser.SECTION_TITLES.
+    """
+    data = build_responsive_search_ad_request(description, keyword_ideas)
+    parser = ResponsiveSearchAdParser()
+
+    cache = cache or get_default_cache()
+    if not bypass_cache:
+        cached = cache.get(data)
+        if cached is not None:
+            yield from parser.feed(cached) + parser.close()
+            return
+
+    chunks = []
+    try:
+        for chunk in stream_chat_completion(data, api_key):
+            chunks.append(chunk)
+            yield from parser.feed(chunk)
+        yield from parser.close()
+    except requests.exceptions.HTTPError as http_err:
+        print(f"HTTP error occurred: {http_err} - {http_err.response.text}")
+        return
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return
+
+    message_content = "".join(chunks).strip()
+    if message_content:
+        cache.set(data, message_content)
+
+
+async def generate_responsive_search_ad_async(
+    description, keyword_ideas, llm_client, bypass_cache=False
+):
+    """
+    Generates responsive search ad suggestions through a shared AsyncChatClient.
+
+    Args:
+        description (str): The product description.
+        keyword_ideas (list of dict): A list of keyword ideas, each with "text" and "avg_monthly_searches".
+        llm_client (AsyncChatClient): The client that pools connections and paces requests.
+        bypass_cache (bool): Always call the API, e.g. to get fresh ad variations.
+
+    Returns:
+        str: The generated ad content and page title, or an empty string on error.
+    """
+    try:
+        return await llm_client.complete(
+            build_responsive_search_ad_request(description, keyword_ideas),
+            bypass_cache=bypass_cache,
+        )
+    except ChatCompletionError as e:
+        print(f"HTTP error occurred: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+    return ""
+
+
+def generate_responsive_search_ads(
+    products,
+    api_key,
+    max_in_flight=16,
+    requests_per_minute=None,
+    tokens_per_minute=None,
+    cache=None,
+    bypass_cache=False,
+):
+    """
+    Generates responsive search ad suggestions for many products concurrently.
+
+    Args:
+        products (list of tuple): (description, keyword_ideas) pairs, one per product.
+        api_key (str): The OpenAI API key.
+        max_in_flight (int): The number of requests allowed to run at once.
+        requests_per_minute (int, optional): The account's request rate limit.
+        tokens_per_minute (int, optional): The account's token rate limit.
+        cache (LLMCache, optional): The completion cache. Defaults to the shared cache.
+        bypass_cache (bool): Always call the API, e.g. to get fresh ad variations.
+
+    Returns:
+        list of str: The generated ad content for each product, in input order.
+        Failed products get an empty string.
+    """
+    return gather_with_client(
+        [
+            functools.partial(
+                generate_responsive_search_ad_async,
+                description,
+                keyword_ideas,
+                bypass_cache=bypass_cache,
+            )
+            for description, keyword_ideas in products
+        ],
+        api_key,
+        cache or get_default_cache(),
+        max_in_flight=max_in_flight,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+    )
+
+
+def generate_responsive_search_ads_batch(
+    products, api_key, state_dir, poll_interval=60
+):
+    """
+    Generates responsive search ad suggestions offline through the OpenAI Batch API.
+
+    Use this for nightly catalog refreshes where throughput and cost matter more
+    than latency. The job's progress is kept in `state_dir`, so calling this again
+    with the same products after an interruption resumes the existing batch.
+
+    Args:
+        products (dict): (description, keyword_ideas) pairs keyed by a custom ID,
+            such as the product SKU or URL.
+        api_key (str): The OpenAI API key.
+        state_dir (str): The directory holding the batch files and progress.
+        poll_interval (int): Seconds between batch status checks.
+
+    Returns:
+        dict: The generated ad content keyed by custom ID, with an empty string
+        for each product that failed.
+    """
+    batch_requests = {
+        custom_id: build_responsive_search_ad_request(description, keyword_ideas)
+        for custom_id, (description, keyword_ideas) in products.items()
+    }
+    # The results are cached, so later interactive runs can reuse them
+    return complete_batch(
+        batch_requests, api_key, state_dir, poll_interval, get_default_cache()
+    )
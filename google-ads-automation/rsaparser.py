@@ -0,0 +1,249 @@
+import json
+import re
+
+# Sections of the generated ad content, in the order the prompt asks for them
+SECTION_TITLES = {
+    "headlines": "Headlines",
+    "descriptions": "Descriptions",
+    "broad_match_keywords": "Broad Match Keywords",
+    "phrase_match_keywords": "Phrase Match Keywords",
+    "exact_match_keywords": "Exact Match Keywords",
+    "page_title": "Page Title",
+}
+_SECTIONS_BY_NAME = {title.lower(): key for key, title in SECTION_TITLES.items()}
+
+# Google Ads limits for responsive search ad text assets
+HEADLINE_MAX_LENGTH = 30
+DESCRIPTION_MAX_LENGTH = 90
+ASSET_MAX_LENGTHS = {
+    "headlines": HEADLINE_MAX_LENGTH,
+    "descriptions": DESCRIPTION_MAX_LENGTH,
+}
+MIN_ASSETS = {"headlines": 3, "descriptions": 2}
+MAX_ASSETS = {"headlines": 15, "descriptions": 4}
+
+
+def _string_array(description):
+    return {"type": "array", "items": {"type": "string"}, "description": description}
+
+
+# Structured output schema for the chat completions `response_format` field.
+# Strict schemas cannot express string lengths, so limits are checked afterwards
+# by validate_responsive_search_ad.
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "responsive_search_ad",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "headlines": _string_array(
+                    "Up to 15 headlines of at most 30 characters."
+                ),
+                "descriptions": _string_array(
+                    "Up to 4 descriptions of at most 90 characters."
+                ),
+                "broad_match_keywords": _string_array("Broad match keywords."),
+                "phrase_match_keywords": _string_array("Phrase match keywords."),
+                "exact_match_keywords": _string_array("Exact match keywords."),
+                "page_title": {"type": "string"},
+            },
+            "required": list(SECTION_TITLES),
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Schema for repair calls, which only return replacement headlines and descriptions
+REPAIR_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "responsive_search_ad_assets",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "headlines": _string_array("Replacement headlines."),
+                "descriptions": _string_array("Replacement descriptions."),
+            },
+            "required": ["headlines", "descriptions"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# A section header such as "**Headlines:**", "### Page Title" or "6. Page Title: ..."
+_HEADER_PATTERN = re.compile(
+    r"^[#>*\s\d.)-]*(?P<name>"
+    + "|".join(re.escape(name) for name in _SECTIONS_BY_NAME)
+    + r")\s*(?:\*\*)?\s*(?::|$)\s*(?:\*\*)?\s*(?P<rest>.*)$",
+    re.IGNORECASE,
+)
+_BULLET_PATTERN = re.compile(r"^(?:[-*•]|\d+[.)])\s+")
+
+
+def _clean_item(line):
+    """Strips list markers and markdown emphasis from an item line."""
+    item = _BULLET_PATTERN.sub("", line.strip())
+    return item.strip("*").strip()
+
+
+class ResponsiveSearchAdParser:
+    """
+    Incrementally parses generated ad content into (section, text) items.
+
+    Feed it text as it streams in; each complete line under a recognized section
+    header (Headlines, Descriptions, keyword lists, Page Title) is returned as
+    soon as its newline arrives.
+    """
+
+    def __init__(self):
+        self.section = None
+        self._buffer = ""
+
+    def feed(self, text):
+        """
+        Adds streamed text and returns the items completed by it.
+
+        Args:
+            text (str): The next chunk of generated content.
+
+        Returns:
+            list of tuple: (section, text) pairs, where section is a key of SECTION_TITLES.
+        """
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        items = []
+        for line in lines:
+            items.extend(self._parse_line(line))
+        return items
+
+    def close(self):
+        """Parses whatever is left once the stream has ended."""
+        line, self._buffer = self._buffer, ""
+        return self._parse_line(line)
+
+    def _parse_line(self, line):
+        header = _HEADER_PATTERN.match(line.strip())
+        if header:
+            self.section = _SECTIONS_BY_NAME[header.group("name").lower()]
+            rest = _clean_item(header.group("rest"))
+            return [(self.section, rest)] if rest else []
+
+        item = _clean_item(line)
+        if self.section and item:
+            return [(self.section, item)]
+        return []
+
+
+def parse_responsive_search_ad(content):
+    """
+    Parses complete generated ad content.
+
+    Args:
+        content (str): The text returned by the model.
+
+    Returns:
+        dict: A list of item strings for each key of SECTION_TITLES.
+    """
+    sections = {key: [] for key in SECTION_TITLES}
+    parser = ResponsiveSearchAdParser()
+    for section, text in parser.feed(content) + parser.close():
+        sections[section].append(text)
+    return sections
+
+
+def format_responsive_search_ad(sections):
+    """
+    Formats parsed sections back into the text layout the model is asked for.
+
+    Args:
+        sections (dict): Lists of item strings keyed by SECTION_TITLES keys.
+
+    Returns:
+        str: The formatted ad content, or an empty string if there are no items.
+    """
+    blocks = [
+        f"**{title}:**\n" + "\n".join(sections[key])
+        for key, title in SECTION_TITLES.items()
+        if sections.get(key)
+    ]
+    return "\n\n".join(blocks)
+
+
+def parse_responsive_search_ad_json(content):
+    """
+    Parses a structured (JSON) response into the same layout as parse_responsive_search_ad.
+
+    Args:
+        content (str): The JSON text returned by the model.
+
+    Returns:
+        dict: A list of item strings for each key of SECTION_TITLES, or None if the
+        content is not a JSON object.
+    """
+    try:
+        payload = json.loads(content)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+
+    sections = {}
+    for key in SECTION_TITLES:
+        value = payload.get(key) or []
+        if isinstance(value, str):
+            value = [value]
+        sections[key] = [str(item).strip() for item in value if str(item).strip()]
+    return sections
+
+
+def _dedup_key(text):
+    return " ".join(text.lower().split())
+
+
+def validate_responsive_search_ad(sections):
+    """
+    Checks headlines and descriptions against the Google Ads text limits.
+
+    Assets are stripped of surrounding whitespace. Empty, over-length and
+    duplicate assets (compared case- and whitespace-insensitively) are removed
+    and reported, so only they need to be regenerated.
+
+    Args:
+        sections (dict): Lists of item strings keyed by SECTION_TITLES keys.
+
+    Returns:
+        tuple: (valid_sections, rejected), where valid_sections is a copy of
+        `sections` without the rejected assets and rejected is a list of dicts
+        with "section", "text" and "reason" keys.
+    """
+    valid_sections = {key: list(items) for key, items in sections.items()}
+    rejected = []
+    for section, max_length in ASSET_MAX_LENGTHS.items():
+        seen = set()
+        valid = []
+        for text in sections.get(section, []):
+            text = text.strip()
+            if not text:
+                continue
+            if len(text) > max_length:
+                reason = f"{len(text)} characters, the limit is {max_length}"
+            elif _dedup_key(text) in seen:
+                reason = "duplicate"
+            else:
+                seen.add(_dedup_key(text))
+                valid.append(text)
+                continue
+            rejected.append({"section": section, "text": text, "reason": reason})
+        valid_sections[section] = valid[: MAX_ASSETS[section]]
+    return valid_sections, rejected
+
+
+def missing_assets(sections):
+    """Returns how many more headlines and descriptions an ad needs to be accepted."""
+    return {
+        section: max(0, minimum - len(sections.get(section, [])))
+        for section, minimum in MIN_ASSETS.items()
+    }
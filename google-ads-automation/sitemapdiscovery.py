@@ -0,0 +1,311 @@
+import os
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from urllib.parse import urlsplit
+
+import requests
+
+# Default location of the sitemap state store
+_DEFAULT_STATE_PATH = os.getenv(
+    "SITEMAP_STATE_PATH", os.path.join(".cache", "sitemaps.sqlite3")
+)
+_DEFAULT_TIMEOUT = 30  # Seconds to wait for a sitemap before giving up
+_CHUNK_SIZE = 64 * 1024  # Bytes fed to the XML parser at a time
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _local_name(tag):
+    """Strips the namespace from an element tag, e.g. "{...}loc" -> "loc"."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def is_sitemap(location):
+    """Returns True if a URL or path points to an XML sitemap (.xml or .xml.gz)."""
+    path = location.split("?", 1)[0].lower()
+    return path.endswith((".xml", ".xml.gz"))
+
+
+def find_sitemaps(site_url, session=None, timeout=_DEFAULT_TIMEOUT):
+    """
+    Finds the sitemaps of a site from the Sitemap: lines of its robots.txt.
+
+    Args:
+        site_url (str): Any URL of the site, e.g. "https://example.com/".
+        session (requests.Session, optional): A session to reuse connections from.
+        timeout (float): Seconds to wait for robots.txt before giving up.
+
+    Returns:
+        list of str: The sitemap URLs, or /sitemap.xml at the site root if
+        robots.txt lists none or cannot be read.
+    """
+    parts = urlsplit(site_url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    sitemaps = []
+    try:
+        response = (session or requests).get(f"{origin}/robots.txt", timeout=timeout)
+        if response.status_code == 200:
+            for line in response.text.splitlines():
+                name, _, value = line.split("#", 1)[0].partition(":")
+                if name.strip().lower() == "sitemap" and value.strip():
+                    sitemaps.append(value.strip())
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching robots.txt: {e}")
+    return list(dict.fromkeys(sitemaps)) or [f"{origin}/sitemap.xml"]
+
+
+def _read_chunks(location, session=None, timeout=_DEFAULT_TIMEOUT):
+    """Yields the bytes of a sitemap URL or file in chunks, decompressing .gz sitemaps."""
+    if location.startswith(("http://", "https://")):
+        response = (session or requests).get(location, stream=True, timeout=timeout)
+        response.raise_for_status()
+        chunks = response.iter_content(_CHUNK_SIZE)
+        close = response.close
+    else:
+        f = open(location, "rb")
+        chunks = iter(lambda: f.read(_CHUNK_SIZE), b"")
+        close = f.close
+
+    try:
+        decompressor = None
+        for chunk in chunks:
+            # Gzipped sitemaps are not always served with Content-Encoding: gzip
+            if decompressor is None:
+                decompressor = (
+                    zlib.decompressobj(zlib.MAX_WBITS | 16)
+                    if chunk.startswith(_GZIP_MAGIC)
+                    else False
+                )
+            if not decompressor:
+                yield chunk
+                continue
+            # Inflate at most one chunk's worth at a time to keep memory flat
+            while chunk:
+                yield decompressor.decompress(chunk, _CHUNK_SIZE)
+                chunk = decompressor.unconsumed_tail
+        if decompressor:
+            yield decompressor.flush()
+    finally:
+        close()
+
+
+def iter_sitemap_entries(location, session=None, timeout=_DEFAULT_TIMEOUT):
+    """
+    Streams the entries of one sitemap or sitemap index.
+
+    The document is parsed incrementally as it downloads, and each entry is
+    discarded once it has been read, so memory use does not grow with the
+    size of the sitemap.
+
+    Args:
+        location (str): The URL or file path of the sitemap.
+        session (requests.Session, optional): A session to reuse connections from.
+        timeout (float): Seconds to wait for the sitemap before giving up.
+
+    Yields:
+        tuple: (kind, loc, lastmod), where kind is "url" for a page or "sitemap"
+        for a nested sitemap, and lastmod is None when the entry has none.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+
+    def read_events():
+        nonlocal root
+        for event, element in parser.read_events():
+            if root is None:
+                root = element
+            if event != "end" or _local_name(element.tag) not in ("url", "sitemap"):
+                continue
+            fields = {
+                _local_name(child.tag): (child.text or "").strip() for child in element
+            }
+            if fields.get("loc"):
+                yield _local_name(element.tag), fields["loc"], fields.get("lastmod")
+            root.clear()  # Drop the entries that have been read
+
+    for chunk in _read_chunks(location, session, timeout):
+        parser.feed(chunk)
+        yield from read_events()
+    parser.close()
+    yield from read_events()
+
+
+def iter_sitemap(location, session=None, timeout=_DEFAULT_TIMEOUT):
+    """
+    Streams every page of a sitemap, following nested sitemap indexes.
+
+    Args:
+        location (str): The URL or file path of the sitemap or sitemap index.
+        session (requests.Session, optional): A session to reuse connections from.
+        timeout (float): Seconds to wait for each sitemap before giving up.
+
+    Yields:
+        tuple: A (url, lastmod) pair for each page.
+    """
+    seen = {location}
+    pending = [location]
+    while pending:
+        for kind, loc, lastmod in iter_sitemap_entries(pending.pop(), session, timeout):
+            if kind == "url":
+                yield loc, lastmod
+            elif loc not in seen:
+                seen.add(loc)
+                pending.append(loc)
+
+
+class SitemapDiscovery:
+    """
+    Finds the new and changed pages of a site from its sitemaps.
+
+    The <lastmod> of every processed page and nested sitemap is kept in SQLite.
+    discover() streams the sitemaps and yields only pages that are new or
+    whose <lastmod> changed, and skips nested sitemaps whose own <lastmod> is
+    unchanged without downloading them. Nothing is recorded until commit() is
+    called, so pages that failed to process are offered again on the next run.
+
+    Usage:
+        discovery = SitemapDiscovery()
+        for url in discovery.discover("https://example.com/sitemap.xml"):
+            process(url)
+        discovery.commit()
+    """
+
+    def __init__(
+        self, path=_DEFAULT_STATE_PATH, session=None, timeout=_DEFAULT_TIMEOUT
+    ):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.session = session
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pending_pages = {}
+        self._pending_sitemaps = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                lastmod TEXT,
+                processed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sitemaps (
+                url TEXT PRIMARY KEY,
+                lastmod TEXT,
+                processed_at REAL NOT NULL
+            );
+            """)
+        self._connection.commit()
+
+    def _stored(self, table, url):
+        """Returns (found, lastmod) for a page or sitemap in the state store."""
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT lastmod FROM {table} WHERE url = ?", (url,)
+            ).fetchone()
+        return row is not None, (row[0] if row else None)
+
+    def discover(self, sitemap_url):
+        """
+        Streams the pages of a sitemap that are new or changed since they were committed.
+
+        A page without <lastmod> is only yielded the first time it is seen.
+
+        Args:
+            sitemap_url (str): The URL or file path of the sitemap or sitemap
+                index, or the URL of a site, whose sitemaps are then read from
+                its robots.txt (see find_sitemaps).
+
+        Yields:
+            str: The URLs of new and changed pages.
+        """
+        if is_sitemap(sitemap_url) or not sitemap_url.startswith(
+            ("http://", "https://")
+        ):
+            roots = [sitemap_url]
+        else:
+            roots = find_sitemaps(sitemap_url, self.session, self.timeout)
+        seen_sitemaps = set(roots)
+        stack = roots[::-1]
+        skipped = 0
+        while stack:
+            location = stack.pop()
+            # Pages of nested sitemaps are tracked so the sitemap can be committed with them
+            parent = None if location in roots else location
+            for kind, loc, lastmod in iter_sitemap_entries(
+                location, self.session, self.timeout
+            ):
+                if kind == "sitemap":
+                    if loc in seen_sitemaps:
+                        continue
+                    seen_sitemaps.add(loc)
+                    found, stored = self._stored("sitemaps", loc)
+                    if found and lastmod and lastmod == stored:
+                        skipped += 1
+                        continue
+                    self._pending_sitemaps[loc] = (lastmod, set())
+                    if parent:
+                        self._pending_sitemaps[parent][1].add(loc)
+                    stack.append(loc)
+                    continue
+
+                if loc in self._pending_pages:
+                    continue
+                found, stored = self._stored("pages", loc)
+                if found and (not lastmod or lastmod == stored):
+                    continue
+                self._pending_pages[loc] = lastmod
+                if parent:
+                    self._pending_sitemaps[parent][1].add(loc)
+                yield loc
+
+        if skipped:
+            print(f"Skipped {skipped} unchanged sitemaps.")
+
+    def commit(self, urls=None):
+        """
+        Records discovered pages as processed, so later runs skip them until they change.
+
+        A nested sitemap is recorded once all of its discovered pages and
+        sitemaps are, so it is not skipped while some pages still need processing.
+
+        Args:
+            urls (iterable of str, optional): The discovered URLs that were
+                processed successfully. Defaults to all of them.
+        """
+        urls = set(self._pending_pages) if urls is None else set(urls)
+        now = time.time()
+        pages = [
+            (url, lastmod, now)
+            for url, lastmod in self._pending_pages.items()
+            if url in urls
+        ]
+        # Repeat until no more sitemaps complete, so indexes follow their children
+        done = set(urls)
+        sitemaps = []
+        while True:
+            completed = [
+                (url, lastmod, now)
+                for url, (lastmod, pending) in self._pending_sitemaps.items()
+                if url not in done and pending <= done
+            ]
+            if not completed:
+                break
+            sitemaps.extend(completed)
+            done.update(url for url, _, _ in completed)
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO pages (url, lastmod, processed_at) VALUES (?, ?, ?)",
+                pages,
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO sitemaps (url, lastmod, processed_at) VALUES (?, ?, ?)",
+                sitemaps,
+            )
+            self._connection.commit()
+        for url, _, _ in pages:
+            del self._pending_pages[url]
+        for url, _, _ in sitemaps:
+            del self._pending_sitemaps[url]
@@ -0,0 +1,101 @@
+import grpc
+import pytest
+
+import adsscheduler
+from adsscheduler import AdsScheduler
+
+
+class _RpcError(grpc.RpcError):
+    """A raw gRPC failure like the ones the Google Ads interceptors pass through."""
+
+    def __init__(self, code):
+        super().__init__(code.name)
+        self._code = code
+
+    def code(self):
+        return self._code
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(adsscheduler.time, "sleep", lambda seconds: None)
+
+
+def _failing(errors, result="ok"):
+    calls = []
+
+    def method(*args, **kwargs):
+        calls.append(args)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return method, calls
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        grpc.StatusCode.UNAVAILABLE,
+        grpc.StatusCode.DEADLINE_EXCEEDED,
+        grpc.StatusCode.RESOURCE_EXHAUSTED,
+    ],
+)
+def test_reads_retry_transient_rpc_errors(code):
+    method, calls = _failing([_RpcError(code)])
+
+    result = AdsScheduler(max_retries=2).call(("token", "1"), "get_thing", method)
+
+    assert result == "ok"
+    assert len(calls) == 2
+
+
+def test_mutates_retry_only_quota_rpc_errors():
+    scheduler = AdsScheduler(max_retries=2)
+    method, calls = _failing([_RpcError(grpc.StatusCode.RESOURCE_EXHAUSTED)])
+    assert scheduler.call(("token", "1"), "mutate_campaigns", method) == "ok"
+    assert len(calls) == 2
+
+    method, calls = _failing([_RpcError(grpc.StatusCode.UNAVAILABLE)])
+    with pytest.raises(grpc.RpcError):
+        scheduler.call(("token", "1"), "mutate_campaigns", method)
+    assert len(calls) == 1
+
+
+def test_other_rpc_errors_are_not_retried():
+    method, calls = _failing([_RpcError(grpc.StatusCode.INVALID_ARGUMENT)])
+
+    with pytest.raises(grpc.RpcError):
+        AdsScheduler(max_retries=2).call(("token", "1"), "get_thing", method)
+
+    assert len(calls) == 1
+
+
+def test_gives_up_after_max_retries():
+    errors = [_RpcError(grpc.StatusCode.UNAVAILABLE)] * 3
+    method, calls = _failing(errors)
+
+    with pytest.raises(grpc.RpcError):
+        AdsScheduler(max_retries=2).call(("token", "1"), "get_thing", method)
+
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize("method_name", ["search", "generate_keyword_ideas"])
+def test_later_pages_are_read_inside_the_retry_loop(method_name):
+    calls = []
+
+    def pages():
+        yield "row 1"
+        if len(calls) == 1:
+            raise _RpcError(grpc.StatusCode.UNAVAILABLE)
+        yield "row 2"
+
+    def method(*args, **kwargs):
+        calls.append(args)
+        return pages()
+
+    result = AdsScheduler(max_retries=2).call(("token", "1"), method_name, method)
+
+    assert result == ["row 1", "row 2"]
+    assert len(calls) == 2
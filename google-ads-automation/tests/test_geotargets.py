@@ -0,0 +1,157 @@
+from types import SimpleNamespace
+
+import pytest
+
+import geotargets
+from geotargets import GeoTargetResolver
+
+_CUSTOMER_ID = "1234567890"
+
+
+class _FakeGoogleAdsService:
+    """Answers geo target queries from `geo_targets` and criteria queries from `criteria`."""
+
+    def __init__(self):
+        self.geo_targets = {}
+        self.criteria = []
+        self.queries = []
+
+    def search(self, customer_id, query):
+        self.queries.append(query)
+        if "FROM geo_target_constant" in query:
+            return iter(
+                SimpleNamespace(
+                    geo_target_constant=SimpleNamespace(resource_name=resource_name)
+                )
+                for condition, resource_names in self.geo_targets.items()
+                if condition in query
+                for resource_name in resource_names
+            )
+        return iter(
+            SimpleNamespace(
+                campaign_criterion=SimpleNamespace(
+                    location=SimpleNamespace(geo_target_constant=location)
+                )
+            )
+            for location in self.criteria
+        )
+
+
+class _FakeClient:
+    def __init__(self):
+        self.ga_service = _FakeGoogleAdsService()
+
+    def get_service(self, name):
+        assert name == "GoogleAdsService"
+        return self.ga_service
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000000.0]
+    monkeypatch.setattr(geotargets.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def client():
+    fake = _FakeClient()
+    fake.ga_service.geo_targets = {
+        "target_type = 'Country'": ["geoTargetConstants/2840"],
+        "name = 'Arizona'": ["geoTargetConstants/21136"],
+    }
+    return fake
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "geo" / "geotargets.sqlite3")
+
+
+def test_resolve_queries_the_country_without_a_name(client, path, clock):
+    resolver = GeoTargetResolver(client, _CUSTOMER_ID, path=path)
+
+    assert resolver.resolve("us") == ["geoTargetConstants/2840"]
+    (query,) = client.ga_service.queries
+    assert "geo_target_constant.country_code = 'US'" in query
+    assert "geo_target_constant.target_type = 'Country'" in query
+    assert "geo_target_constant.status = 'ENABLED'" in query
+    assert "geo_target_constant.name" not in query
+
+
+def test_resolve_queries_a_named_location(client, path, clock):
+    resolver = GeoTargetResolver(client, _CUSTOMER_ID, path=path)
+
+    assert resolver.resolve("US", name="Arizona", target_type="State") == [
+        "geoTargetConstants/21136"
+    ]
+    query = client.ga_service.queries[0]
+    assert "geo_target_constant.name = 'Arizona'" in query
+    assert "geo_target_constant.target_type = 'State'" in query
+
+
+def test_resolve_quotes_names(client, path, clock):
+    resolver = GeoTargetResolver(client, _CUSTOMER_ID, path=path)
+
+    assert resolver.resolve("US", name="O'Fallon", target_type="City") == []
+    assert "geo_target_constant.name = 'O\\'Fallon'" in client.ga_service.queries[0]
+
+
+def test_resolve_caches_lookups_across_resolvers(client, path, clock):
+    GeoTargetResolver(client, _CUSTOMER_ID, path=path).resolve("US")
+    resolver = GeoTargetResolver(client, _CUSTOMER_ID, path=path)
+
+    # The key ignores the case of the country code and name
+    assert resolver.resolve("us") == ["geoTargetConstants/2840"]
+    assert resolver.resolve("US", target_type="Country") == ["geoTargetConstants/2840"]
+    assert len(client.ga_service.queries) == 1
+
+
+def test_resolve_queries_again_after_the_ttl(client, path, clock):
+    resolver = GeoTargetResolver(client, _CUSTOMER_ID, path=path, ttl=60)
+    resolver.resolve("US")
+    client.ga_service.geo_targets["target_type = 'Country'"] = [
+        "geoTargetConstants/9999"
+    ]
+
+    clock[0] += 59
+    assert resolver.resolve("US") == ["geoTargetConstants/2840"]
+    clock[0] += 2
+    assert resolver.resolve("US") == ["geoTargetConstants/9999"]
+    assert len(client.ga_service.queries) == 2
+
+
+def test_resolve_does_not_cache_empty_results(client, path, clock):
+    resolver = GeoTargetResolver(client, _CUSTOMER_ID, path=path)
+    assert resolver.resolve("US", name="Atlantis", target_type="City") == []
+
+    client.ga_service.geo_targets["name = 'Atlantis'"] = ["geoTargetConstants/1"]
+
+    assert resolver.resolve("US", name="Atlantis", target_type="City") == [
+        "geoTargetConstants/1"
+    ]
+    assert len(client.ga_service.queries) == 2
+
+
+def test_campaign_locations_are_queried_once_and_updated(client, path):
+    client.ga_service.criteria = ["geoTargetConstants/2840"]
+    resolver = GeoTargetResolver(client, _CUSTOMER_ID, path=path)
+
+    assert resolver.campaign_locations(77) == {"geoTargetConstants/2840"}
+    assert "campaign.id = 77" in client.ga_service.queries[0]
+    resolver.add_campaign_locations("77", ["geoTargetConstants/21136"])
+
+    assert resolver.campaign_locations("77") == {
+        "geoTargetConstants/2840",
+        "geoTargetConstants/21136",
+    }
+    assert len(client.ga_service.queries) == 1
+
+
+def test_add_campaign_locations_for_a_new_campaign_skips_the_query(client, path):
+    resolver = GeoTargetResolver(client, _CUSTOMER_ID, path=path)
+
+    resolver.add_campaign_locations(90, ["geoTargetConstants/2840"])
+
+    assert resolver.campaign_locations(90) == {"geoTargetConstants/2840"}
+    assert client.ga_service.queries == []
@@ -0,0 +1,57 @@
+import datetime
+
+import pytest
+
+import googleadsclient
+from adsscheduler import ScheduledService
+
+
+@pytest.fixture(autouse=True)
+def fake_token(monkeypatch):
+    refreshes = []
+
+    def refresh_access_token(credentials):
+        refreshes.append(credentials)
+        credentials.token = "access-token"
+        credentials.expiry = googleadsclient._utcnow() + datetime.timedelta(hours=1)
+        return True
+
+    monkeypatch.setattr(googleadsclient, "_refresh_access_token", refresh_access_token)
+    googleadsclient.clear_cache()
+    yield refreshes
+    googleadsclient.clear_cache()
+
+
+def test_factory_builds_services_with_the_default_version():
+    client = googleadsclient.create_google_ads_client("dev-token", "123-456-7890")
+
+    service = client.get_service("GoogleAdsService")
+
+    assert isinstance(service, ScheduledService)
+    assert client.login_customer_id == "1234567890"
+
+
+def test_factory_honours_an_explicit_version():
+    client = googleadsclient.create_google_ads_client(
+        "dev-token", "1234567890", version="v23"
+    )
+
+    service = client.get_service("GoogleAdsService")
+
+    assert ".v23." in type(service._service).__module__
+
+
+def test_clients_and_tokens_are_shared(fake_token):
+    first = googleadsclient.create_google_ads_client("dev-token", "1234567890")
+    second = googleadsclient.create_google_ads_client("dev-token", "1234567890")
+
+    assert first is second
+    assert len(fake_token) == 1
+
+
+def test_no_client_without_a_token(monkeypatch):
+    monkeypatch.setattr(
+        googleadsclient, "_refresh_access_token", lambda credentials: False
+    )
+
+    assert googleadsclient.create_google_ads_client("dev-token", "1") is None
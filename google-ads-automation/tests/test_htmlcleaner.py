@@ -0,0 +1,62 @@
+import glob
+import os
+
+import pytest
+
+from htmlcleaner import (
+    DEFAULT_REMOVE_TAGS,
+    _ENGINE_PREFERENCE,
+    available_engines,
+    clean_html,
+)
+
+FIXTURE_PAGES = sorted(
+    glob.glob(os.path.join(os.path.dirname(__file__), "fixtures", "pages", "*.html"))
+)
+
+
+def _engine(name):
+    if name not in available_engines():
+        pytest.skip(f"{name} is not installed")
+    return name
+
+
+@pytest.mark.parametrize("engine", _ENGINE_PREFERENCE)
+@pytest.mark.parametrize("remove_tags", [DEFAULT_REMOVE_TAGS, ("script", "style")])
+@pytest.mark.parametrize("path", FIXTURE_PAGES, ids=os.path.basename)
+def test_engines_match_bs4_on_saved_pages(path, remove_tags, engine):
+    with open(path, "rb") as f:
+        page = f.read()
+
+    expected = clean_html(page, remove_tags=remove_tags, engine="bs4")
+
+    assert expected
+    assert clean_html(page, remove_tags=remove_tags, engine=_engine(engine)) == expected
+    # Pages that were already decoded, e.g. requests' response.text
+    text = page.decode("utf-8", "replace")
+    assert clean_html(text, remove_tags=remove_tags, engine=engine) == clean_html(
+        text, remove_tags=remove_tags, engine="bs4"
+    )
+
+
+@pytest.mark.parametrize("engine", _ENGINE_PREFERENCE)
+@pytest.mark.parametrize(
+    "page",
+    [
+        "<p>a</p><template><p>row</p></template><p>b</p>",
+        "<p>a<![CDATA[x < y]]>b</p>",
+        "<p>a</p><script>var s = '<p>x</p>';</script><style>p {}</style>",
+        # No declared charset, so the decoding is up to BeautifulSoup's detection
+        "<p>Id\xe9al pour l'ext\xe9rieur, \xe0 partir de 49 \xa4</p>".encode("latin-1"),
+    ],
+)
+def test_engines_match_bs4_on_edge_cases(page, engine):
+    expected = clean_html(page, remove_tags=(), engine="bs4")
+    assert clean_html(page, remove_tags=(), engine=_engine(engine)) == expected
+
+
+def test_selectolax_moves_stray_table_text():
+    # Known difference: Lexbor applies the HTML5 rules for misplaced table content
+    page = "<table><tr><td>cell</td></tr>stray</table>"
+    assert clean_html(page, engine="bs4") == "cell stray"
+    assert clean_html(page, engine=_engine("selectolax")) == "stray cell"
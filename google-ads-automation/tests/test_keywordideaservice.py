@@ -0,0 +1,183 @@
+import importlib.util
+import os
+from types import SimpleNamespace
+
+import pytest
+from google.ads.googleads.client import GoogleAdsClient
+from google.oauth2.credentials import Credentials
+
+import keywordideaservice
+from keywordideaservice import KeywordIdeaService
+
+
+def _idea(text, searches):
+    return SimpleNamespace(
+        text=text, keyword_idea_metrics=SimpleNamespace(avg_monthly_searches=searches)
+    )
+
+
+class _FakeIdeaService:
+    """Answers every request with one idea per seed keyword, or per URL."""
+
+    def __init__(self):
+        self.requests = []
+
+    def generate_keyword_ideas(self, request):
+        self.requests.append(request)
+        seeds = list(request.keyword_seed.keywords) or list(
+            request.keyword_and_url_seed.keywords
+        )
+        url = request.url_seed.url or request.keyword_and_url_seed.url
+        ideas = [_idea(f"{seed} ideas", 100) for seed in seeds]
+        if url:
+            ideas.append(_idea(f"ideas for {url}", 50))
+        return iter(ideas)
+
+
+class _FakeClient:
+    """Builds real request types but answers with a fake KeywordPlanIdeaService."""
+
+    def __init__(self):
+        self._client = GoogleAdsClient(
+            credentials=Credentials(token="token"),
+            developer_token="dev-token",
+            use_proto_plus=True,
+        )
+        self.enums = self._client.enums
+        self.idea_service = _FakeIdeaService()
+
+    def get_type(self, name):
+        return self._client.get_type(name)
+
+    def get_service(self, name):
+        if name == "KeywordPlanIdeaService":
+            return self.idea_service
+        return self._client.get_service(name)
+
+
+@pytest.fixture
+def client():
+    return _FakeClient()
+
+
+@pytest.fixture
+def service(client, tmp_path):
+    return KeywordIdeaService(
+        client, "1234567890", path=str(tmp_path / "ideas.sqlite3")
+    )
+
+
+def test_generate_reads_ideas_and_caches_them(service, client):
+    ideas = service.generate(url="https://example.com/switch")
+
+    assert ideas == [
+        {"text": "ideas for https://example.com/switch", "avg_monthly_searches": 50}
+    ]
+    assert service.generate(url="https://example.com/switch") == ideas
+    assert len(client.idea_service.requests) == 1
+    request = client.idea_service.requests[0]
+    assert request.page_size == keywordideaservice._PAGE_SIZE
+    assert request.language == "languageConstants/1000"
+    assert list(request.geo_target_constants) == ["geoTargetConstants/2840"]
+
+
+def test_expired_entries_are_requested_again(client, tmp_path):
+    service = KeywordIdeaService(
+        client, "1", path=str(tmp_path / "ideas.sqlite3"), ttl=0
+    )
+
+    service.generate(keywords=["switch"])
+    service.generate(keywords=["switch"])
+
+    assert len(client.idea_service.requests) == 2
+
+
+def test_long_keyword_seeds_are_split(service, client):
+    keywords = [f"keyword {i:02}" for i in range(45)]
+
+    ideas = service.generate(keywords=keywords)
+
+    assert [len(r.keyword_seed.keywords) for r in client.idea_service.requests] == [
+        20,
+        20,
+        5,
+    ]
+    assert len(ideas) == 45
+
+
+def test_generate_many_requests_identical_seeds_once(service, client):
+    seeds = [
+        "https://example.com/a",
+        ["switch", "power"],
+        ["power", "switch "],
+        "https://example.com/a",
+    ]
+
+    results = service.generate_many(seeds, max_workers=2)
+
+    assert len(client.idea_service.requests) == 2
+    assert results[0] == results[3]
+    assert results[1] == results[2]
+
+
+def test_default_service_is_none_when_the_client_cannot_be_created(monkeypatch):
+    monkeypatch.setattr(keywordideaservice, "_default_service", None)
+    monkeypatch.setattr(keywordideaservice, "create_google_ads_client", lambda: None)
+
+    assert keywordideaservice.get_default_idea_service() is None
+    # Creation is retried on the next call instead of caching the failure
+    assert keywordideaservice._default_service is None
+
+
+def _load_ai_ads_automation():
+    path = os.path.join(os.path.dirname(__file__), "..", "ai-ads-automation.py")
+    spec = importlib.util.spec_from_file_location("ai_ads_automation", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_keyword_ideas_are_empty_without_a_client(monkeypatch):
+    monkeypatch.setattr(keywordideaservice, "_default_service", None)
+    monkeypatch.setattr(keywordideaservice, "create_google_ads_client", lambda: None)
+    ai_ads_automation = _load_ai_ads_automation()
+
+    assert ai_ads_automation.generate_keyword_ideas("https://example.com/a") == []
+    assert ai_ads_automation.generate_keyword_ideas_bulk(["a", "b"]) == [[], []]
+
+
+def test_sitemap_pages_get_keyword_ideas_in_bulk(monkeypatch):
+    ai_ads_automation = _load_ai_ads_automation()
+    pages = [f"https://example.com/{i}" for i in range(5)]
+    committed = []
+
+    class _Discovery:
+        def discover(self, url):
+            return iter(pages)
+
+        def commit(self, urls):
+            committed.extend(urls)
+
+    batches = []
+
+    def generate_keyword_ideas_bulk(seeds):
+        batches.append(seeds)
+        return [[{"text": seed, "avg_monthly_searches": 10}] for seed in seeds]
+
+    def process_url(url, content_index, keyword_ideas=None):
+        assert keyword_ideas == [{"text": url, "avg_monthly_searches": 10}]
+        return not url.endswith("3")
+
+    monkeypatch.setattr(ai_ads_automation, "SitemapDiscovery", _Discovery)
+    monkeypatch.setattr(
+        ai_ads_automation, "generate_keyword_ideas_bulk", generate_keyword_ideas_bulk
+    )
+    monkeypatch.setattr(ai_ads_automation, "process_url", process_url)
+    monkeypatch.setattr(ai_ads_automation, "_SITEMAP_BATCH_SIZE", 2)
+
+    processed = ai_ads_automation.process_sitemap(
+        "https://example.com/sitemap.xml", None
+    )
+
+    assert batches == [pages[0:2], pages[2:4], pages[4:5]]
+    assert processed == committed == [url for url in pages if not url.endswith("3")]
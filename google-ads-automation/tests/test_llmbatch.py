@@ -0,0 +1,115 @@
+import json
+import os
+
+import pytest
+
+from fakebatchserver import FakeBatchServer
+from llmbatch import BatchJob
+
+
+def _requests(count):
+    return {
+        f"sku-{i}": {
+            "model": "gpt-4o",
+            "messages": [{"role": "user", "content": f"Product {i}"}],
+        }
+        for i in range(count)
+    }
+
+
+@pytest.fixture
+def server():
+    with FakeBatchServer(polls_before_complete=2) as fake:
+        yield fake
+
+
+def test_run_uploads_polls_and_maps_results_by_custom_id(server, tmp_path):
+    job = BatchJob(str(tmp_path), "test-key", base_url=server.base_url, poll_interval=0)
+
+    results = job.run(_requests(3))
+
+    assert results == {f"sku-{i}": f"Reply to: Product {i}" for i in range(3)}
+    assert server.calls == {
+        "upload": 1,
+        "create": 1,
+        "poll": 3,
+        "download": 1,
+        "chat": 0,
+    }
+
+
+def test_failed_requests_map_to_none(tmp_path):
+    with FakeBatchServer(polls_before_complete=0, fail_ids={"sku-1"}) as server:
+        job = BatchJob(
+            str(tmp_path), "test-key", base_url=server.base_url, poll_interval=0
+        )
+        results = job.run(_requests(3))
+
+    assert results["sku-1"] is None
+    assert results["sku-0"] == "Reply to: Product 0"
+
+
+def test_requests_are_split_into_parts(server, tmp_path):
+    job = BatchJob(
+        str(tmp_path),
+        "test-key",
+        base_url=server.base_url,
+        poll_interval=0,
+        max_requests_per_batch=2,
+    )
+
+    results = job.run(_requests(5))
+
+    assert len(results) == 5 and all(results.values())
+    assert server.calls["create"] == 3
+
+
+def test_resume_from_state_does_not_resubmit(server, tmp_path):
+    batch_requests = _requests(3)
+    first = BatchJob(
+        str(tmp_path), "test-key", base_url=server.base_url, poll_interval=0
+    )
+    # Stop after submitting, as if the process was killed while waiting
+    first._prepare(batch_requests)
+    for part in first.state["parts"]:
+        first._submit(part)
+    with open(tmp_path / "state.json", encoding="utf-8") as f:
+        assert "batch_id" in json.load(f)["parts"][0]
+
+    resumed = BatchJob(
+        str(tmp_path), "test-key", base_url=server.base_url, poll_interval=0
+    )
+    results = resumed.run(batch_requests)
+
+    assert results["sku-2"] == "Reply to: Product 2"
+    assert server.calls["upload"] == 1 and server.calls["create"] == 1
+
+    # A finished job answers from its downloaded output without calling the API
+    calls = dict(server.calls)
+    assert (
+        BatchJob(str(tmp_path), base_url=server.base_url).run(batch_requests) == results
+    )
+    assert server.calls == calls
+
+
+def test_resume_with_different_requests_is_rejected(server, tmp_path):
+    BatchJob(str(tmp_path), "test-key", base_url=server.base_url, poll_interval=0).run(
+        _requests(2)
+    )
+
+    with pytest.raises(ValueError):
+        BatchJob(str(tmp_path), base_url=server.base_url).run(_requests(3))
+
+
+def test_output_is_written_to_state_dir(server, tmp_path):
+    # "input-" in the state directory itself must not be rewritten
+    state_dir = tmp_path / "input-jobs" / "nightly"
+    job = BatchJob(
+        str(state_dir), "test-key", base_url=server.base_url, poll_interval=0
+    )
+
+    job.run(_requests(1))
+
+    output_path = job.state["parts"][0]["output_path"]
+    assert output_path == os.path.join(str(state_dir), "output-0.jsonl")
+    assert os.path.exists(output_path)
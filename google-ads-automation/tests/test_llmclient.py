@@ -0,0 +1,148 @@
+import asyncio
+import functools
+
+import pytest
+
+import llmclient
+from fakebatchserver import FakeBatchServer
+from llmcache import LLMCache, MemoryBackend
+from llmclient import (
+    AsyncChatClient,
+    ChatCompletionError,
+    complete_batch,
+    complete_chat,
+    create_chat_completion,
+    gather_with_client,
+    stream_chat_completion,
+)
+
+
+def _request(text):
+    return {"model": "gpt-4o", "messages": [{"role": "user", "content": text}]}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with FakeBatchServer(polls_before_complete=0) as fake:
+        monkeypatch.setattr(llmclient, "OPENAI_BASE_URL", fake.base_url)
+        yield fake
+
+
+@pytest.fixture
+def cache():
+    return LLMCache(MemoryBackend())
+
+
+def _complete(server, data, **options):
+    async def run():
+        async with AsyncChatClient(
+            "test-key", base_url=server.base_url, **options
+        ) as client:
+            return await client.complete(data)
+
+    return asyncio.run(run())
+
+
+def test_async_client_completes_and_caches(server, cache):
+    assert _complete(server, _request("Hello"), cache=cache) == "Reply to: Hello"
+    assert _complete(server, _request("Hello"), cache=cache) == "Reply to: Hello"
+
+    assert server.calls["chat"] == 1
+
+
+def test_async_client_retries_rate_limits_and_server_errors(server):
+    server.chat_failures = [429, 503]
+
+    assert _complete(server, _request("Hello")) == "Reply to: Hello"
+    assert server.calls["chat"] == 3
+
+
+def test_async_client_gives_up_after_max_retries(server):
+    server.chat_failures = [429, 429, 429]
+
+    with pytest.raises(ChatCompletionError) as error:
+        _complete(server, _request("Hello"), max_retries=2)
+
+    assert error.value.status_code == 429
+    assert server.calls["chat"] == 3
+
+
+def test_async_client_does_not_retry_client_errors(server):
+    server.chat_failures = [400]
+
+    with pytest.raises(ChatCompletionError):
+        _complete(server, _request("Hello"))
+
+    assert server.calls["chat"] == 1
+
+
+def test_backoff_prefers_retry_after():
+    assert llmclient._backoff(3, "2.5") == 2.5
+    assert 4.0 <= llmclient._backoff(3, "soon") <= 8.0
+    assert llmclient._backoff(10) <= 60.0
+
+
+def test_create_chat_completion_retries(server):
+    server.chat_failures = [503, 429]
+
+    content = create_chat_completion(_request("Hello"), "test-key")
+
+    assert llmclient.get_message_content(content) == "Reply to: Hello"
+    assert server.calls["chat"] == 3
+
+
+def test_create_chat_completion_raises_after_max_retries(server):
+    server.chat_failures = [500, 500]
+
+    with pytest.raises(ChatCompletionError):
+        create_chat_completion(_request("Hello"), "test-key", max_retries=1)
+
+    assert server.calls["chat"] == 2
+
+
+def test_complete_chat_uses_the_cache(server, cache):
+    assert complete_chat(_request("Hello"), "test-key", cache) == "Reply to: Hello"
+    assert complete_chat(_request("Hello"), "test-key", cache) == "Reply to: Hello"
+    assert server.calls["chat"] == 1
+
+    complete_chat(_request("Hello"), "test-key", cache, bypass_cache=True)
+    assert server.calls["chat"] == 2
+
+
+def test_stream_chat_completion_yields_chunks(server):
+    chunks = list(stream_chat_completion(_request("A longer prompt"), "test-key"))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == "Reply to: A longer prompt"
+    assert server.chat_requests[0]["stream"] is True
+
+
+def test_gather_with_client_keeps_input_order(server, cache):
+    async def complete(text, client):
+        return await client.complete(_request(text))
+
+    texts = [f"Product {i}" for i in range(5)]
+    results = gather_with_client(
+        [functools.partial(complete, text) for text in texts],
+        "test-key",
+        cache,
+        base_url=server.base_url,
+        max_in_flight=2,
+    )
+
+    assert results == [f"Reply to: {text}" for text in texts]
+    assert server.calls["chat"] == 5
+
+
+def test_complete_batch_caches_results(server, cache, tmp_path, monkeypatch):
+    monkeypatch.setattr("llmbatch.OPENAI_BASE_URL", server.base_url)
+    server.fail_ids = {"sku-1"}
+    batch_requests = {f"sku-{i}": _request(f"Product {i}") for i in range(2)}
+
+    results = complete_batch(
+        batch_requests, "test-key", str(tmp_path), poll_interval=0, cache=cache
+    )
+
+    assert results == {"sku-0": "Reply to: Product 0", "sku-1": ""}
+    assert cache.get(batch_requests["sku-0"]) == "Reply to: Product 0"
+    assert cache.get(batch_requests["sku-1"]) is None
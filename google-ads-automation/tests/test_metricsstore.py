@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from metricsstore import MetricsStore
+
+
+def _row(customer_id, day, criterion_id, impressions=10):
+    return (
+        customer_id,
+        day,
+        1,
+        "Campaign",
+        2,
+        "Ad group",
+        criterion_id,
+        f"keyword {criterion_id}",
+        "EXACT",
+        impressions,
+        1,
+        1000,
+    )
+
+
+def test_replace_days_replaces_the_range(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.sqlite3"))
+    store.replace_days("1", "2024-06-01", "2024-06-02", [[_row("1", "2024-06-01", 1)]])
+
+    row_count = store.replace_days(
+        "1",
+        "2024-06-01",
+        "2024-06-02",
+        [[_row("1", "2024-06-01", 2)], [_row("1", "2024-06-02", 3)]],
+    )
+
+    assert row_count == 2
+    assert store.query("SELECT criterion_id FROM keyword_metrics ORDER BY 1") == [
+        (2,),
+        (3,),
+    ]
+    assert store.synced_dates("1") == {"2024-06-01", "2024-06-02"}
+
+
+def test_failed_stream_keeps_the_stored_rows(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.sqlite3"))
+    store.replace_days("1", "2024-06-01", "2024-06-01", [[_row("1", "2024-06-01", 1)]])
+
+    def batches():
+        yield [_row("1", "2024-06-01", 2)]
+        raise RuntimeError("Stream interrupted")
+
+    with pytest.raises(RuntimeError):
+        store.replace_days("1", "2024-06-01", "2024-06-01", batches())
+
+    assert store.query("SELECT criterion_id FROM keyword_metrics") == [(1,)]
+
+
+def test_streams_of_different_customers_overlap(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.sqlite3"))
+    both_streaming = threading.Barrier(2, timeout=5)
+
+    def batches(customer_id):
+        yield [_row(customer_id, "2024-06-01", 1)]
+        # Fails with BrokenBarrierError if the other stream waits on the store's lock
+        both_streaming.wait()
+        time.sleep(0.05)
+        yield [_row(customer_id, "2024-06-01", 2)]
+
+    errors = []
+
+    def sync(customer_id):
+        try:
+            store.replace_days(
+                customer_id, "2024-06-01", "2024-06-01", batches(customer_id)
+            )
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=sync, args=(c,)) for c in ("1", "2")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert store.query("SELECT COUNT(*) FROM keyword_metrics") == [(4,)]
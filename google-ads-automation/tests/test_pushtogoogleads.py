@@ -0,0 +1,384 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from google.ads.googleads.client import GoogleAdsClient
+from google.oauth2.credentials import Credentials
+
+import pushtogoogleads
+import rsagenerator
+from resourceindex import ResourceIndex
+
+_CUSTOMER_ID = "1234567890"
+_LOCATION = "geoTargetConstants/2840"
+# Collection in the resource names the fake service returns, per operation type
+_COLLECTIONS = {
+    "campaign_budget_operation": "campaignBudgets",
+    "campaign_operation": "campaigns",
+    "campaign_criterion_operation": "campaignCriteria",
+    "ad_group_operation": "adGroups",
+    "ad_group_ad_operation": "adGroupAds",
+    "ad_group_criterion_operation": "adGroupCriteria",
+}
+
+
+class _Page:
+    text = "<html><body><h1>Remote Power Switch</h1><script>x()</script></body></html>"
+
+    def raise_for_status(self):
+        pass
+
+
+def test_generate_search_ad_assets_uses_the_validated_generation(monkeypatch):
+    prompts = []
+
+    def request_completion(data, api_key, cache=None, bypass_cache=False):
+        prompts.append(data["messages"][1]["content"])
+        return json.dumps(
+            {
+                "headlines": ["Remote Power Switch", "Smart PDU", "Reboot Remotely"],
+                "descriptions": ["Control outlets anywhere.", "Monitor power use."],
+                "broad_match_keywords": [],
+                "phrase_match_keywords": [],
+                "exact_match_keywords": [],
+                "page_title": "Remote Power Switch",
+            }
+        )
+
+    monkeypatch.setattr(pushtogoogleads, "cached_get", lambda url: _Page())
+    monkeypatch.setattr(rsagenerator, "_request_completion", request_completion)
+
+    assets = pushtogoogleads.generate_search_ad_assets(
+        "https://example.com/switch", ["power switch", "[remote power switch]"], "key"
+    )
+
+    assert assets["headlines"] == [
+        "Remote Power Switch",
+        "Smart PDU",
+        "Reboot Remotely",
+    ]
+    assert assets["descriptions"] == ["Control outlets anywhere.", "Monitor power use."]
+    assert "Remote Power Switch" in prompts[0] and "x()" not in prompts[0]
+    assert "remote power switch" in prompts[0]
+
+
+class _FakeGoogleAdsService:
+    """
+    Applies MutateOperations by handing out increasing real IDs.
+
+    Creates whose name is in `failing_names` fail under partial failure, and the
+    operations that reference their temporary resource names fail with them.
+    """
+
+    def __init__(self, client, failing_names=()):
+        self.client = client
+        self.failing_names = set(failing_names)
+        self.requests = []
+        self.queries = []
+        self.rows = []
+        self._next_id = 1000
+
+    def search(self, customer_id, query):
+        self.queries.append(query)
+        return iter(self.rows)
+
+    def mutate(self, customer_id, mutate_operations, partial_failure):
+        self.requests.append(list(mutate_operations))
+        response = self.client.get_type("MutateGoogleAdsResponse")
+        failure = self.client.get_type("GoogleAdsFailure")
+        created = {}
+        for index, operation in enumerate(mutate_operations):
+            operation_type = pushtogoogleads._operation_type(operation)
+            create = getattr(operation, operation_type).create
+            result = self.client.get_type("MutateOperationResponse")
+            field = pushtogoogleads._REFERENCE_FIELDS.get(operation_type)
+            reference = getattr(create, field) if field else ""
+            if reference in created:
+                setattr(create, field, created[reference])
+            failed = getattr(create, "name", "") in self.failing_names or (
+                pushtogoogleads._is_temporary(reference) and reference not in created
+            )
+            if failed:
+                error = self.client.get_type("GoogleAdsError")
+                error.message = f"{operation_type} failed"
+                error.location.field_path_elements.append(
+                    type(error.location).FieldPathElement(
+                        field_name="mutate_operations", index=index
+                    )
+                )
+                failure.errors.append(error)
+            else:
+                self._next_id += 1
+                resource_name = (
+                    f"customers/{customer_id}/{_COLLECTIONS[operation_type]}/"
+                    f"{self._next_id}"
+                )
+                if create.resource_name:
+                    created[create.resource_name] = resource_name
+                result_field = operation_type.replace("_operation", "_result")
+                getattr(result, result_field).resource_name = resource_name
+            response.mutate_operation_responses.append(result)
+
+        if failure.errors:
+            response.partial_failure_error.code = 3
+            detail = response.partial_failure_error.details.add()
+            detail.value = type(failure).serialize(failure)
+        return response
+
+
+class _FakeClient:
+    """Builds real types and resource paths but answers mutates with a fake service."""
+
+    def __init__(self, failing_names=()):
+        self._client = GoogleAdsClient(
+            credentials=Credentials(token="token"),
+            developer_token="dev-token",
+            use_proto_plus=True,
+        )
+        self.enums = self._client.enums
+        self.ga_service = _FakeGoogleAdsService(self, failing_names)
+
+    def get_type(self, name):
+        return self._client.get_type(name)
+
+    def get_service(self, name):
+        if name == "GoogleAdsService":
+            return self.ga_service
+        return self._client.get_service(name)
+
+
+class _FakeGeoResolver:
+    def resolve(self, country_code):
+        return [_LOCATION]
+
+
+def _ad(campaign_name, ad_group_name, keywords=("power switch",)):
+    return {
+        "campaign_name": campaign_name,
+        "ad_group_name": ad_group_name,
+        "final_url": "https://example.com/switch",
+        "headlines": ["Remote Power Switch", "Smart PDU", "Reboot Remotely"],
+        "descriptions": ["Control outlets anywhere.", "Monitor power use."],
+        "keywords": list(keywords),
+    }
+
+
+def _operation(client, operation_type):
+    operation = client.get_type("MutateOperation")
+    getattr(operation, operation_type).create._pb.SetInParent()
+    return operation
+
+
+def _types(operations):
+    return [pushtogoogleads._operation_type(operation) for operation in operations]
+
+
+@pytest.fixture
+def client():
+    return _FakeClient()
+
+
+@pytest.fixture
+def resource_index(client):
+    return ResourceIndex(client, _CUSTOMER_ID, load=False)
+
+
+def _create(client, ads, resource_index, **kwargs):
+    return pushtogoogleads.create_search_ads_bulk(
+        client,
+        _CUSTOMER_ID,
+        ads,
+        resource_index=resource_index,
+        geo_resolver=_FakeGeoResolver(),
+        **kwargs,
+    )
+
+
+def test_get_existing_campaign_id_quotes_the_name(client):
+    client.ga_service.rows = [SimpleNamespace(campaign=SimpleNamespace(id=77))]
+
+    campaign_id = pushtogoogleads.get_existing_campaign_id(
+        client, _CUSTOMER_ID, "Joe's \\ Switches"
+    )
+
+    assert campaign_id == 77
+    assert "campaign.name = 'Joe\\'s \\\\ Switches'" in client.ga_service.queries[0]
+
+
+def test_get_existing_ad_group_id_quotes_the_name(client):
+    assert (
+        pushtogoogleads.get_existing_ad_group_id(client, _CUSTOMER_ID, "77", "It's")
+        is None
+    )
+
+    query = client.ga_service.queries[0]
+    assert f"ad_group.campaign = 'customers/{_CUSTOMER_ID}/campaigns/77'" in query
+    assert "ad_group.name = 'It\\'s'" in query
+
+
+def test_pack_operation_groups_fills_requests_up_to_the_limit(client):
+    groups = [
+        [_operation(client, "ad_group_ad_operation")] * 3,
+        [_operation(client, "ad_group_ad_operation")] * 4,
+        [_operation(client, "ad_group_ad_operation")] * 2,
+    ]
+
+    batches = pushtogoogleads._pack_operation_groups(groups, 6)
+
+    # Groups are kept whole: 3 + 4 would exceed the limit, 4 + 2 does not
+    assert [len(batch) for batch in batches] == [3, 6]
+
+
+def test_pack_operation_groups_splits_large_groups_with_setup_first(client):
+    small = [_operation(client, "ad_group_ad_operation")]
+    large = [
+        _operation(client, "campaign_budget_operation"),
+        _operation(client, "campaign_operation"),
+        _operation(client, "ad_group_operation"),
+        _operation(client, "ad_group_ad_operation"),
+        _operation(client, "ad_group_criterion_operation"),
+        _operation(client, "ad_group_operation"),
+        _operation(client, "ad_group_ad_operation"),
+    ]
+
+    batches = pushtogoogleads._pack_operation_groups([small, large, small], 3)
+
+    assert [len(batch) for batch in batches] == [1, 3, 3, 1, 1]
+    assert _types(batches[1]) == [
+        "campaign_budget_operation",
+        "campaign_operation",
+        "ad_group_operation",
+    ]
+    assert _types(batches[2]) == [
+        "ad_group_operation",
+        "ad_group_ad_operation",
+        "ad_group_criterion_operation",
+    ]
+
+
+def test_resolve_references_rewrites_temporary_names_and_drops_orphans(client):
+    created_ad_group = "customers/1/adGroups/-3"
+    failed_ad_group = "customers/1/adGroups/-4"
+    local_ad_group = "customers/1/adGroups/-5"
+    operations = []
+    for ad_group in (created_ad_group, failed_ad_group, local_ad_group):
+        operation = client.get_type("MutateOperation")
+        operation.ad_group_ad_operation.create.ad_group = ad_group
+        operations.append(operation)
+    new_ad_group = client.get_type("MutateOperation")
+    new_ad_group.ad_group_operation.create.resource_name = local_ad_group
+    new_ad_group.ad_group_operation.create.campaign = "customers/1/campaigns/77"
+    operations.append(new_ad_group)
+
+    resolved = pushtogoogleads._resolve_references(
+        operations, {created_ad_group: "customers/1/adGroups/501"}
+    )
+
+    assert [
+        operation.ad_group_ad_operation.create.ad_group
+        for operation in resolved
+        if operation.ad_group_ad_operation.create.ad_group
+    ] == ["customers/1/adGroups/501", local_ad_group]
+    assert resolved[-1] is new_ad_group
+
+
+def test_create_search_ads_bulk_creates_new_campaigns_in_one_request(
+    client, resource_index
+):
+    ads = [
+        _ad("Switches", "Remote"),
+        _ad("Switches", "Smart"),
+        _ad("Sensors", "Temperature"),
+    ]
+
+    ad_resource_names = _create(client, ads, resource_index)
+
+    assert len(client.ga_service.requests) == 1
+    assert len(ad_resource_names) == 3
+    assert all("/adGroupAds/" in name for name in ad_resource_names)
+    campaign_id = resource_index.campaign_id("Switches")
+    assert campaign_id and resource_index.campaign_id("Sensors")
+    assert resource_index.ad_group_id(campaign_id, "Remote")
+    assert resource_index.ad_group_id(campaign_id, "Smart")
+    criteria = [
+        operation.campaign_criterion_operation.create
+        for operation in client.ga_service.requests[0]
+        if pushtogoogleads._operation_type(operation) == "campaign_criterion_operation"
+    ]
+    assert [criterion.location.geo_target_constant for criterion in criteria] == [
+        _LOCATION,
+        _LOCATION,
+    ]
+
+
+def test_create_search_ads_bulk_reuses_indexed_campaigns_and_ad_groups(
+    client, resource_index
+):
+    resource_index.add_campaign("Switches", 77)
+    resource_index.add_ad_group(77, "Remote", 501)
+
+    ad_resource_names = _create(client, [_ad("Switches", "Remote")], resource_index)
+
+    (request,) = client.ga_service.requests
+    assert _types(request) == ["ad_group_ad_operation", "ad_group_criterion_operation"]
+    assert request[0].ad_group_ad_operation.create.ad_group == (
+        f"customers/{_CUSTOMER_ID}/adGroups/501"
+    )
+    assert len(ad_resource_names) == 1
+
+
+def test_create_search_ads_bulk_resolves_names_across_split_requests(
+    client, resource_index
+):
+    keywords = [f"keyword {index}" for index in range(6)]
+
+    ad_resource_names = _create(
+        client, [_ad("Switches", "Remote", keywords)], resource_index, max_operations=4
+    )
+
+    # Budget, campaign, geo criterion and ad group, then the ad and six keywords
+    assert [len(request) for request in client.ga_service.requests] == [4, 4, 3]
+    campaign_id = resource_index.campaign_id("Switches")
+    ad_group_id = resource_index.ad_group_id(campaign_id, "Remote")
+    ad_group = f"customers/{_CUSTOMER_ID}/adGroups/{ad_group_id}"
+    for request in client.ga_service.requests[1:]:
+        for operation in request:
+            operation_type = pushtogoogleads._operation_type(operation)
+            create = getattr(operation, operation_type).create
+            assert create.ad_group == ad_group
+    assert len(ad_resource_names) == 1
+
+
+def test_create_search_ads_bulk_skips_operations_of_failed_creates(
+    resource_index, capsys
+):
+    client = _FakeClient(failing_names={"Remote"})
+    ads = [_ad("Switches", "Remote", ["a", "b", "c"]), _ad("Switches", "Smart")]
+
+    ad_resource_names = _create(client, ads, resource_index, max_operations=5)
+
+    output = capsys.readouterr().out
+    assert "ad_group_operation failed" in output
+    assert "Skipping ad_group_ad_operation" in output
+    # Only the ad of the "Smart" ad group was created
+    assert len(ad_resource_names) == 1
+    campaign_id = resource_index.campaign_id("Switches")
+    assert resource_index.ad_group_id(campaign_id, "Remote") is None
+    assert resource_index.ad_group_id(campaign_id, "Smart")
+    # The setup request, then the ad and the keyword of "Smart" in their own requests
+    assert [len(request) for request in client.ga_service.requests] == [5, 1, 1]
+    for request in client.ga_service.requests[1:]:
+        for operation in request:
+            create = getattr(
+                operation, pushtogoogleads._operation_type(operation)
+            ).create
+            assert not pushtogoogleads._is_temporary(create.ad_group)
+
+
+def test_create_search_ads_bulk_skips_invalid_ads(client, resource_index, capsys):
+    invalid = _ad("Switches", "Remote")
+    invalid["headlines"] = ["Only one headline"]
+
+    assert _create(client, [invalid], resource_index) == []
+    assert "invalid headlines or descriptions" in capsys.readouterr().out
+    assert client.ga_service.requests == []
@@ -0,0 +1,181 @@
+from types import SimpleNamespace
+
+import pytest
+from google.ads.googleads.client import GoogleAdsClient
+from google.oauth2.credentials import Credentials
+
+from resourceindex import ResourceIndex, quote_gaql
+
+_CUSTOMER_ID = "1234567890"
+
+
+def _campaign_row(campaign_id, name):
+    return SimpleNamespace(campaign=SimpleNamespace(id=campaign_id, name=name))
+
+
+def _ad_group_row(campaign_id, ad_group_id, name):
+    return SimpleNamespace(
+        campaign=SimpleNamespace(id=campaign_id),
+        ad_group=SimpleNamespace(id=ad_group_id, name=name),
+    )
+
+
+class _FakeGoogleAdsService:
+    """Streams the ad group rows for ad group queries and the campaign rows otherwise."""
+
+    def __init__(self, campaigns, ad_groups):
+        self.campaigns = campaigns
+        self.ad_groups = ad_groups
+        self.queries = []
+
+    def search_stream(self, customer_id, query):
+        self.queries.append(query)
+        rows = self.ad_groups if "ad_group.id" in query else self.campaigns
+        # Two batches, as a stream of a large account would return
+        return iter(
+            [SimpleNamespace(results=rows[:1]), SimpleNamespace(results=rows[1:])]
+        )
+
+
+class _FakeClient:
+    def __init__(self, campaigns=(), ad_groups=()):
+        self._client = GoogleAdsClient(
+            credentials=Credentials(token="token"),
+            developer_token="dev-token",
+            use_proto_plus=True,
+        )
+        self.ga_service = _FakeGoogleAdsService(list(campaigns), list(ad_groups))
+
+    def get_type(self, name):
+        return self._client.get_type(name)
+
+    def get_service(self, name):
+        assert name == "GoogleAdsService"
+        return self.ga_service
+
+
+@pytest.fixture
+def client():
+    return _FakeClient(
+        campaigns=[_campaign_row(77, "Switches"), _campaign_row(78, "Sensors")],
+        ad_groups=[
+            _ad_group_row(77, 501, "Remote"),
+            _ad_group_row(77, 502, "Smart"),
+            _ad_group_row(78, 503, "Remote"),
+        ],
+    )
+
+
+def test_load_indexes_campaigns_and_ad_groups_with_two_streams(client):
+    index = ResourceIndex(client, _CUSTOMER_ID)
+
+    assert len(client.ga_service.queries) == 2
+    assert index.campaign_id("Switches") == 77
+    assert index.campaign_id("Sensors") == 78
+    assert index.campaign_id("Missing") is None
+    # Ad group names are scoped to their campaign
+    assert index.ad_group_id(77, "Remote") == 501
+    assert index.ad_group_id("78", "Remote") == 503
+    assert index.ad_group_id(78, "Smart") is None
+    assert index.ad_group_id(None, "Remote") is None
+
+
+def test_load_replaces_the_previous_index(client):
+    index = ResourceIndex(client, _CUSTOMER_ID)
+    index.add_campaign("Created", "90")
+    client.ga_service.campaigns = [_campaign_row(78, "Sensors")]
+
+    index.load()
+
+    assert index.campaign_id("Created") is None
+    assert index.campaign_id("Switches") is None
+    assert index.campaign_id("Sensors") == 78
+
+
+def test_without_load_the_index_starts_empty_and_records_additions(client):
+    index = ResourceIndex(client, _CUSTOMER_ID, load=False)
+
+    assert client.ga_service.queries == []
+    index.add_campaign("Switches", "77")
+    index.add_ad_group("77", "Remote", "501")
+
+    assert index.campaign_id("Switches") == 77
+    assert index.ad_group_id(77, "Remote") == 501
+
+
+def test_update_from_mutate_records_created_entities(client):
+    index = ResourceIndex(client, _CUSTOMER_ID, load=False)
+    index.add_campaign("Switches", 77)
+    temporary_campaign = f"customers/{_CUSTOMER_ID}/campaigns/-2"
+    operations = []
+    results = []
+
+    def add(operation_type, result_type, result_name, **fields):
+        operation = client.get_type("MutateOperation")
+        create = getattr(operation, operation_type).create
+        for name, value in fields.items():
+            setattr(create, name, value)
+        operations.append(operation)
+        result = client.get_type("MutateOperationResponse")
+        if result_name:
+            getattr(result, result_type).resource_name = result_name
+        results.append(result)
+
+    add(
+        "campaign_operation",
+        "campaign_result",
+        f"customers/{_CUSTOMER_ID}/campaigns/90",
+        name="Sensors",
+        resource_name=temporary_campaign,
+    )
+    # A new ad group in the new campaign, one in an existing campaign, and one
+    # that failed under partial failure
+    add(
+        "ad_group_operation",
+        "ad_group_result",
+        f"customers/{_CUSTOMER_ID}/adGroups/601",
+        name="Temperature",
+        campaign=temporary_campaign,
+    )
+    add(
+        "ad_group_operation",
+        "ad_group_result",
+        f"customers/{_CUSTOMER_ID}/adGroups/602",
+        name="Smart",
+        campaign=f"customers/{_CUSTOMER_ID}/campaigns/77",
+    )
+    add(
+        "ad_group_operation",
+        "ad_group_result",
+        None,
+        name="Failed",
+        campaign=temporary_campaign,
+    )
+    add(
+        "ad_group_ad_operation",
+        "ad_group_ad_result",
+        f"customers/{_CUSTOMER_ID}/adGroupAds/601~1",
+        ad_group=f"customers/{_CUSTOMER_ID}/adGroups/601",
+    )
+    response = client.get_type("MutateGoogleAdsResponse")
+    response.mutate_operation_responses.extend(results)
+
+    index.update_from_mutate(operations, response, failed={3})
+
+    assert index.campaign_id("Sensors") == 90
+    assert index.ad_group_id(90, "Temperature") == 601
+    assert index.ad_group_id(77, "Smart") == 602
+    assert index.ad_group_id(90, "Failed") is None
+
+
+@pytest.mark.parametrize(
+    "value, quoted",
+    [
+        ("Power Control", "'Power Control'"),
+        ("Joe's Switches", "'Joe\\'s Switches'"),
+        ("C:\\Sites", "'C:\\\\Sites'"),
+        ("\\'", "'\\\\\\''"),
+    ],
+)
+def test_quote_gaql_escapes_quotes_and_backslashes(value, quoted):
+    assert quote_gaql(value) == quoted
@@ -0,0 +1,98 @@
+import json
+
+import rsagenerator
+from rsagenerator import generate_structured_responsive_search_ad
+
+
+def _ad(headlines, descriptions):
+    return json.dumps(
+        {
+            "headlines": headlines,
+            "descriptions": descriptions,
+            "broad_match_keywords": [],
+            "phrase_match_keywords": [],
+            "exact_match_keywords": [],
+            "page_title": "Remote Power Switch",
+        }
+    )
+
+
+def _fake_completions(monkeypatch, replies):
+    requests = []
+
+    def request_completion(data, api_key, cache=None, bypass_cache=False):
+        requests.append(data)
+        return replies[len(requests) - 1]
+
+    monkeypatch.setattr(rsagenerator, "_request_completion", request_completion)
+    return requests
+
+
+def test_repair_fills_in_missing_assets(monkeypatch, capsys):
+    requests = _fake_completions(
+        monkeypatch,
+        [
+            _ad(["Remote Power Switch"], ["Control outlets from anywhere."]),
+            json.dumps(
+                {
+                    "headlines": ["Reboot Devices Remotely", "Smart PDU Control"],
+                    "descriptions": ["Monitor power use per outlet."],
+                }
+            ),
+        ],
+    )
+
+    sections = generate_structured_responsive_search_ad("Switch", "key", [])
+
+    assert len(requests) == 2
+    assert len(sections["headlines"]) == 3
+    assert len(sections["descriptions"]) == 2
+    output = capsys.readouterr().out
+    assert "Requesting 2 more headlines and 1 more descriptions" in output
+    assert "rejected" not in output
+
+
+def test_repair_replaces_rejected_assets(monkeypatch, capsys):
+    too_long = "A headline that is far too long for Google Ads"
+    requests = _fake_completions(
+        monkeypatch,
+        [
+            _ad(
+                [
+                    "Remote Power Switch",
+                    "Smart PDU Control",
+                    "Reboot Remotely",
+                    too_long,
+                ],
+                ["Control outlets from anywhere.", "Monitor power use per outlet."],
+            ),
+            json.dumps({"headlines": ["Power On Demand"], "descriptions": []}),
+        ],
+    )
+
+    sections = generate_structured_responsive_search_ad("Switch", "key", [])
+
+    assert len(requests) == 2
+    assert too_long in requests[1]["messages"][1]["content"]
+    assert sections["headlines"][-1] == "Power On Demand"
+    assert too_long not in sections["headlines"]
+    output = capsys.readouterr().out
+    assert "Regenerating 1 rejected ad assets." in output
+    assert "Requesting" not in output
+
+
+def test_complete_ad_needs_no_repair(monkeypatch):
+    requests = _fake_completions(
+        monkeypatch,
+        [
+            _ad(
+                ["Remote Power Switch", "Smart PDU Control", "Reboot Remotely"],
+                ["Control outlets from anywhere.", "Monitor power use per outlet."],
+            )
+        ],
+    )
+
+    sections = generate_structured_responsive_search_ad("Switch", "key", [])
+
+    assert len(requests) == 1
+    assert sections["page_title"] == ["Remote Power Switch"]
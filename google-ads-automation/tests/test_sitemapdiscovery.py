@@ -0,0 +1,195 @@
+import gzip
+import os
+
+import pytest
+import requests
+
+import sitemapdiscovery
+from sitemapdiscovery import (
+    SitemapDiscovery,
+    find_sitemaps,
+    is_sitemap,
+    iter_sitemap,
+    iter_sitemap_entries,
+)
+
+_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "sitemaps")
+_SITE = "https://shop.example.com"
+_PRODUCTS = [f"{_SITE}/product/switch-{index}" for index in range(1, 4)]
+_SHOP_PAGES = _PRODUCTS + [
+    f"{_SITE}/category/switches",
+    f"{_SITE}/category/sensors",
+    f"{_SITE}/product/legacy-switch",
+]
+_BLOG_PAGES = [f"{_SITE}/blog/choosing-a-pdu"]
+
+
+class _Response:
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class _FixtureSession:
+    """
+    Serves the files of tests/fixtures/sitemaps as https://shop.example.com.
+
+    `overrides` replaces the body of a path, and None makes it a 404.
+    """
+
+    def __init__(self):
+        self.overrides = {}
+        self.requested = []
+
+    def get(self, url, timeout=None, stream=False):
+        assert url.startswith(_SITE)
+        path = url[len(_SITE) + 1 :]
+        self.requested.append(path)
+        if path in self.overrides:
+            content = self.overrides[path]
+        else:
+            file_path = os.path.join(_FIXTURES, path)
+            content = (
+                open(file_path, "rb").read() if os.path.exists(file_path) else None
+            )
+        if content is None:
+            return _Response(404, b"")
+        return _Response(200, content)
+
+
+def _fixture(name):
+    with open(os.path.join(_FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def session():
+    return _FixtureSession()
+
+
+@pytest.fixture
+def discovery(tmp_path, session):
+    return SitemapDiscovery(path=str(tmp_path / "sitemaps.sqlite3"), session=session)
+
+
+def test_is_sitemap():
+    assert is_sitemap(f"{_SITE}/sitemap.xml")
+    assert is_sitemap(f"{_SITE}/products.XML.gz?page=2")
+    assert not is_sitemap(f"{_SITE}/product/switch-1")
+
+
+def test_iter_sitemap_follows_nested_indexes_once(session):
+    pages = list(iter_sitemap(f"{_SITE}/sitemap_index.xml", session))
+
+    assert sorted(url for url, _ in pages) == sorted(_SHOP_PAGES)
+    assert dict(pages)[f"{_SITE}/category/sensors"] is None
+    assert dict(pages)[_PRODUCTS[0]] == "2026-10-01"
+    # categories.xml is listed by both indexes but read once
+    assert session.requested.count("categories.xml") == 1
+
+
+def test_iter_sitemap_entries_reports_nested_sitemaps(session):
+    entries = list(iter_sitemap_entries(f"{_SITE}/archive-index.xml", session))
+
+    assert entries == [
+        ("sitemap", f"{_SITE}/archive.xml", "2026-01-01"),
+        ("sitemap", f"{_SITE}/categories.xml", "2026-09-01"),
+    ]
+
+
+def test_gzip_sitemaps_are_decompressed_in_chunks(session, monkeypatch):
+    # Small chunks exercise the bounded decompression loop
+    monkeypatch.setattr(sitemapdiscovery, "_CHUNK_SIZE", 16)
+
+    entries = list(iter_sitemap_entries(f"{_SITE}/products.xml.gz", session))
+
+    assert [loc for _, loc, _ in entries] == _PRODUCTS
+    assert gzip.decompress(_fixture("products.xml.gz")).startswith(b"<?xml")
+
+
+def test_local_sitemap_files_are_read(monkeypatch):
+    monkeypatch.setattr(sitemapdiscovery, "_CHUNK_SIZE", 16)
+
+    assert [
+        url for url, _ in iter_sitemap(os.path.join(_FIXTURES, "products.xml.gz"))
+    ] == _PRODUCTS
+    assert [
+        url for url, _ in iter_sitemap(os.path.join(_FIXTURES, "categories.xml"))
+    ] == [f"{_SITE}/category/switches", f"{_SITE}/category/sensors"]
+
+
+def test_find_sitemaps_reads_robots_txt(session):
+    assert find_sitemaps(f"{_SITE}/product/switch-1?ref=home", session) == [
+        f"{_SITE}/sitemap_index.xml",
+        f"{_SITE}/blog-sitemap.xml",
+    ]
+    assert session.requested == ["robots.txt"]
+
+
+@pytest.mark.parametrize(
+    "robots", [None, b"User-agent: *\nDisallow: /cart\n# Sitemap: commented out\n"]
+)
+def test_find_sitemaps_falls_back_to_the_site_root(session, robots):
+    session.overrides["robots.txt"] = robots
+
+    assert find_sitemaps(_SITE, session) == [f"{_SITE}/sitemap.xml"]
+
+
+def test_discover_reads_the_sitemaps_of_a_site(discovery, session):
+    urls = list(discovery.discover(f"{_SITE}/"))
+
+    assert sorted(urls) == sorted(_SHOP_PAGES + _BLOG_PAGES)
+    assert session.requested[0] == "robots.txt"
+
+
+def test_discover_yields_only_new_and_changed_pages(discovery, session, capsys):
+    assert len(list(discovery.discover(f"{_SITE}/sitemap_index.xml"))) == 6
+    discovery.commit()
+    session.requested.clear()
+
+    # Nothing changed: nested sitemaps with the same <lastmod> are not downloaded
+    assert list(discovery.discover(f"{_SITE}/sitemap_index.xml")) == []
+    assert session.requested == ["sitemap_index.xml"]
+    assert "Skipped 3 unchanged sitemaps." in capsys.readouterr().out
+
+    # A product and its sitemap changed
+    session.overrides["sitemap_index.xml"] = _fixture("sitemap_index.xml").replace(
+        b"<lastmod>2026-10-01</lastmod>", b"<lastmod>2026-10-16</lastmod>"
+    )
+    session.overrides["products.xml.gz"] = gzip.compress(
+        gzip.decompress(_fixture("products.xml.gz")).replace(
+            b"switch-2</loc>\n    <lastmod>2026-10-01",
+            b"switch-2</loc>\n    <lastmod>2026-10-16",
+        )
+    )
+    assert list(discovery.discover(f"{_SITE}/sitemap_index.xml")) == [_PRODUCTS[1]]
+
+
+def test_uncommitted_pages_are_offered_again_on_the_next_run(
+    tmp_path, discovery, session
+):
+    list(discovery.discover(f"{_SITE}/sitemap_index.xml"))
+    discovery.commit([url for url in _SHOP_PAGES if url != _PRODUCTS[0]])
+    session.requested.clear()
+
+    next_run = SitemapDiscovery(
+        path=str(tmp_path / "sitemaps.sqlite3"), session=session
+    )
+    assert list(next_run.discover(f"{_SITE}/sitemap_index.xml")) == [_PRODUCTS[0]]
+    # The products sitemap was not recorded, so it was downloaded again
+    assert session.requested == ["sitemap_index.xml", "products.xml.gz"]
@@ -0,0 +1,239 @@
+import itertools
+import os
+import random
+import threading
+import time
+
+import grpc
+from google.ads.googleads.errors import GoogleAdsException
+
+# Pacing and retry defaults for Google Ads API calls
+_DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv("GOOGLE_ADS_REQUESTS_PER_MINUTE", "300"))
+_DEFAULT_MAX_RETRIES = 6
+_BASE_DELAY = 1.0  # Seconds before the first retry, doubled on each attempt
+_MAX_DELAY = 120.0  # Upper bound for a single backoff
+_MIN_RATE_FRACTION = 0.05  # The pace never drops below 5% of the configured rate
+
+# Quota errors are rejected before anything is applied, so any call can be retried
+_QUOTA_ERRORS = {"RESOURCE_EXHAUSTED", "RESOURCE_TEMPORARILY_EXHAUSTED"}
+# Transient failures may hide an applied mutate, so only reads retry on these
+_TRANSIENT_ERRORS = {"INTERNAL_ERROR", "TRANSIENT_ERROR", "DEADLINE_EXCEEDED"}
+# Failures that are not Ads errors reach the caller as raw grpc.RpcError
+_QUOTA_STATUS_CODES = {grpc.StatusCode.RESOURCE_EXHAUSTED}
+_TRANSIENT_STATUS_CODES = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+}
+
+# Paged results (search rows, keyword ideas) are read fully inside the retry loop,
+# so an error on a later page retries the call as well. Streams can be far larger,
+# so only their first batch is read inside the loop and the rest is streamed to
+# the caller.
+_PAGED_METHODS = {"search", "generate_keyword_ideas"}
+_STREAMING_METHODS = {"search_stream"}
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+class _AdaptiveBucket:
+    """
+    A token bucket whose rate backs off on quota errors and recovers on success.
+
+    The rate is halved on every quota error and grows back by a small step after
+    each successful call, so sustained throughput settles just below the quota
+    instead of alternating between bursts and long stalls.
+    """
+
+    def __init__(self, per_minute):
+        self.max_rate = per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(1.0, self.max_rate)  # About one second of burst
+        self.available = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Reserves one call and returns the seconds to wait before making it."""
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(
+                self.capacity, self.available + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            self.available -= 1
+            wait = -self.available / self.rate if self.available < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.01)
+
+    def throttled(self, retry_delay):
+        """Slows down after a quota error and pauses every caller for `retry_delay` seconds."""
+        with self._lock:
+            self.rate = max(self.max_rate * _MIN_RATE_FRACTION, self.rate / 2)
+            self.paused_until = max(
+                self.paused_until, time.monotonic() + (retry_delay or 0.0)
+            )
+
+
+def _error_codes(exception):
+    """Returns the error code names (e.g. "RESOURCE_EXHAUSTED") of a GoogleAdsException."""
+    codes = set()
+    for error in exception.failure.errors:
+        error_code = getattr(error.error_code, "_pb", error.error_code)
+        field = error_code.WhichOneof("error_code")
+        if field:
+            descriptor = error_code.DESCRIPTOR.fields_by_name[field].enum_type
+            codes.add(descriptor.values_by_number[getattr(error_code, field)].name)
+    return codes
+
+
+def _retry_delay(exception):
+    """Returns the retry delay the API asked for, in seconds, or None."""
+    if not isinstance(exception, GoogleAdsException):
+        return None
+    delays = []
+    for error in exception.failure.errors:
+        retry_delay = error.details.quota_error_details.retry_delay
+        if hasattr(retry_delay, "total_seconds"):
+            seconds = retry_delay.total_seconds()  # proto-plus returns a timedelta
+        else:
+            seconds = retry_delay.seconds + retry_delay.nanos / 1e9
+        if seconds:
+            delays.append(seconds)
+    return max(delays) if delays else None
+
+
+def _classify(exception, idempotent):
+    """Returns (retryable, is_quota_error) for an exception raised by an Ads call."""
+    if isinstance(exception, GoogleAdsException):
+        codes = _error_codes(exception)
+        if codes & _QUOTA_ERRORS:
+            return True, True
+        return idempotent and bool(codes & _TRANSIENT_ERRORS), False
+    if isinstance(exception, grpc.RpcError):
+        code = exception.code() if callable(getattr(exception, "code", None)) else None
+        if code in _QUOTA_STATUS_CODES:
+            return True, True
+        return idempotent and code in _TRANSIENT_STATUS_CODES, False
+    return False, False
+
+
+class AdsScheduler:
+    """
+    Paces and retries Google Ads API calls for every account in the process.
+
+    Each (developer token, customer) pair gets its own adaptive token bucket.
+    Failed calls are retried individually with exponential backoff and jitter,
+    waiting at least as long as the retry delay in the error's quota details.
+    Mutates are only retried on quota errors, which guarantee that nothing was
+    applied, so a retry can never create an entity twice.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=_DEFAULT_REQUESTS_PER_MINUTE,
+        max_retries=_DEFAULT_MAX_RETRIES,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def _bucket(self, key):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = _AdaptiveBucket(self.requests_per_minute)
+                self._buckets[key] = bucket
+            return bucket
+
+    def call(self, key, method_name, func, *args, **kwargs):
+        """
+        Calls a service method within the account's pace, retrying transient failures.
+
+        Args:
+            key (tuple): The (developer token, customer ID) the call counts against.
+            method_name (str): The service method name, e.g. "mutate_campaigns".
+            func (callable): The bound service method.
+            *args, **kwargs: Arguments for the method.
+
+        Returns:
+            The method's result. The rows of search and generate_keyword_ideas
+            are returned as a list; search_stream batches are still streamed.
+
+        Raises:
+            GoogleAdsException, grpc.RpcError: If the call fails and cannot be retried.
+        """
+        bucket = self._bucket(key)
+        idempotent = not method_name.startswith("mutate")
+        for attempt in range(self.max_retries + 1):
+            wait = bucket.reserve()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                result = func(*args, **kwargs)
+                if method_name in _PAGED_METHODS:
+                    result = list(result)
+                elif method_name in _STREAMING_METHODS:
+                    # Errors such as quota exhaustion surface on the first batch
+                    first = next(iter(result), None)
+                    result = itertools.chain([] if first is None else [first], result)
+            except Exception as e:
+                retryable, is_quota_error = _classify(e, idempotent)
+                if not retryable or attempt == self.max_retries:
+                    raise
+                retry_delay = _retry_delay(e)
+                if is_quota_error:
+                    bucket.throttled(retry_delay)
+                backoff = min(_MAX_DELAY, _BASE_DELAY * 2**attempt)
+                delay = (retry_delay or 0.0) + random.uniform(0, backoff)
+                print(
+                    f"{method_name} failed ({type(e).__name__}); "
+                    f"retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})."
+                )
+                time.sleep(delay)
+                continue
+            bucket.succeeded()
+            return result
+
+
+class ScheduledService:
+    """Wraps a Google Ads service so every RPC goes through an AdsScheduler."""
+
+    def __init__(self, service, scheduler, developer_token):
+        self._service = service
+        self._scheduler = scheduler
+        self._developer_token = developer_token
+
+    def __getattr__(self, name):
+        attribute = getattr(self._service, name)
+        # Path helpers such as campaign_path are local and need no pacing
+        if (
+            not callable(attribute)
+            or name.endswith("_path")
+            or name.startswith(("_", "parse_"))
+        ):
+            return attribute
+
+        def scheduled(*args, **kwargs):
+            request = kwargs.get("request")
+            customer_id = kwargs.get("customer_id") or getattr(
+                request, "customer_id", None
+            )
+            key = (self._developer_token, customer_id)
+            return self._scheduler.call(key, name, attribute, *args, **kwargs)
+
+        return scheduled
+
+
+def get_default_scheduler():
+    """Returns the process-wide scheduler, creating it on first use."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = AdsScheduler()
+        return _default_scheduler
@@ -1,22 +1,92 @@
-import requests
+import functools
+import json
+import re
 
+from llmcache import get_default_cache
+from llmclient import (
+    ChatCompletionError,
+    complete_batch,
+    complete_chat,
+    gather_with_client,
+)
 
-def advanced_description_with_highlights(description, api_key, keyword_ideas):
+# Length limits the prompt asks for, in characters
+DESCRIPTION_FIELD_LIMITS = {
+    "title": 170,
+    "highlights": 155,
+    "meta_description": 150,
+    "meta_title": 50,
+}
+
+# Section headers the model uses for each field, most specific first so that
+# "Meta Description" is not mistaken for the product description
+_FIELD_HEADERS = [
+    ("meta_description", r"meta\s+description"),
+    ("meta_title", r"meta\s+title"),
+    (
+        "highlights",
+        r"(?:product\s+)?highlights|key\s+specs(?:\s+and\s+features)?|key\s+features"
+        r"|(?:key\s+)?specifications(?:\s+and\s+features)?",
+    ),
+    ("title", r"(?:seo[- ]optimized\s+)?(?:product\s+)?title"),
+    (
+        "rewritten_description",
+        r"(?:enhanced\s+|product\s+|seo[- ]optimized\s+)*description",
+    ),
+]
+_HEADER_PATTERN = re.compile(
+    r"^(?P<marker>(?:#+\s*|>\s*|[-*•]\s+)*(?:\d+[.)]\s*)?)(?P<bold>\*\*)?\s*(?:"
+    + "|".join(f"(?P<{field}>{pattern})" for field, pattern in _FIELD_HEADERS)
+    + r")\s*(?P<end>:\s*\*\*|\*\*\s*:?|:|$)\s*(?P<rest>.*)$",
+    re.IGNORECASE,
+)
+_BULLET_PATTERN = re.compile(r"^(?:#+|[-*•]|\d+[.)])\s+")
+# Labels that never start a description sentence, so "Meta Title: ..." counts
+# as a header even without markdown markers
+_INLINE_LABEL_FIELDS = {"title", "meta_title", "meta_description"}
+
+# Structured output schema for the chat completions `response_format` field
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "product_content",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "title": {"type": "string"},
+                "description": {"type": "string"},
+                "highlights": {"type": "array", "items": {"type": "string"}},
+                "meta_description": {"type": "string"},
+                "meta_title": {"type": "string"},
+            },
+            "required": [
+                "title",
+                "description",
+                "highlights",
+                "meta_description",
+                "meta_title",
+            ],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def build_description_with_highlights_request(
+    description, keyword_ideas, structured=False
+):
     """
-    Generates SEO-optimized product content using GPT-4, integrating provided keywords.
+    Builds the chat completion request for SEO-optimized product content.
 
     Args:
         description (str): The original product description.
-        api_key (str): Your OpenAI API key.
         keyword_ideas (list): A list of keywords relevant to the product.
+        structured (bool): Request JSON matching RESPONSE_FORMAT instead of text.
 
     Returns:
-        dict: A dictionary containing:
-            - "rewritten_description": The enhanced product description with keywords integrated.
-            - "highlights": A list of key product highlights, each under 155 characters.
-            - "title" : A concise, SEO-rich product title under 170 characters using keywords.
+        dict: The request body for the chat completions endpoint.
     """
-
     # Format the keywords for the prompt
     keywords_str = ", ".join(keyword_ideas)
 
@@ -34,7 +104,6 @@ def advanced_description_with_highlights(description, api_key, keyword_ideas):
     )
 
     # Prepare the API request payload
-    headers = {"Authorization": f"Bearer {api_key}"}
     data = {
         "model": "gpt-4o",
         "messages": [
@@ -48,38 +117,326 @@ def advanced_description_with_highlights(description, api_key, keyword_ideas):
         "max_tokens": 1500,
     }
 
-    try:
-        # Make the API call to OpenAI
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions", json=data, headers=headers
+    if structured:
+        data["response_format"] = RESPONSE_FORMAT
+        data["messages"][1]["content"] += (
+            "\n\nReturn the content as JSON with the fields title, description, "
+            "highlights, meta_description and meta_title."
         )
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        content = response.json()
 
-        # Extract the generated content
-        message_content = (
-            content.get("choices", [{}])[0].get("message", {}).get("content", "")
-        )
+    return data
 
-        # Split the response into description and highlights
-        parts = message_content.split("**Product Highlights:**")
-        formatted_description = parts[0].strip()
-        highlights = parts[1].strip().split("\n") if len(parts) > 1 else []
 
-        # Extract the title from the formatted description
-        title = formatted_description.split("\n")[0]
+def _empty_description_with_highlights():
+    return {
+        "rewritten_description": "",
+        "highlights": [],
+        "title": "",
+        "meta_description": "",
+        "meta_title": "",
+        "length_issues": [],
+    }
+
+
+def _clean_line(line):
+    """Strips list markers, markdown heading markers and emphasis from a line."""
+    return _BULLET_PATTERN.sub("", line.strip()).strip("*").strip()
+
+
+def _parse_json_content(message_content):
+    """Returns the fields of a structured (JSON) response, or None for text responses."""
+    try:
+        payload = json.loads(message_content)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+
+    highlights = payload.get("highlights") or []
+    if isinstance(highlights, str):
+        highlights = highlights.split("\n")
+    return {
+        "rewritten_description": str(payload.get("description") or "").strip(),
+        "highlights": [
+            _clean_line(str(item)) for item in highlights if _clean_line(str(item))
+        ],
+        "title": _clean_line(str(payload.get("title") or "")),
+        "meta_description": str(payload.get("meta_description") or "").strip(),
+        "meta_title": _clean_line(str(payload.get("meta_title") or "")),
+    }
+
+
+def _match_header(line):
+    """
+    Returns the field a section header line starts, and the text after the label.
+
+    A label only counts as a header when it stands alone on its line, or is
+    bolded, a markdown heading or numbered, so a description sentence that
+    begins with "Specifications:" stays in the description. Plain inline
+    labels ("Meta Title: ...") are accepted for the title and meta fields,
+    which a description sentence does not start with.
+    """
+    header = _HEADER_PATTERN.match(line.strip())
+    if not header:
+        return None, line
+    bolded = header.group("bold") and "**" in header.group("end")
+    marked = re.search(r"[#\d]", header.group("marker"))
+    field = next(name for name, _ in _FIELD_HEADERS if header.group(name))
+    inline_label = field in _INLINE_LABEL_FIELDS and ":" in header.group("end")
+    if header.group("rest") and not (bolded or marked or inline_label):
+        return None, line
+    return field, header.group("rest")
 
-        return {
-            "rewritten_description": formatted_description,
-            "highlights": highlights,
-            "title": title,
-        }
 
-    # Handle potential errors
-    except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP error occurred: {http_err} - {http_err.response.text}")
+def _parse_text_content(message_content):
+    """Splits a free-text response into fields by its section headers."""
+    sections = {field: [] for field, _ in _FIELD_HEADERS}
+    preamble = []
+    field = None
+    for line in message_content.splitlines():
+        header_field, rest = _match_header(line)
+        if header_field:
+            field, line = header_field, rest
+        if not _clean_line(line):
+            continue
+        if field == "title" and sections["title"]:
+            # The title is a single line; unlabelled text after it is the description
+            field = None
+        if field:
+            sections[field].append(
+                _clean_line(line) if field == "highlights" else line.strip()
+            )
+        else:
+            preamble.append(line.strip())
+
+    description = sections["rewritten_description"] or preamble
+    title = _clean_line(sections["title"][0]) if sections["title"] else ""
+    if not title and description:
+        # No title section: the first line (often a "# Heading") is the title,
+        # as before, and is no longer repeated in the description
+        title = _clean_line(description[0])
+        description = description[1:] or description
+
+    return {
+        "rewritten_description": "\n".join(description),
+        "highlights": sections["highlights"],
+        "title": title,
+        "meta_description": " ".join(sections["meta_description"]).strip("*").strip(),
+        "meta_title": _clean_line(" ".join(sections["meta_title"])),
+    }
+
+
+def check_description_lengths(content):
+    """
+    Checks the generated fields against the length limits in the prompt.
+
+    Args:
+        content (dict): The parsed fields, as returned by parse_description_with_highlights().
+
+    Returns:
+        list of dict: One entry with "field", "text" and "reason" keys per field or
+        highlight that is missing or too long.
+    """
+    issues = []
+    for field, max_length in DESCRIPTION_FIELD_LIMITS.items():
+        values = content[field] if field == "highlights" else [content[field]]
+        if not values or not any(values):
+            issues.append({"field": field, "text": "", "reason": "missing"})
+        for text in values:
+            if len(text) > max_length:
+                issues.append(
+                    {
+                        "field": field,
+                        "text": text,
+                        "reason": f"{len(text)} characters, the limit is {max_length}",
+                    }
+                )
+    return issues
+
+
+def parse_description_with_highlights(message_content):
+    """
+    Splits the generated content into the title, description, highlights and meta tags.
+
+    Both structured (JSON) responses and free text are accepted. Free text is
+    split on its section headers, which may be phrased, numbered or formatted in
+    different ways ("**Product Highlights:**", "3. Key Specs and Features", ...).
+
+    Args:
+        message_content (str): The text returned by the model.
+
+    Returns:
+        dict: A dictionary with "rewritten_description", "highlights", "title",
+        "meta_description" and "meta_title", plus "length_issues" as returned by
+        check_description_lengths().
+    """
+    if not message_content:
+        return _empty_description_with_highlights()
+
+    content = _parse_json_content(message_content)
+    if content is None:
+        content = _parse_text_content(message_content)
+    content["length_issues"] = check_description_lengths(content)
+    return content
+
+
+def advanced_description_with_highlights(
+    description,
+    api_key,
+    keyword_ideas,
+    cache=None,
+    bypass_cache=False,
+    structured=False,
+):
+    """
+    Generates SEO-optimized product content using GPT-4, integrating provided keywords.
+
+    Args:
+        description (str): The original product description.
+        api_key (str): Your OpenAI API key.
+        keyword_ideas (list): A list of keywords relevant to the product.
+        cache (LLMCache, optional): The completion cache. Defaults to the shared cache.
+        bypass_cache (bool): Always call the API, e.g. to get a fresh variation.
+        structured (bool): Request the content as JSON instead of free text.
+
+    Returns:
+        dict: A dictionary containing:
+            - "rewritten_description": The enhanced product description with keywords integrated.
+            - "highlights": A list of key product highlights, each under 155 characters.
+            - "title" : A concise, SEO-rich product title under 170 characters using keywords.
+            - "meta_description": An SEO-rich meta description under 150 characters.
+            - "meta_title": A keyword-rich meta title under 50 characters.
+            - "length_issues": Fields that are missing or over their length limit.
+    """
+    data = build_description_with_highlights_request(
+        description, keyword_ideas, structured
+    )
+
+    try:
+        # Identical requests are answered from the completion cache unless bypassed
+        message_content = complete_chat(
+            data, api_key, cache or get_default_cache(), bypass_cache
+        )
+        return parse_description_with_highlights(message_content)
+    except ChatCompletionError as e:
+        print(f"HTTP error occurred: {e}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
 
     # Return empty values in case of errors
-    return {"rewritten_description": "", "highlights": [], "title": ""}
+    return _empty_description_with_highlights()
+
+
+async def advanced_description_with_highlights_async(
+    description, keyword_ideas, llm_client, bypass_cache=False, structured=False
+):
+    """
+    Generates SEO-optimized product content through a shared AsyncChatClient.
+
+    Args:
+        description (str): The original product description.
+        keyword_ideas (list): A list of keywords relevant to the product.
+        llm_client (AsyncChatClient): The client that pools connections and paces requests.
+        bypass_cache (bool): Always call the API, e.g. to get a fresh variation.
+        structured (bool): Request the content as JSON instead of free text.
+
+    Returns:
+        dict: The same dictionary as advanced_description_with_highlights().
+    """
+    try:
+        message_content = await llm_client.complete(
+            build_description_with_highlights_request(
+                description, keyword_ideas, structured
+            ),
+            bypass_cache=bypass_cache,
+        )
+        return parse_description_with_highlights(message_content)
+    except ChatCompletionError as e:
+        print(f"HTTP error occurred: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+    return _empty_description_with_highlights()
+
+
+def advanced_descriptions_with_highlights(
+    products,
+    api_key,
+    max_in_flight=16,
+    requests_per_minute=None,
+    tokens_per_minute=None,
+    cache=None,
+    bypass_cache=False,
+    structured=False,
+):
+    """
+    Generates SEO-optimized content for many products concurrently.
+
+    Args:
+        products (list of tuple): (description, keyword_ideas) pairs, one per product.
+        api_key (str): Your OpenAI API key.
+        max_in_flight (int): The number of requests allowed to run at once.
+        requests_per_minute (int, optional): The account's request rate limit.
+        tokens_per_minute (int, optional): The account's token rate limit.
+        cache (LLMCache, optional): The completion cache. Defaults to the shared cache.
+        bypass_cache (bool): Always call the API, e.g. to get fresh variations.
+        structured (bool): Request the content as JSON instead of free text.
+
+    Returns:
+        list of dict: The generated content for each product, in input order.
+    """
+    return gather_with_client(
+        [
+            functools.partial(
+                advanced_description_with_highlights_async,
+                description,
+                keyword_ideas,
+                bypass_cache=bypass_cache,
+                structured=structured,
+            )
+            for description, keyword_ideas in products
+        ],
+        api_key,
+        cache or get_default_cache(),
+        max_in_flight=max_in_flight,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+    )
+
+
+def advanced_descriptions_with_highlights_batch(
+    products, api_key, state_dir, poll_interval=60, structured=False
+):
+    """
+    Generates SEO-optimized content offline through the OpenAI Batch API.
+
+    Use this for nightly catalog refreshes where throughput and cost matter more
+    than latency. The job's progress is kept in `state_dir`, so calling this again
+    with the same products after an interruption resumes the existing batch.
+
+    Args:
+        products (dict): (description, keyword_ideas) pairs keyed by a custom ID,
+            such as the product SKU or URL.
+        api_key (str): Your OpenAI API key.
+        state_dir (str): The directory holding the batch files and progress.
+        poll_interval (int): Seconds between batch status checks.
+        structured (bool): Request the content as JSON instead of free text.
+
+    Returns:
+        dict: The same dictionaries as advanced_description_with_highlights(),
+        keyed by custom ID. Failed products get empty values.
+    """
+    batch_requests = {
+        custom_id: build_description_with_highlights_request(
+            description, keyword_ideas, structured
+        )
+        for custom_id, (description, keyword_ideas) in products.items()
+    }
+    # The results are cached, so later interactive runs can reuse them
+    results = complete_batch(
+        batch_requests, api_key, state_dir, poll_interval, get_default_cache()
+    )
+    return {
+        custom_id: parse_description_with_highlights(message_content)
+        for custom_id, message_content in results.items()
+    }
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Default location of the fingerprint index
+_DEFAULT_INDEX_PATH = os.getenv(
+    "CONTENT_INDEX_PATH", os.path.join(".cache", "fingerprints.sqlite3")
+)
+_SIMHASH_BITS = 64
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    """
+    Collapses whitespace so formatting changes do not count.
+
+    Case is kept: a corrected brand or model name is a content change that the
+    stored ad copy or description must pick up.
+    """
+    return " ".join(text.split())
+
+
+def fingerprint(text):
+    """Returns the SHA-256 hex digest of the normalized text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def simhash(text):
+    """
+    Computes a 64-bit SimHash of the text's word tokens.
+
+    Texts that differ in only a few words produce hashes that differ in only a
+    few bits, which makes near-duplicate pages cheap to detect.
+
+    Args:
+        text (str): The cleaned page text.
+
+    Returns:
+        int: The SimHash as an unsigned 64-bit integer.
+    """
+    weights = [0] * _SIMHASH_BITS
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        token_hash = int.from_bytes(
+            hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        for bit in range(_SIMHASH_BITS):
+            weights[bit] += 1 if token_hash >> bit & 1 else -1
+
+    value = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            value |= 1 << bit
+    return value
+
+
+def hamming_distance(a, b):
+    """Returns the number of differing bits between two SimHash values."""
+    return bin(a ^ b).count("1")
+
+
+class ContentIndex:
+    """
+    A persistent index of page fingerprints and the artifacts generated from them.
+
+    Each URL stores the fingerprint of the text it was last processed with, along
+    with the generated keywords and LLM output. When a page comes back with the
+    same fingerprint, the stored artifacts can be reused instead of calling the
+    Google Ads and OpenAI APIs again.
+    """
+
+    def __init__(self, path=_DEFAULT_INDEX_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                simhash TEXT NOT NULL,
+                artifacts TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """)
+        self._connection.commit()
+
+    def lookup(self, url, text, max_distance=0):
+        """
+        Returns the stored artifacts for a URL if its text has not changed.
+
+        Args:
+            url (str): The URL of the page.
+            text (str): The current cleaned text of the page.
+            max_distance (int): The number of SimHash bits the text may differ by
+                and still count as unchanged. 0 requires an exact match.
+
+        Returns:
+            dict: The stored artifacts, or None if the page is new or has changed.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT sha256, simhash, artifacts FROM fingerprints WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if not row:
+            return None
+
+        stored_sha256, stored_simhash, artifacts = row
+        if stored_sha256 == fingerprint(text):
+            return json.loads(artifacts)
+        if (
+            max_distance
+            and hamming_distance(int(stored_simhash, 16), simhash(text)) <= max_distance
+        ):
+            return json.loads(artifacts)
+        return None
+
+    def store(self, url, text, artifacts):
+        """
+        Records the fingerprint of a page and the artifacts generated from it.
+
+        Args:
+            url (str): The URL of the page.
+            text (str): The cleaned text the artifacts were generated from.
+            artifacts (dict): JSON-serializable outputs to reuse on later runs.
+        """
+        with self._lock:
+            self._connection.execute(
+                """
+                INSERT OR REPLACE INTO fingerprints (url, sha256, simhash, artifacts, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    url,
+                    fingerprint(text),
+                    format(simhash(text), "016x"),
+                    json.dumps(artifacts),
+                    time.time(),
+                ),
+            )
+            self._connection.commit()
+
+    def forget(self, url):
+        """Removes a URL so it is fully reprocessed on the next run."""
+        with self._lock:
+            self._connection.execute("DELETE FROM fingerprints WHERE url = ?", (url,))
+            self._connection.commit()
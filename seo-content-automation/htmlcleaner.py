@@ -0,0 +1,268 @@
+import argparse
+import glob
+import html
+import os
+import re
+import time
+
+from bs4 import BeautifulSoup
+from bs4.dammit import UnicodeDammit
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional
+    etree = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:  # selectolax is optional
+    SelectolaxParser = None
+
+# Elements whose whole subtree is dropped before the text is extracted
+DEFAULT_REMOVE_TAGS = ("script", "style", "nav", "header", "footer")
+
+# Elements whose text BeautifulSoup's get_text() never returns, removed or not
+_NON_TEXT_TAGS = frozenset(("script", "style", "template"))
+
+_CDATA_PATTERN = re.compile(r"<!\[CDATA\[(.*?)\]\]>", re.DOTALL)
+
+# Engines tried in order when no engine is requested explicitly
+_ENGINE_PREFERENCE = ["selectolax", "lxml", "bs4"]
+
+_engines = {}
+
+
+def register_engine(name, clean_func):
+    """
+    Registers an HTML cleaning engine.
+
+    Args:
+        name (str): The name used to select the engine.
+        clean_func (callable): A function taking (html_content, remove_tags, separator)
+            and returning the cleaned text.
+    """
+    _engines[name] = clean_func
+
+
+def available_engines():
+    """Returns the names of the engines that can be used in this environment."""
+    return [name for name in _ENGINE_PREFERENCE if name in _engines] + [
+        name for name in _engines if name not in _ENGINE_PREFERENCE
+    ]
+
+
+def get_engine(name=None):
+    """
+    Returns the cleaning function for an engine.
+
+    Args:
+        name (str, optional): The engine name. Defaults to the HTML_CLEANER_ENGINE
+            environment variable, or the fastest installed engine.
+
+    Returns:
+        callable: The cleaning function of the engine.
+
+    Raises:
+        ValueError: If the requested engine is not available.
+    """
+    name = name or os.getenv("HTML_CLEANER_ENGINE") or available_engines()[0]
+    if name not in _engines:
+        raise ValueError(
+            f"HTML cleaner engine '{name}' is not available. "
+            f"Installed engines: {', '.join(available_engines())}"
+        )
+    return _engines[name]
+
+
+def clean_html(
+    html_content, remove_tags=DEFAULT_REMOVE_TAGS, separator=" ", engine=None
+):
+    """
+    Removes unwanted elements from HTML and returns the readable text.
+
+    Every engine produces the same output as BeautifulSoup's
+    `get_text(separator=separator, strip=True)` with html.parser after the
+    unwanted elements have been extracted. Bytes are decoded the way
+    BeautifulSoup decodes them, CDATA sections count as text, and the contents
+    of script, style and template elements never do. The exception is
+    malformed tables: selectolax follows the HTML5 rules and moves text found
+    directly inside <table> in front of the table.
+
+    Args:
+        html_content (bytes or str): The HTML of the page.
+        remove_tags (iterable of str): Elements whose subtrees are dropped.
+        separator (str): The string used to join text fragments.
+        engine (str, optional): The engine to use. See get_engine().
+
+    Returns:
+        str: The cleaned text content of the page.
+    """
+    return get_engine(engine)(html_content, frozenset(remove_tags), separator)
+
+
+def _clean_with_bs4(html_content, remove_tags, separator):
+    """Reference engine: builds a full BeautifulSoup tree with html.parser."""
+    soup = BeautifulSoup(html_content, "html.parser")
+    for element in soup(list(remove_tags)):
+        element.extract()
+    return soup.get_text(separator=separator, strip=True)
+
+
+def _prepare_markup(html_content):
+    """
+    Decodes and rewrites a page so libxml2 and Lexbor see the text BeautifulSoup sees.
+
+    Bytes are decoded with BeautifulSoup's own encoding detection (declared
+    charset, then detection), since the parsers would otherwise guess
+    differently for pages without a declared charset. CDATA sections, which
+    html.parser keeps as text but the other parsers drop, are turned into
+    escaped text between empty comments, so they stay separate fragments.
+    """
+    if isinstance(html_content, bytes):
+        html_content = UnicodeDammit(html_content, is_html=True).unicode_markup
+    if "<![CDATA[" in html_content:
+        html_content = _CDATA_PATTERN.sub(
+            lambda match: f"<!---->{html.escape(match.group(1))}<!---->",
+            html_content,
+        )
+    return html_content
+
+
+class _TextCollector:
+    """lxml parser target that collects text outside of unwanted elements."""
+
+    def __init__(self, remove_tags):
+        self.remove_tags = remove_tags
+        self.skip_depth = 0
+        self.fragments = []
+        self.pending = []
+
+    def _flush(self):
+        if self.pending:
+            text = "".join(self.pending).strip()
+            if text:
+                self.fragments.append(text)
+            self.pending = []
+
+    def start(self, tag, attrib):
+        self._flush()
+        if self.skip_depth or tag in self.remove_tags or tag in _NON_TEXT_TAGS:
+            self.skip_depth += 1
+
+    def end(self, tag):
+        self._flush()
+        if self.skip_depth:
+            self.skip_depth -= 1
+
+    def data(self, data):
+        if not self.skip_depth:
+            self.pending.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return self.fragments
+
+
+def _clean_with_lxml(html_content, remove_tags, separator):
+    """Streams the document through libxml2 without building a tree."""
+    parser = etree.HTMLParser(target=_TextCollector(remove_tags))
+    parser.feed(_prepare_markup(html_content))
+    return separator.join(parser.close())
+
+
+def _clean_with_selectolax(html_content, remove_tags, separator):
+    """Parses with the Lexbor engine and drops unwanted subtrees in native code."""
+    tree = SelectolaxParser(_prepare_markup(html_content))
+    if tree.root is None:
+        return ""
+    tree.strip_tags(list(remove_tags | _NON_TEXT_TAGS))
+
+    fragments = []
+    for node in tree.root.traverse(include_text=True):
+        if node.tag == "-text":
+            text = node.text_content.strip()
+            if text:
+                fragments.append(text)
+    return separator.join(fragments)
+
+
+register_engine("bs4", _clean_with_bs4)
+if etree is not None:
+    register_engine("lxml", _clean_with_lxml)
+if SelectolaxParser is not None:
+    register_engine("selectolax", _clean_with_selectolax)
+
+
+def benchmark(pages, engines=None, repeat=3):
+    """
+    Measures the throughput of each engine on a corpus of saved pages.
+
+    Args:
+        pages (list of bytes): The HTML of the saved pages.
+        engines (list of str, optional): The engines to compare. Defaults to all
+            installed engines.
+        repeat (int): The number of passes over the corpus per engine.
+
+    Returns:
+        list of dict: One entry per engine with "engine", "pages_per_second",
+        "megabytes_per_second" and "mismatches" (pages whose text differs from
+        the bs4 reference engine).
+    """
+    engines = engines or available_engines()
+    total_bytes = sum(len(page) for page in pages)
+    reference = [
+        _clean_with_bs4(page, frozenset(DEFAULT_REMOVE_TAGS), " ") for page in pages
+    ]
+
+    results = []
+    for name in engines:
+        clean_func = get_engine(name)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            outputs = [
+                clean_func(page, frozenset(DEFAULT_REMOVE_TAGS), " ") for page in pages
+            ]
+        elapsed = time.perf_counter() - start
+
+        results.append(
+            {
+                "engine": name,
+                "pages_per_second": len(pages) * repeat / elapsed,
+                "megabytes_per_second": total_bytes * repeat / elapsed / 1_000_000,
+                "mismatches": sum(
+                    1
+                    for output, expected in zip(outputs, reference)
+                    if output != expected
+                ),
+            }
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark HTML cleaning engines on a directory of saved pages."
+    )
+    parser.add_argument("corpus", help="Directory containing saved .html pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus")
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(
+        glob.glob(os.path.join(args.corpus, "**", "*.htm*"), recursive=True)
+    ):
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    if not pages:
+        print(f"No .html files found in {args.corpus}")
+    else:
+        print(f"Cleaning {len(pages)} pages, {args.repeat} passes per engine:")
+        for result in benchmark(pages, repeat=args.repeat):
+            print(
+                f"{result['engine']:>10}: {result['pages_per_second']:8.1f} pages/s, "
+                f"{result['megabytes_per_second']:6.2f} MB/s, "
+                f"{result['mismatches']} pages differ from bs4"
+            )
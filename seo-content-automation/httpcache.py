@@ -0,0 +1,220 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Defaults for the on-disk page cache
+_DEFAULT_CACHE_PATH = os.getenv(
+    "HTTP_CACHE_PATH", os.path.join(".cache", "http.sqlite3")
+)
+_DEFAULT_TTL = 6 * 60 * 60  # Seconds a cached page is served without revalidation
+_DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # Compressed size before eviction starts
+_STORED_HEADERS = ["Content-Type", "ETag", "Last-Modified"]
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+class HttpCache:
+    """
+    A persistent, URL-keyed page cache stored in SQLite.
+
+    Page bodies are stored zlib-compressed. Entries younger than `ttl` seconds
+    are served straight from disk; older entries are revalidated with a
+    conditional GET using their ETag/Last-Modified validators, so unchanged
+    pages only cost a 304. When the stored bodies exceed `max_bytes`, the least
+    recently used pages are evicted.
+    """
+
+    def __init__(
+        self, path=_DEFAULT_CACHE_PATH, ttl=_DEFAULT_TTL, max_bytes=_DEFAULT_MAX_BYTES
+    ):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+        )
+        self._connection.commit()
+
+    def get(self, url, session=None, timeout=None):
+        """
+        Returns the page at `url`, from disk when possible.
+
+        Args:
+            url (str): The URL of the page.
+            session (requests.Session, optional): A session to reuse connections from.
+            timeout (float, optional): Seconds to wait for the server before giving up.
+
+        Returns:
+            requests.Response: The response. `from_cache` is True when the body was
+            read from disk, either because it was fresh or the server replied 304.
+
+        Raises:
+            requests.exceptions.RequestException: If the page has to be fetched and
+            the request fails.
+        """
+        entry = self._load(url)
+        now = time.time()
+        if entry and now - entry["fetched_at"] < self.ttl:
+            self._touch(url, now)
+            return _build_response(url, 200, entry["headers"], entry["body"], True)
+
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = (session or requests).get(url, headers=headers, timeout=timeout)
+
+        if entry and response.status_code == 304:
+            # Servers may rotate validators on a 304, so keep the newest ones
+            for name in _STORED_HEADERS:
+                if name in response.headers:
+                    entry["headers"][name] = response.headers[name]
+            self._store(url, entry["headers"], entry["body"])
+            return _build_response(url, 200, entry["headers"], entry["body"], True)
+
+        if response.status_code == 200:
+            stored_headers = {
+                name: response.headers[name]
+                for name in _STORED_HEADERS
+                if name in response.headers
+            }
+            self._store(url, stored_headers, response.content)
+
+        response.from_cache = False
+        return response
+
+    def clear(self):
+        """Removes every cached page."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def _load(self, url):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT headers, body, etag, last_modified, fetched_at FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "headers": json.loads(row[0]),
+            "body": zlib.decompress(row[1]),
+            "etag": row[2],
+            "last_modified": row[3],
+            "fetched_at": row[4],
+        }
+
+    def _touch(self, url, now):
+        with self._lock:
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url)
+            )
+            self._connection.commit()
+
+    def _store(self, url, headers, body):
+        compressed = zlib.compress(body)
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                """
+                INSERT OR REPLACE INTO responses
+                    (url, headers, body, etag, last_modified, size, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    url,
+                    json.dumps(headers),
+                    compressed,
+                    headers.get("ETag"),
+                    headers.get("Last-Modified"),
+                    len(compressed),
+                    now,
+                    now,
+                ),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        """Drops least recently used pages until the cache fits in max_bytes."""
+        (total,) = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        for url, size in self._connection.execute(
+            "SELECT url, size FROM responses ORDER BY accessed_at"
+        ):
+            evicted.append((url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._connection.executemany("DELETE FROM responses WHERE url = ?", evicted)
+
+
+def _build_response(url, status_code, headers, body, from_cache):
+    """Builds a requests.Response around a cached page body."""
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = body
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.from_cache = from_cache
+    return response
+
+
+def get_default_cache():
+    """Returns the process-wide page cache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = HttpCache()
+        return _default_cache
+
+
+def cached_get(url, session=None, timeout=None, cache=None):
+    """
+    Fetches a page through the on-disk cache.
+
+    Args:
+        url (str): The URL of the page.
+        session (requests.Session, optional): A session to reuse connections from.
+        timeout (float, optional): Seconds to wait for the server before giving up.
+        cache (HttpCache, optional): The cache to use. Defaults to the shared cache
+            at HTTP_CACHE_PATH.
+
+    Returns:
+        requests.Response: The response, served from disk when it is still valid.
+    """
+    return (cache or get_default_cache()).get(url, session=session, timeout=timeout)
@@ -1,50 +1,47 @@
+import argparse
+import csv
+import datetime
 import os
 import sys
-import requests
-from google.ads.googleads.client import GoogleAdsClient
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from google.ads.googleads.errors import GoogleAdsException
 
+from googleadsclient import create_google_ads_client
+from metricsstore import METRIC_COLUMNS, MetricsStore, contiguous_ranges, date_range
 
-def get_access_token():
-    """Obtains a fresh access token using the refresh token."""
-    url = "https://www.googleapis.com/oauth2/v4/token"
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    data = {
-        "client_id": os.getenv("GCLIENT_ID"),
-        "client_secret": os.getenv("CLIENT_SECRET"),
-        "refresh_token": os.getenv("GCP_REFRESH_TOKEN"),
-        "grant_type": "refresh_token",
-    }
-    try:
-        response = requests.post(url, headers=headers, data=data)
-        response.raise_for_status()  # Raise an exception for bad responses
-        access_token = response.json().get("access_token")
-        return access_token
-    except (
-        requests.exceptions.RequestException
-    ) as e:  # Handle all request-related errors
-        print(f"Error: Failed to obtain access token: {e}")
-        return None
-
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; exports fall back to CSV
+    pa = None
 
-def create_google_ads_client():
-    """Creates a Google Ads API client using the obtained access token."""
-    access_token = get_access_token()
-    if not access_token:
-        print("Error: No access token available.")
-        return None
-
-    credentials = {
-        "developer_token": os.getenv("DEVELOPER_TOKEN"),
-        "client_id": os.getenv("GCLIENT_ID"),
-        "client_secret": os.getenv("CLIENT_SECRET"),
-        "refresh_token": os.getenv("GCP_REFRESH_TOKEN"),
-        "login_customer_id": os.getenv("MANAGER_CUSTOMER_ID"),
-        "access_token": access_token,
-        "use_proto_plus": True,
-    }
-    client = GoogleAdsClient.load_from_dict(credentials, version="v16")
-    return client
+# Columns of the keyword stats export, in order, with the GAQL field each comes from
+_KEYWORD_STATS_FIELDS = [
+    ("campaign_id", "campaign.id"),
+    ("campaign_name", "campaign.name"),
+    ("ad_group_id", "ad_group.id"),
+    ("ad_group_name", "ad_group.name"),
+    ("criterion_id", "ad_group_criterion.criterion_id"),
+    ("keyword_text", "ad_group_criterion.keyword.text"),
+    ("match_type", "ad_group_criterion.keyword.match_type"),
+    ("impressions", "metrics.impressions"),
+    ("clicks", "metrics.clicks"),
+    ("cost_micros", "metrics.cost_micros"),
+]
+_INTEGER_COLUMNS = {
+    "campaign_id",
+    "ad_group_id",
+    "criterion_id",
+    "impressions",
+    "clicks",
+    "cost_micros",
+}
+_MICROS = 1000000
+_DEFAULT_ACCOUNT_WORKERS = 8  # Client accounts queried at once in a manager export
+_DEFAULT_SYNC_DAYS = 90  # Days of history kept in the local metrics store
+_DEFAULT_RESTATEMENT_DAYS = 3  # Recent days the API may still revise, always refetched
 
 
 def fetch_keyword_stats(client, customer_id):
@@ -101,6 +98,387 @@ def fetch_keyword_stats(client, customer_id):
         handle_googleads_exception(ex)
 
 
+def build_keyword_stats_query(
+    date_range="LAST_7_DAYS", start_date=None, end_date=None, segments=()
+):
+    """
+    Builds the keyword_view query for a keyword stats export.
+
+    Args:
+        date_range (str): A GAQL date range such as LAST_7_DAYS or LAST_30_DAYS.
+            Ignored when start_date and end_date are given.
+        start_date (str, optional): The first day, as YYYY-MM-DD.
+        end_date (str, optional): The last day, as YYYY-MM-DD.
+        segments (list of str): Extra segments, e.g. ["segments.date", "segments.device"].
+
+    Returns:
+        str: The GAQL query.
+    """
+    if start_date and end_date:
+        date_condition = f"segments.date BETWEEN '{start_date}' AND '{end_date}'"
+    else:
+        date_condition = f"segments.date DURING {date_range}"
+    fields = [field for _, field in _KEYWORD_STATS_FIELDS] + list(segments)
+    return f"""
+        SELECT
+            {", ".join(fields)}
+        FROM keyword_view
+        WHERE
+            {date_condition}
+            AND campaign.advertising_channel_type = 'SEARCH'
+            AND ad_group.status = 'ENABLED'
+            AND ad_group_criterion.status IN ('ENABLED', 'PAUSED')"""
+
+
+def _field_value(row, field):
+    """Reads a dotted GAQL field from a row, returning enum values by name."""
+    value = row
+    for part in field.split("."):
+        value = getattr(value, part)
+    return getattr(value, "name", value)
+
+
+def _segment_column(segment):
+    """Returns the export column name for a segment, e.g. "segments.date" -> "date"."""
+    return segment.split(".", 1)[-1].replace(".", "_")
+
+
+def _keyword_stats_columns(rows, customer_id, segments):
+    """Turns a batch of rows into a dict of column lists."""
+    columns = {"customer_id": [str(customer_id)] * len(rows)}
+    for name, field in _KEYWORD_STATS_FIELDS:
+        columns[name] = [_field_value(row, field) for row in rows]
+    for segment in segments:
+        columns[_segment_column(segment)] = [
+            str(_field_value(row, segment)) for row in rows
+        ]
+    return columns
+
+
+class _ArrowWriter:
+    """Writes column batches to a Parquet or Arrow IPC file."""
+
+    def __init__(self, path, output_format, column_names):
+        fields = [
+            pa.field(name, pa.int64() if name in _INTEGER_COLUMNS else pa.string())
+            for name in column_names
+        ]
+        self.schema = pa.schema(fields + [pa.field("cost", pa.float64())])
+        if output_format == "parquet":
+            self._writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, columns):
+        arrays = [
+            pa.array(values, type=self.schema.field(name).type)
+            for name, values in columns.items()
+        ]
+        # Convert micros to currency units for the whole batch at once
+        cost_micros = arrays[list(columns).index("cost_micros")]
+        cost = pc.divide(pc.cast(cost_micros, pa.float64()), float(_MICROS))
+        self._writer.write_batch(
+            pa.RecordBatch.from_arrays(arrays + [cost], schema=self.schema)
+        )
+
+    def close(self):
+        self._writer.close()
+
+
+class _CsvWriter:
+    """Writes column batches to a CSV file."""
+
+    def __init__(self, path, column_names):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(list(column_names) + ["cost"])
+
+    def write(self, columns):
+        cost = [micros / _MICROS for micros in columns["cost_micros"]]
+        self._writer.writerows(zip(*columns.values(), cost))
+
+    def close(self):
+        self._file.close()
+
+
+def _create_keyword_stats_writer(output_path, output_format, segments):
+    """Opens the export writer for the output format, falling back to CSV without pyarrow."""
+    output_format = output_format or os.path.splitext(output_path)[1].lstrip(".")
+    output_format = {"feather": "arrow", "ipc": "arrow"}.get(
+        output_format, output_format
+    )
+    if output_format in ("parquet", "arrow") and pa is None:
+        print("pyarrow is not installed; writing CSV instead.")
+        output_format = "csv"
+        output_path = os.path.splitext(output_path)[0] + ".csv"
+
+    column_names = (
+        ["customer_id"]
+        + [name for name, _ in _KEYWORD_STATS_FIELDS]
+        + [_segment_column(segment) for segment in segments]
+    )
+    if output_format in ("parquet", "arrow"):
+        return _ArrowWriter(output_path, output_format, column_names), output_path
+    return _CsvWriter(output_path, column_names), output_path
+
+
+def _stream_keyword_stats(client, customer_id, query, segments):
+    """Yields the rows of an account's keyword stats query as column batches."""
+    ga_service = client.get_service("GoogleAdsService")
+    for batch in ga_service.search_stream(customer_id=customer_id, query=query):
+        rows = list(batch.results)
+        if rows:
+            yield _keyword_stats_columns(rows, customer_id, segments)
+
+
+def export_keyword_stats(
+    client,
+    customer_id,
+    output_path,
+    date_range="LAST_7_DAYS",
+    start_date=None,
+    end_date=None,
+    segments=(),
+    output_format=None,
+):
+    """
+    Streams keyword_view statistics for a whole account to a file.
+
+    Rows are read with search_stream and written one batch at a time, so memory
+    use stays constant however many rows the account has. The cost column is
+    converted from micros for each batch with vectorized Arrow operations.
+
+    Args:
+        client (GoogleAdsClient): The Google Ads client.
+        customer_id (str): The customer ID.
+        output_path (str): The file to write.
+        date_range (str): A GAQL date range such as LAST_7_DAYS or LAST_30_DAYS.
+        start_date (str, optional): The first day, as YYYY-MM-DD.
+        end_date (str, optional): The last day, as YYYY-MM-DD.
+        segments (list of str): Extra segments, e.g. ["segments.date", "segments.device"].
+        output_format (str, optional): "parquet", "arrow" or "csv". Defaults to the
+            file extension. Parquet and Arrow need pyarrow and fall back to CSV
+            without it.
+
+    Returns:
+        int: The number of rows written, or None if the query failed.
+    """
+    customer_id = customer_id.replace("-", "")
+    writer, output_path = _create_keyword_stats_writer(
+        output_path, output_format, segments
+    )
+    query = build_keyword_stats_query(date_range, start_date, end_date, segments)
+    row_count = 0
+    try:
+        for columns in _stream_keyword_stats(client, customer_id, query, segments):
+            writer.write(columns)
+            row_count += len(columns["customer_id"])
+    except GoogleAdsException as ex:
+        handle_googleads_exception(ex)
+        return None
+    finally:
+        writer.close()
+
+    print(f"Exported {row_count} keyword rows to {output_path}")
+    return row_count
+
+
+def list_client_accounts(client, manager_customer_id):
+    """
+    Lists the enabled, non-manager accounts below a manager account.
+
+    Args:
+        client (GoogleAdsClient): The Google Ads client.
+        manager_customer_id (str): The manager (MCC) customer ID.
+
+    Returns:
+        list of dict: The accounts, each with "id" and "name", at any depth below the manager.
+    """
+    query = """
+        SELECT
+            customer_client.id,
+            customer_client.descriptive_name
+        FROM customer_client
+        WHERE
+            customer_client.manager = FALSE
+            AND customer_client.status = 'ENABLED'"""
+    ga_service = client.get_service("GoogleAdsService")
+    response = ga_service.search(
+        customer_id=manager_customer_id.replace("-", ""), query=query
+    )
+    return [
+        {
+            "id": str(row.customer_client.id),
+            "name": row.customer_client.descriptive_name,
+        }
+        for row in response
+    ]
+
+
+def export_manager_keyword_stats(
+    client,
+    manager_customer_id,
+    output_path,
+    max_workers=_DEFAULT_ACCOUNT_WORKERS,
+    date_range="LAST_7_DAYS",
+    start_date=None,
+    end_date=None,
+    segments=(),
+    output_format=None,
+):
+    """
+    Exports keyword stats for every client account of a manager into one file.
+
+    The accounts are queried in parallel by a bounded pool of workers, and their
+    batches are written to a shared file as they arrive, tagged by customer_id.
+    An account that fails is reported and skipped without affecting the others;
+    rows it streamed before failing stay in the file, so re-export failed
+    accounts separately if they matter.
+
+    Args:
+        client (GoogleAdsClient): A client logged in through the manager account.
+        manager_customer_id (str): The manager (MCC) customer ID.
+        output_path (str): The file to write.
+        max_workers (int): The number of accounts queried at once.
+        date_range (str): A GAQL date range such as LAST_7_DAYS or LAST_30_DAYS.
+        start_date (str, optional): The first day, as YYYY-MM-DD.
+        end_date (str, optional): The last day, as YYYY-MM-DD.
+        segments (list of str): Extra segments, e.g. ["segments.date", "segments.device"].
+        output_format (str, optional): "parquet", "arrow" or "csv". Defaults to the
+            file extension.
+
+    Returns:
+        dict: "rows" with the row count per exported account and "failed" with
+        the error message per failed account.
+    """
+    accounts = list_client_accounts(client, manager_customer_id)
+    print(f"Exporting keyword stats for {len(accounts)} client accounts")
+
+    writer, output_path = _create_keyword_stats_writer(
+        output_path, output_format, segments
+    )
+    write_lock = threading.Lock()
+    query = build_keyword_stats_query(date_range, start_date, end_date, segments)
+
+    def export_account(account):
+        row_count = 0
+        for columns in _stream_keyword_stats(client, account["id"], query, segments):
+            with write_lock:
+                writer.write(columns)
+            row_count += len(columns["customer_id"])
+        return row_count
+
+    summary = {"rows": {}, "failed": {}}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(export_account, account): account
+                for account in accounts
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                account = futures[future]
+                try:
+                    summary["rows"][account["id"]] = future.result()
+                    status = f"{summary['rows'][account['id']]} rows"
+                except Exception as e:
+                    # One failing account must not stop the rest of the export
+                    summary["failed"][account["id"]] = str(e)
+                    status = f"failed: {e}"
+                print(
+                    f"[{done}/{len(accounts)}] {account['name']} ({account['id']}): {status}"
+                )
+    finally:
+        writer.close()
+
+    print(
+        f"Exported {sum(summary['rows'].values())} keyword rows from "
+        f"{len(summary['rows'])} accounts to {output_path} "
+        f"({len(summary['failed'])} failed)"
+    )
+    return summary
+
+
+def sync_keyword_metrics(
+    client,
+    customer_id,
+    store=None,
+    days=_DEFAULT_SYNC_DAYS,
+    restatement_days=_DEFAULT_RESTATEMENT_DAYS,
+):
+    """
+    Brings the local metrics store up to date for one account.
+
+    Only the days of the last `days` days that are not stored yet are fetched,
+    plus the most recent `restatement_days`, whose numbers the API may still
+    revise. Today is skipped because its data is incomplete.
+
+    Each contiguous range of days is stored in its own transaction, so a failed
+    sync keeps the ranges that completed and retries only the rest next time.
+
+    Args:
+        client (GoogleAdsClient): The Google Ads client.
+        customer_id (str): The customer ID.
+        store (MetricsStore, optional): The store to update. Defaults to METRICS_STORE_PATH.
+        days (int): The number of days of history to keep in sync.
+        restatement_days (int): The number of recent days that are always refetched.
+
+    Returns:
+        int: The number of rows stored, or None if a query failed.
+    """
+    customer_id = customer_id.replace("-", "")
+    store = store or MetricsStore()
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    wanted = date_range(
+        (yesterday - datetime.timedelta(days=days - 1)).isoformat(),
+        yesterday.isoformat(),
+    )
+    missing = set(wanted) - store.synced_dates(customer_id)
+    missing.update(wanted[-restatement_days:] if restatement_days else [])
+
+    row_count = 0
+    for start_date, end_date in contiguous_ranges(missing):
+        query = build_keyword_stats_query(
+            start_date=start_date, end_date=end_date, segments=["segments.date"]
+        )
+        batches = (
+            list(zip(*(columns[name] for name in METRIC_COLUMNS)))
+            for columns in _stream_keyword_stats(
+                client, customer_id, query, ["segments.date"]
+            )
+        )
+        try:
+            row_count += store.replace_days(customer_id, start_date, end_date, batches)
+        except GoogleAdsException as ex:
+            handle_googleads_exception(ex)
+            return None
+        print(f"Synced {customer_id} for {start_date} to {end_date}")
+
+    print(
+        f"Stored {row_count} keyword rows for {customer_id} "
+        f"({len(missing)} of {len(wanted)} days fetched)"
+    )
+    return row_count
+
+
+def print_keyword_report(store=None, days=7, customer_id=None, limit=50):
+    """Prints the top keywords of the last `days` days from the local metrics store."""
+    store = store or MetricsStore()
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    start_date = (yesterday - datetime.timedelta(days=days - 1)).isoformat()
+    for row in store.keyword_summary(
+        start_date, yesterday.isoformat(), customer_id=customer_id, limit=limit
+    ):
+        print(
+            f'Keyword: "{row["keyword_text"]}" '
+            f'(Match Type: {row["match_type"]}, ID: {row["criterion_id"]}) '
+            f'in Ad Group: "{row["ad_group_name"]}" (ID: {row["ad_group_id"]}) '
+            f'in Campaign: "{row["campaign_name"]}" (ID: {row["campaign_id"]}) '
+            f'had {row["impressions"]} impressions, {row["clicks"]} clicks, '
+            f'and cost {row["cost_micros"] / _MICROS:.2f} '
+            f"in the last {days} days."
+        )
+
+
 def handle_googleads_exception(exception):
     """Prints detailed error information from a Google Ads exception."""
     print(
@@ -115,15 +493,114 @@ def handle_googleads_exception(exception):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report keyword statistics.")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["sync", "report"],
+        help="sync: update the local metrics store; report: print top keywords from it",
+    )
+    parser.add_argument(
+        "--days",
+        type=int,
+        help=f"Days to sync (default {_DEFAULT_SYNC_DAYS}) or report (default 7)",
+    )
+    parser.add_argument(
+        "--export",
+        metavar="PATH",
+        help="Stream all keyword stats to a .parquet, .arrow or .csv file",
+    )
+    parser.add_argument("--date-range", default="LAST_7_DAYS")
+    parser.add_argument("--start-date", help="First day, as YYYY-MM-DD")
+    parser.add_argument("--end-date", help="Last day, as YYYY-MM-DD")
+    parser.add_argument(
+        "--manager",
+        action="store_true",
+        help="Export or sync every client account of MANAGER_CUSTOMER_ID",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=_DEFAULT_ACCOUNT_WORKERS,
+        help="Client accounts queried at once with --manager",
+    )
+    parser.add_argument(
+        "--segment",
+        action="append",
+        default=[],
+        help="Extra segment, e.g. segments.date (repeatable)",
+    )
+    args = parser.parse_args()
+    if args.manager and not (args.export or args.command == "sync"):
+        parser.error("--manager requires --export or sync")
+
+    # Reports are answered from the local store without calling the API
+    if args.command == "report":
+        print_keyword_report(
+            days=args.days or 7,
+            customer_id=os.getenv("ACCOUNT_ID", "").replace("-", "") or None,
+        )
+        sys.exit(0)
+
     # Initialize the Google Ads client
     client = create_google_ads_client()
     if not client:
         print("Failed to create Google Ads client. Check your credentials.")
         sys.exit(1)
 
+    if args.manager:
+        manager_customer_id = os.getenv("MANAGER_CUSTOMER_ID")
+        if not manager_customer_id:
+            print("Error: MANAGER_CUSTOMER_ID environment variable is not set.")
+            sys.exit(1)
+        if args.command == "sync":
+            store = MetricsStore()
+            accounts = list_client_accounts(client, manager_customer_id)
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                futures = {
+                    executor.submit(
+                        sync_keyword_metrics,
+                        client,
+                        account["id"],
+                        store,
+                        args.days or _DEFAULT_SYNC_DAYS,
+                    ): account
+                    for account in accounts
+                }
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"Sync failed for {futures[future]['id']}: {e}")
+            sys.exit(0)
+        export_manager_keyword_stats(
+            client,
+            manager_customer_id,
+            args.export,
+            max_workers=args.workers,
+            date_range=args.date_range,
+            start_date=args.start_date,
+            end_date=args.end_date,
+            segments=args.segment,
+        )
+        sys.exit(0)
+
     customer_id = os.getenv("ACCOUNT_ID")
     if not customer_id:
         print("Error: Customer ID (ACCOUNT_ID environment variable) is not set.")
         sys.exit(1)
 
-    fetch_keyword_stats(client, customer_id)
+    if args.command == "sync":
+        sync_keyword_metrics(client, customer_id, days=args.days or _DEFAULT_SYNC_DAYS)
+    elif args.export:
+        export_keyword_stats(
+            client,
+            customer_id,
+            args.export,
+            date_range=args.date_range,
+            start_date=args.start_date,
+            end_date=args.end_date,
+            segments=args.segment,
+        )
+    else:
+        fetch_keyword_stats(client, customer_id)
@@ -0,0 +1,210 @@
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+# Default location of the local keyword metrics store
+_DEFAULT_STORE_PATH = os.getenv(
+    "METRICS_STORE_PATH", os.path.join(".cache", "metrics.sqlite3")
+)
+
+# Columns stored per keyword and day, in insert order
+METRIC_COLUMNS = [
+    "customer_id",
+    "date",
+    "campaign_id",
+    "campaign_name",
+    "ad_group_id",
+    "ad_group_name",
+    "criterion_id",
+    "keyword_text",
+    "match_type",
+    "impressions",
+    "clicks",
+    "cost_micros",
+]
+
+
+def date_range(start_date, end_date):
+    """Returns the ISO dates from start_date to end_date, inclusive."""
+    start = datetime.date.fromisoformat(start_date)
+    end = datetime.date.fromisoformat(end_date)
+    return [
+        (start + datetime.timedelta(days=offset)).isoformat()
+        for offset in range((end - start).days + 1)
+    ]
+
+
+def contiguous_ranges(dates):
+    """Groups ISO dates into (start, end) ranges of consecutive days."""
+    ranges = []
+    for day in sorted(dates):
+        if ranges:
+            previous = datetime.date.fromisoformat(ranges[-1][1])
+            if datetime.date.fromisoformat(day) - previous == datetime.timedelta(1):
+                ranges[-1] = (ranges[-1][0], day)
+                continue
+        ranges.append((day, day))
+    return ranges
+
+
+class MetricsStore:
+    """
+    A local SQLite store of daily keyword metrics, partitioned by customer and date.
+
+    Each (customer, day) partition is replaced as a whole when it is synced, and
+    recorded in a sync log, so a sync only has to fetch the days that are
+    missing plus a short window of recent days the API may still restate.
+    Reports then read from the store instead of the Google Ads API.
+    """
+
+    def __init__(self, path=_DEFAULT_STORE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS keyword_metrics (
+                customer_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                campaign_id INTEGER NOT NULL,
+                campaign_name TEXT,
+                ad_group_id INTEGER NOT NULL,
+                ad_group_name TEXT,
+                criterion_id INTEGER NOT NULL,
+                keyword_text TEXT,
+                match_type TEXT,
+                impressions INTEGER NOT NULL,
+                clicks INTEGER NOT NULL,
+                cost_micros INTEGER NOT NULL,
+                PRIMARY KEY (customer_id, date, ad_group_id, criterion_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS synced_days (
+                customer_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (customer_id, date)
+            ) WITHOUT ROWID;
+            """)
+        self._connection.commit()
+
+    def synced_dates(self, customer_id):
+        """Returns the set of ISO dates already stored for a customer."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT date FROM synced_days WHERE customer_id = ?", (customer_id,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def replace_days(self, customer_id, start_date, end_date, batches):
+        """
+        Replaces the stored metrics of a customer for a range of days.
+
+        `batches` is read into a private temporary database first, without
+        holding the store's lock, so syncs of several customers can stream from
+        the API at the same time. The old rows are then deleted and the new ones
+        inserted in one transaction, so readers never see a half-synced day.
+
+        Args:
+            customer_id (str): The customer ID.
+            start_date (str): The first day, as YYYY-MM-DD.
+            end_date (str): The last day, as YYYY-MM-DD.
+            batches (iterable of list): Row tuples in METRIC_COLUMNS order.
+
+        Returns:
+            int: The number of rows stored.
+        """
+        columns = ", ".join(METRIC_COLUMNS)
+        placeholders = ", ".join("?" for _ in METRIC_COLUMNS)
+        # An empty name opens a temporary database that spills to disk and is
+        # deleted when closed, so large ranges do not have to fit in memory
+        staging = sqlite3.connect("")
+        try:
+            staging.execute(f"CREATE TABLE rows ({columns})")
+            row_count = 0
+            for rows in batches:
+                staging.executemany(f"INSERT INTO rows VALUES ({placeholders})", rows)
+                row_count += len(rows)
+
+            with self._lock:
+                try:
+                    self._connection.execute(
+                        "DELETE FROM keyword_metrics WHERE customer_id = ? AND date BETWEEN ? AND ?",
+                        (customer_id, start_date, end_date),
+                    )
+                    self._connection.executemany(
+                        f"INSERT OR REPLACE INTO keyword_metrics ({columns}) "
+                        f"VALUES ({placeholders})",
+                        staging.execute(f"SELECT {columns} FROM rows"),
+                    )
+                    now = time.time()
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO synced_days (customer_id, date, synced_at) VALUES (?, ?, ?)",
+                        [
+                            (customer_id, day, now)
+                            for day in date_range(start_date, end_date)
+                        ],
+                    )
+                    self._connection.commit()
+                except BaseException:
+                    self._connection.rollback()
+                    raise
+        finally:
+            staging.close()
+        return row_count
+
+    def keyword_summary(self, start_date, end_date, customer_id=None, limit=50):
+        """
+        Aggregates stored keyword metrics over a period.
+
+        Args:
+            start_date (str): The first day, as YYYY-MM-DD.
+            end_date (str): The last day, as YYYY-MM-DD.
+            customer_id (str, optional): Restrict the summary to one customer.
+            limit (int): The number of keywords to return, by impressions.
+
+        Returns:
+            list of dict: One entry per keyword with its summed impressions,
+            clicks and cost_micros.
+        """
+        query = """
+            SELECT customer_id, campaign_id, campaign_name, ad_group_id, ad_group_name,
+                   criterion_id, keyword_text, match_type,
+                   SUM(impressions), SUM(clicks), SUM(cost_micros)
+            FROM keyword_metrics
+            WHERE date BETWEEN ? AND ?
+            """
+        params = [start_date, end_date]
+        if customer_id:
+            query += " AND customer_id = ?"
+            params.append(customer_id)
+        query += """
+            GROUP BY customer_id, ad_group_id, criterion_id
+            ORDER BY SUM(impressions) DESC
+            LIMIT ?"""
+        params.append(limit)
+
+        columns = [
+            "customer_id",
+            "campaign_id",
+            "campaign_name",
+            "ad_group_id",
+            "ad_group_name",
+            "criterion_id",
+            "keyword_text",
+            "match_type",
+            "impressions",
+            "clicks",
+            "cost_micros",
+        ]
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def query(self, sql, params=()):
+        """Runs a read-only SQL query against the store and returns all rows."""
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
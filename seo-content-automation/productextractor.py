@@ -0,0 +1,433 @@
+import argparse
+import glob
+import html
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional
+    etree = None
+
+try:
+    from cssselect import GenericTranslator
+except ImportError:  # cssselect is optional
+    GenericTranslator = None
+
+# Per-domain extraction profiles, as JSON: {"example.com": {"weight": [{"css": "..."}]}}
+_DEFAULT_PROFILES_PATH = os.getenv(
+    "EXTRACTION_PROFILES_PATH", "extraction_profiles.json"
+)
+
+# Rules tried in order for each product field. A rule has a "css" selector or an
+# "xpath" expression, and an optional "attr" to read instead of the element text.
+DEFAULT_PROFILE = {
+    "name": [
+        {"css": "h1"},
+        {"css": 'meta[property="og:title"]', "attr": "content"},
+        {"css": "title"},
+    ],
+    "product_description": [
+        {"css": 'meta[name="description"]', "attr": "content"},
+        {"css": 'meta[property="og:description"]', "attr": "content"},
+        {"css": '[itemprop="description"]'},
+    ],
+    "main_image": [
+        {"css": 'meta[property="og:image"]', "attr": "content"},
+        {"css": '[itemprop="image"]', "attr": "src"},
+        {"css": "img", "attr": "src"},
+    ],
+    "weight": [
+        {"css": "span.weight"},
+        {"css": '[itemprop="weight"]'},
+    ],
+    "search_keywords": [
+        {"css": 'meta[name="keywords"]', "attr": "content"},
+    ],
+}
+PRODUCT_FIELDS = list(DEFAULT_PROFILE)
+REQUIRED_FIELDS = ["product_description"]  # Products without these are dropped
+
+_JSON_LD_PATTERN = re.compile(
+    rb"<script[^>]+type\s*=\s*[\"']application/ld\+json[\"'][^>]*>(.*?)</script>",
+    re.IGNORECASE | re.DOTALL,
+)
+# The subset of CSS translated without cssselect: tag, .class, #id and [attr="value"]
+# compounds joined by descendant or child combinators
+_SIMPLE_SELECTOR_PATTERN = re.compile(
+    r"""(?P<combinator>\s*>\s*|\s+)?(?P<tag>[\w-]+|\*)?(?P<parts>(?:[.#][\w-]+|\[[\w:-]+(?:=["']?[^"'\]]*["']?)?\])*)"""
+)
+_SELECTOR_PART_PATTERN = re.compile(
+    r"""\.(?P<cls>[\w-]+)|#(?P<id>[\w-]+)|\[(?P<attr>[\w:-]+)(?:=["']?(?P<value>[^"'\]]*)["']?)?\]"""
+)
+
+_default_extractor = None
+_default_extractor_lock = threading.Lock()
+
+
+def _normalize_space(text):
+    return " ".join(text.split())
+
+
+def _domain(host):
+    host = host.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def css_to_xpath(selector):
+    """
+    Translates a CSS selector to XPath.
+
+    cssselect is used when it is installed. Otherwise simple selectors such as
+    'span.weight', 'meta[name="description"]' or 'div#main > h1' are translated
+    directly.
+
+    Args:
+        selector (str): The CSS selector.
+
+    Returns:
+        str: The equivalent XPath expression.
+
+    Raises:
+        ValueError: If the selector is not supported.
+    """
+    if GenericTranslator is not None:
+        return GenericTranslator().css_to_xpath(selector)
+
+    steps = []
+    position = 0
+    selector = selector.strip()
+    while position < len(selector):
+        match = _SIMPLE_SELECTOR_PATTERN.match(selector, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Unsupported CSS selector: {selector!r}")
+        position = match.end()
+        axis = (
+            "/"
+            if match.group("combinator") and ">" in match.group("combinator")
+            else "//"
+        )
+        conditions = []
+        for part in _SELECTOR_PART_PATTERN.finditer(match.group("parts")):
+            if part.group("cls"):
+                conditions.append(
+                    f"contains(concat(' ', normalize-space(@class), ' '), ' {part.group('cls')} ')"
+                )
+            elif part.group("id"):
+                conditions.append(f"@id='{part.group('id')}'")
+            elif part.group("value") is not None:
+                conditions.append(f"@{part.group('attr')}='{part.group('value')}'")
+            else:
+                conditions.append(f"@{part.group('attr')}")
+        step = axis + (match.group("tag") or "*")
+        if conditions:
+            step += "[" + " and ".join(conditions) + "]"
+        steps.append(step)
+    if not steps:
+        raise ValueError(f"Unsupported CSS selector: {selector!r}")
+    return "descendant-or-self::" + "".join(steps).lstrip("/")
+
+
+def _iter_json_ld_products(value):
+    """Yields every Product object in parsed JSON-LD, including @graph entries."""
+    if isinstance(value, list):
+        for item in value:
+            yield from _iter_json_ld_products(item)
+    elif isinstance(value, dict):
+        types = value.get("@type")
+        types = types if isinstance(types, list) else [types]
+        if "Product" in types:
+            yield value
+        for key in ("@graph", "mainEntity", "itemListElement", "item"):
+            if key in value:
+                yield from _iter_json_ld_products(value[key])
+
+
+def _json_ld_text(value):
+    """Reduces a JSON-LD value (string, list, ImageObject, QuantitativeValue) to text."""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        if "value" in value:
+            unit = value.get("unitText") or value.get("unitCode") or ""
+            return f"{value['value']} {unit}".strip()
+        value = value.get("url") or value.get("contentUrl") or value.get("name")
+    if value is None:
+        return None
+    return _normalize_space(html.unescape(str(value))) or None
+
+
+def extract_json_ld_product(html_content):
+    """
+    Reads product fields from a page's JSON-LD Product schema, without parsing the HTML.
+
+    Args:
+        html_content (bytes or str): The HTML of the page.
+
+    Returns:
+        dict: The fields that were found, keyed like PRODUCT_FIELDS.
+    """
+    if isinstance(html_content, str):
+        html_content = html_content.encode("utf-8")
+    for block in _JSON_LD_PATTERN.findall(html_content):
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        for product in _iter_json_ld_products(data):
+            keywords = product.get("keywords")
+            if isinstance(keywords, list):
+                keywords = ", ".join(str(keyword) for keyword in keywords)
+            fields = {
+                "name": _json_ld_text(product.get("name")),
+                "product_description": _json_ld_text(product.get("description")),
+                "main_image": _json_ld_text(product.get("image")),
+                "weight": _json_ld_text(product.get("weight")),
+                "search_keywords": _json_ld_text(keywords),
+            }
+            return {field: value for field, value in fields.items() if value}
+    return {}
+
+
+def load_profiles(path=_DEFAULT_PROFILES_PATH):
+    """Loads per-domain extraction profiles from a JSON file, or returns {} if there is none."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ProductExtractor:
+    """
+    Extracts product details from HTML using per-domain extraction profiles.
+
+    Each profile maps product fields to CSS or XPath rules that are tried in
+    order, followed by the DEFAULT_PROFILE rules for the same field.
+    Rules are compiled to XPath once, when the extractor is created, and run
+    on a tree built by lxml (or BeautifulSoup when lxml is not installed).
+    A JSON-LD Product schema on the page is read first, and the HTML is only
+    parsed when it lacks some of the fields. A field that no rule finds is
+    None instead of failing the whole product.
+    """
+
+    def __init__(self, profiles=None):
+        profiles = load_profiles() if profiles is None else profiles
+        self._default = self._compile(DEFAULT_PROFILE)
+        self._profiles = {
+            _domain(domain): self._compile(
+                {
+                    field: profile.get(field, []) + DEFAULT_PROFILE[field]
+                    for field in PRODUCT_FIELDS
+                }
+            )
+            for domain, profile in profiles.items()
+        }
+
+    def _compile(self, profile):
+        compiled = {}
+        for field in PRODUCT_FIELDS:
+            rules = []
+            for rule in profile.get(field, []):
+                if etree is None:
+                    # BeautifulSoup can only run the CSS rules
+                    if "css" in rule:
+                        rules.append((rule["css"], rule.get("attr")))
+                    continue
+                expression = rule.get("xpath") or css_to_xpath(rule["css"])
+                rules.append((etree.XPath(expression), rule.get("attr")))
+            compiled[field] = rules
+        return compiled
+
+    def _profile_for(self, url):
+        host = _domain(urlsplit(url).hostname or "")
+        # example.com also applies to shop.example.com
+        while host:
+            if host in self._profiles:
+                return self._profiles[host]
+            host = host.partition(".")[2]
+        return self._default
+
+    def _select(self, tree, rules):
+        for rule, attr in rules:
+            if etree is not None:
+                matches = rule(tree)
+            else:
+                match = tree.select_one(rule)
+                matches = [match] if match is not None else []
+            for match in matches:
+                if isinstance(match, str):
+                    value = match
+                elif attr:
+                    value = match.get(attr)
+                elif etree is not None:
+                    value = "".join(match.itertext())
+                else:
+                    value = match.get_text()
+                value = _normalize_space(value or "")
+                if value:
+                    return value
+        return None
+
+    def extract(self, html_content, url):
+        """
+        Extracts the product details of a page.
+
+        Args:
+            html_content (bytes or str): The HTML of the page.
+            url (str): The page URL, used to pick the profile and resolve image URLs.
+
+        Returns:
+            dict: The PRODUCT_FIELDS plus "product_link". Fields that were not
+            found are None.
+        """
+        details = dict.fromkeys(PRODUCT_FIELDS)
+        details.update(extract_json_ld_product(html_content))
+
+        missing = [field for field in PRODUCT_FIELDS if not details[field]]
+        if missing:
+            if etree is not None:
+                tree = etree.HTML(html_content)
+            else:
+                tree = BeautifulSoup(html_content, "html.parser")
+            if tree is not None:
+                profile = self._profile_for(url)
+                for field in missing:
+                    details[field] = self._select(tree, profile[field])
+
+        if details["main_image"]:
+            details["main_image"] = urljoin(url, details["main_image"])
+        details["product_link"] = url
+        return details
+
+
+def get_default_extractor():
+    """Returns the process-wide extractor with the profiles from EXTRACTION_PROFILES_PATH."""
+    global _default_extractor
+    with _default_extractor_lock:
+        if _default_extractor is None:
+            _default_extractor = ProductExtractor()
+        return _default_extractor
+
+
+def extract_product_details(html_content, url):
+    """Extracts product details with the default extractor. See ProductExtractor.extract()."""
+    return get_default_extractor().extract(html_content, url)
+
+
+def _extract_with_soup_find(html_content, url):
+    """Reference implementation: the original soup.find chain, which fails on any missing element."""
+    try:
+        soup = BeautifulSoup(html_content, "html.parser")
+        return {
+            "name": soup.find("h1").get_text(),
+            "product_description": soup.find("meta", {"name": "description"})[
+                "content"
+            ],
+            "product_link": url,
+            "main_image": soup.find("img")["src"],
+            "weight": soup.find("span", {"class": "weight"}).get_text(),
+            "search_keywords": soup.find("meta", {"name": "keywords"})["content"],
+        }
+    except Exception:
+        return None
+
+
+def load_corpus(corpus_dir):
+    """
+    Loads saved pages for benchmark(), stored as corpus_dir/<domain>/<page>.html.
+
+    Args:
+        corpus_dir (str): The corpus directory. Pages directly inside it are
+            treated as example.com pages.
+
+    Returns:
+        list of tuple: (url, html bytes) pairs, sorted by path.
+    """
+    pages = []
+    for path in sorted(
+        glob.glob(os.path.join(corpus_dir, "**", "*.htm*"), recursive=True)
+    ):
+        relative = os.path.relpath(path, corpus_dir).replace(os.sep, "/")
+        domain, _, name = relative.partition("/")
+        url = f"https://{domain}/{name}" if name else f"https://example.com/{domain}"
+        with open(path, "rb") as f:
+            pages.append((url, f.read()))
+    return pages
+
+
+def benchmark(pages, extractor=None, repeat=3):
+    """
+    Compares profile-based extraction with the original soup.find chain on saved pages.
+
+    Args:
+        pages (list of tuple): (url, html bytes) pairs.
+        extractor (ProductExtractor, optional): Defaults to the default extractor.
+        repeat (int): The number of passes over the corpus per method.
+
+    Returns:
+        list of dict: One entry per method with "method", "pages_per_second",
+        "success_rate" (pages with every REQUIRED_FIELDS value) and
+        "field_rate" (the share of all product fields that were found).
+    """
+    extractor = extractor or get_default_extractor()
+    methods = [("soup.find", _extract_with_soup_find), ("profiles", extractor.extract)]
+
+    results = []
+    for name, extract in methods:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            outputs = [extract(page, url) for url, page in pages]
+        elapsed = time.perf_counter() - start
+
+        outputs = [output or {} for output in outputs]
+        results.append(
+            {
+                "method": name,
+                "pages_per_second": len(pages) * repeat / elapsed,
+                "success_rate": sum(
+                    1
+                    for output in outputs
+                    if all(output.get(field) for field in REQUIRED_FIELDS)
+                )
+                / len(pages),
+                "field_rate": sum(
+                    1
+                    for output in outputs
+                    for field in PRODUCT_FIELDS
+                    if output.get(field)
+                )
+                / (len(pages) * len(PRODUCT_FIELDS)),
+            }
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark product extraction on a directory of saved pages."
+    )
+    parser.add_argument(
+        "corpus",
+        help="Directory of saved .html pages, in one subdirectory per domain "
+        "(e.g. corpus/example.com/product.html) so the right profile is used",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        print(f"No .html files found in {args.corpus}")
+    else:
+        print(f"Extracting {len(pages)} pages, {args.repeat} passes per method:")
+        for result in benchmark(pages, repeat=args.repeat):
+            print(
+                f"{result['method']:>10}: {result['pages_per_second']:8.1f} pages/s, "
+                f"{result['success_rate']:.0%} products kept, "
+                f"{result['field_rate']:.0%} of fields found"
+            )
@@ -1,52 +1,51 @@
 import os
-import requests
-import openai
 import json
-from bs4 import BeautifulSoup
-from google.ads.googleads.client import GoogleAdsClient
 from google.ads.googleads.errors import GoogleAdsException
 
-
-# Helper functions
-def get_access_token():
-    """Obtains a fresh access token using the refresh token for Google Ads."""
-    url = "https://www.googleapis.com/oauth2/v4/token"
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    data = {
-        "client_id": os.getenv("GCLIENT_ID"),
-        "client_secret": os.getenv("CLIENT_SECRET"),
-        "refresh_token": os.getenv("GCP_REFRESH_TOKEN"),
-        "grant_type": "refresh_token",
-    }
-    try:
-        response = requests.post(url, headers=headers, data=data)
-        response.raise_for_status()
-        return response.json().get("access_token")
-    except requests.exceptions.RequestException as e:
-        print(f"Error: Failed to obtain access token: {e}")
-        return None
-
-
-def create_google_ads_client():
-    """Creates a Google Ads API client using the obtained access token."""
-    access_token = get_access_token()
-    if not access_token:
-        print("Error: No access token available.")
-        return None
-
-    credentials = {
-        "developer_token": os.getenv("DEVELOPER_TOKEN"),
-        "client_id": os.getenv("GCLIENT_ID"),
-        "client_secret": os.getenv("CLIENT_SECRET"),
-        "refresh_token": os.getenv("GCP_REFRESH_TOKEN"),
-        "login_customer_id": os.getenv("MANAGER_CUSTOMER_ID"),
-        "access_token": access_token,
-        "use_proto_plus": True,
-    }
-    client = GoogleAdsClient.load_from_dict(credentials, version="v16")
-    return client
+from contentindex import ContentIndex
+from googleadsclient import create_google_ads_client
+from httpcache import cached_get
+from llmcache import get_default_cache
+from llmclient import complete_chat
+from productextractor import REQUIRED_FIELDS, extract_product_details
+from sitemapdiscovery import SitemapDiscovery
+
+# Settings for rewriting product descriptions
+_REWRITE_MODEL = "gpt-4o"
+_REWRITE_MAX_TOKENS = 600  # Per rewritten description
+_MAX_PACKED_DESCRIPTIONS = 8  # Descriptions rewritten in one request
+_MAX_PACKED_CHARS = 4000  # Combined length of the descriptions sharing a request
+
+# Structured output schema for requests that rewrite several descriptions at once
+PACKED_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "rewritten_descriptions",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "rewrites": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "integer"},
+                            "description": {"type": "string"},
+                        },
+                        "required": ["id", "description"],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["rewrites"],
+            "additionalProperties": False,
+        },
+    },
+}
 
 
+# Helper functions
 def fetch_keyword_ideas(client, customer_id):
     """Fetches keyword ideas from Google Ads API."""
     if not customer_id:
@@ -87,10 +86,15 @@ def handle_googleads_exception(exception):
         print(f'Error message: "{error.message}".')
 
 
-# Function to extract product details using BeautifulSoup
+# Function to extract product details with the extraction profiles
 def fetch_product_details(product_url):
     """
-    Fetches the product details from a given product URL using BeautifulSoup.
+    Fetches the product details from a given product URL.
+
+    Fields are read from the page's JSON-LD Product schema when present, and
+    otherwise with the domain's extraction profile (see productextractor.py).
+    Fields that cannot be found are None; the product is only dropped when it
+    has no description to rewrite.
 
     Args:
         product_url (str): The URL of the product page to scrape.
@@ -99,63 +103,198 @@ def fetch_product_details(product_url):
         dict: A dictionary containing product details like name, description, link, and more.
     """
     try:
-        response = requests.get(product_url)
+        response = cached_get(product_url)
         response.raise_for_status()
-
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        product_details = {
-            "name": soup.find("h1").get_text(),
-            "product_description": soup.find("meta", {"name": "description"})[
-                "content"
-            ],
-            "product_link": product_url,
-            "main_image": soup.find("img")[
-                "src"
-            ],  # Modify based on actual structure of the page
-            "weight": soup.find(
-                "span", {"class": "weight"}
-            ).get_text(),  # Modify accordingly
-            "search_keywords": soup.find("meta", {"name": "keywords"})["content"],
-        }
-
-        return product_details
+        product_details = extract_product_details(response.content, product_url)
     except Exception as e:
         print(f"An error occurred while fetching product details: {e}")
         return None
 
+    missing = [field for field, value in product_details.items() if not value]
+    if missing:
+        print(f"Missing {', '.join(missing)} on {product_url}")
+    if not all(product_details[field] for field in REQUIRED_FIELDS):
+        return None
+    return product_details
+
+
+# GPT-4 interaction functions
+def build_rewrite_request(descriptions, keywords):
+    """
+    Builds the chat completion request that rewrites one or more product descriptions.
+
+    A single description is answered as plain text. Several descriptions are
+    numbered in one prompt that shares the instructions and keywords, and the
+    model returns one rewrite per number as JSON matching PACKED_RESPONSE_FORMAT.
+
+    Args:
+        descriptions (list of str): The product descriptions.
+        keywords (str): The keywords to integrate, comma separated.
+
+    Returns:
+        dict: The request body for the chat completions endpoint.
+    """
+    if len(descriptions) == 1:
+        prompt = f"Rewrite the following product description: {descriptions[0]}.\nEnsure that the following keywords are naturally integrated: {keywords}."
+        return {
+            "model": _REWRITE_MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": _REWRITE_MAX_TOKENS,
+            "temperature": 0.7,
+        }
 
-# GPT-4 interaction function
-def rewrite_description_with_highlights(description, keywords):
-    """Uses OpenAI API to rewrite a product description with keyword integration."""
-    openai.api_key = os.getenv("OPENAI_API_KEY")
+    numbered = "\n\n".join(
+        f"[{index}] {description}" for index, description in enumerate(descriptions)
+    )
+    prompt = (
+        f"Rewrite each of the following product descriptions separately.\n"
+        f"Ensure that the following keywords are naturally integrated: {keywords}.\n"
+        f"Return one rewrite per description, using the number in brackets as its id.\n\n"
+        f"{numbered}"
+    )
+    return {
+        "model": _REWRITE_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": _REWRITE_MAX_TOKENS * len(descriptions),
+        "temperature": 0.7,
+        "response_format": PACKED_RESPONSE_FORMAT,
+    }
 
-    prompt = f"Rewrite the following product description: {description}.\nEnsure that the following keywords are naturally integrated: {keywords}."
 
+def _pack_descriptions(descriptions):
+    """Groups the indexes of short descriptions into shared requests; long ones go alone."""
+    batch, batch_chars = [], 0
+    for index, description in enumerate(descriptions):
+        if len(description) > _MAX_PACKED_CHARS:
+            yield [index]
+            continue
+        if batch and (
+            len(batch) == _MAX_PACKED_DESCRIPTIONS
+            or batch_chars + len(description) > _MAX_PACKED_CHARS
+        ):
+            yield batch
+            batch, batch_chars = [], 0
+        batch.append(index)
+        batch_chars += len(description)
+    if batch:
+        yield batch
+
+
+def _parse_packed_rewrites(message_content, count):
+    """Returns the rewrites of a packed response keyed by id, ignoring unknown or empty ones."""
     try:
-        response = openai.Completion.create(
-            engine="gpt-4",
-            prompt=prompt,
-            max_tokens=600,
-            n=1,
-            stop=None,
-            temperature=0.7,
-        )
-        return response.choices[0].text.strip()
-    except Exception as e:
-        print(f"Error using OpenAI API: {e}")
-        return None
+        rewrites = json.loads(message_content)["rewrites"]
+    except (TypeError, ValueError, KeyError):
+        return {}
+    return {
+        rewrite["id"]: rewrite["description"].strip()
+        for rewrite in rewrites
+        if isinstance(rewrite, dict)
+        and rewrite.get("id") in range(count)
+        and str(rewrite.get("description") or "").strip()
+    }
+
+
+def rewrite_descriptions_with_highlights(
+    descriptions, keywords, api_key=None, cache=None
+):
+    """
+    Rewrites many product descriptions, packing short ones into shared requests.
+
+    Up to _MAX_PACKED_DESCRIPTIONS descriptions totalling at most
+    _MAX_PACKED_CHARS characters share one request, so the instructions and
+    keywords are sent once for all of them. Rate limits and server errors
+    are retried with backoff for the whole request. Only a description
+    missing from a packed answer is retried in a request of its own, so a
+    failing request is never multiplied into one request per description.
+
+    Args:
+        descriptions (list of str): The product descriptions.
+        keywords (str): The keywords to integrate, comma separated.
+        api_key (str, optional): Your OpenAI API key. Defaults to OPENAI_API_KEY.
+        cache (LLMCache, optional): The completion cache. Defaults to the shared cache.
+
+    Returns:
+        list: The rewritten descriptions in input order, None where a rewrite failed.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    cache = cache or get_default_cache()
+    results = [None] * len(descriptions)
+    retries = []
+    for indexes in _pack_descriptions(descriptions):
+        batch = [descriptions[index] for index in indexes]
+        try:
+            message_content = complete_chat(
+                build_rewrite_request(batch, keywords), api_key, cache
+            ).strip()
+        except Exception as e:
+            print(f"Error using OpenAI API: {e}")
+            continue
+
+        if len(indexes) == 1:
+            results[indexes[0]] = message_content or None
+            continue
+        rewrites = _parse_packed_rewrites(message_content, len(indexes))
+        for position, index in enumerate(indexes):
+            if position in rewrites:
+                results[index] = rewrites[position]
+            else:
+                retries.append(index)
+
+    for index in retries:
+        try:
+            results[index] = (
+                complete_chat(
+                    build_rewrite_request([descriptions[index]], keywords),
+                    api_key,
+                    cache,
+                ).strip()
+                or None
+            )
+        except Exception as e:
+            print(f"Error using OpenAI API: {e}")
+    return results
+
+
+def rewrite_description_with_highlights(
+    description, keywords, api_key=None, cache=None
+):
+    """Uses the OpenAI chat API to rewrite a product description with keyword integration."""
+    return rewrite_descriptions_with_highlights(
+        [description], keywords, api_key, cache
+    )[0]
 
 
 # Main function
-def generate_optimized_product_details(product_url):
-    """Fetch product details, generate keyword ideas, and enhance product description using GPT-4."""
+def generate_optimized_product_details(product_url, content_index=None, force=False):
+    """
+    Fetch product details, generate keyword ideas, and enhance product description using GPT-4.
+
+    Products whose scraped details are unchanged since the last run reuse the
+    stored keywords and enhanced description instead of calling Google Ads and
+    OpenAI again, unless `force` is set.
+
+    Returns the enhanced product details, or None if a step failed.
+    """
     # Fetch product details
     product_details = fetch_product_details(product_url)
     if not product_details:
         print("Failed to fetch product details.")
         return
 
+    # Skip keyword generation and GPT-4 when the product page has not changed
+    content_index = content_index or ContentIndex()
+    product_text = json.dumps(product_details, sort_keys=True)
+    stored = None if force else content_index.lookup(product_url, product_text)
+    if stored:
+        print(
+            "Product details are unchanged since the last run; reusing stored content."
+        )
+        product_details.update(stored)
+        print("Final Enhanced Product Details:")
+        print(json.dumps(product_details, indent=4))
+        return product_details
+
     # Create Google Ads client and fetch keywords
     client = create_google_ads_client()
     if not client:
@@ -178,14 +317,31 @@ def generate_optimized_product_details(product_url):
         return
 
     # Output the final result
+    content_index.store(
+        product_url,
+        product_text,
+        {"enhanced_description": enhanced_description, "keywords": keyword_ideas},
+    )
     product_details["enhanced_description"] = enhanced_description
     product_details["keywords"] = keyword_ideas
 
     print("Final Enhanced Product Details:")
     print(json.dumps(product_details, indent=4))
+    return product_details
 
 
 if __name__ == "__main__":
-    # Test URL (Replace with actual product page URL)
-    product_url = "https://example.com/sample-product"
-    generate_optimized_product_details(product_url)
+    sitemap_url = os.getenv("SITEMAP_URL")
+    if sitemap_url:
+        # Only products that are new or changed since the last run are processed
+        discovery = SitemapDiscovery()
+        processed = [
+            product_url
+            for product_url in discovery.discover(sitemap_url)
+            if generate_optimized_product_details(product_url)
+        ]
+        discovery.commit(processed)
+    else:
+        # Test URL (Replace with actual product page URL)
+        product_url = "https://example.com/sample-product"
+        generate_optimized_product_details(product_url)
@@ -0,0 +1,362 @@
+import argparse
+import csv
+import datetime
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from contentindex import ContentIndex
+from googleadsclient import create_google_ads_client
+from seocontentautomation import (
+    fetch_keyword_ideas,
+    fetch_product_details,
+    rewrite_descriptions_with_highlights,
+)
+from sitemapdiscovery import SitemapDiscovery, is_sitemap, iter_sitemap
+
+# Defaults for the pipeline stages
+_DEFAULT_SCRAPE_WORKERS = 16  # Product pages fetched at once
+_DEFAULT_REWRITE_WORKERS = 4  # OpenAI requests in flight at once
+_DEFAULT_REWRITE_BATCH = 8  # Scraped products a rewrite worker takes at once
+_DEFAULT_QUEUE_SIZE = 64  # Items allowed to wait between two stages
+
+_DONE = object()
+
+
+def read_urls(source):
+    """
+    Reads product URLs from a text file, a CSV file or a sitemap.
+
+    Args:
+        source (str): A file with one URL per line, a CSV file with a "url"
+            column (or URLs in its first column), or the path or URL of an XML
+            sitemap or sitemap index, which is streamed.
+
+    Yields:
+        str: The product URLs, in order.
+    """
+    if is_sitemap(source):
+        for url, _ in iter_sitemap(source):
+            yield url
+    elif source.lower().endswith(".csv"):
+        with open(source, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            column = header.index("url") if "url" in header else 0
+            if "url" not in header and header:
+                yield header[0].strip()
+            for row in reader:
+                if len(row) > column and row[column].strip():
+                    yield row[column].strip()
+    else:
+        with open(source, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+
+
+def load_checkpoint(output_path):
+    """
+    Returns the URLs already written to a JSONL output file.
+
+    Records with an "error" are not counted, so failed products are retried
+    on the next run. A line cut short by a crash is ignored.
+
+    Args:
+        output_path (str): The JSONL file written by run_pipeline.
+
+    Returns:
+        set of str: The URLs that were processed successfully.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "error" not in record:
+                done.add(record.get("product_link"))
+    return done
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _start_stage(func, inbox, outbox, workers, batch_size=None):
+    """
+    Runs `func` over the items of `inbox` on `workers` threads, putting results in `outbox`.
+
+    Records that already failed are passed through untouched. Once every
+    worker has seen the end of `inbox`, the end is signalled to `outbox`.
+
+    With a `batch_size`, `func` takes and returns a list of records instead:
+    a worker waits for one record, then adds those already waiting in `inbox`
+    up to `batch_size`, so batches fill up under load without delaying a
+    record that arrives alone.
+    """
+
+    def take():
+        records = [inbox.get()]
+        while records[-1] is not _DONE and len(records) < (batch_size or 1):
+            try:
+                records.append(inbox.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def work():
+        while True:
+            records = take()
+            finished = records[-1] is _DONE
+            if finished:
+                records.pop()
+                inbox.put(_DONE)  # Let the other workers of this stage stop too
+            failed = [record for record in records if "error" in record]
+            records = [record for record in records if "error" not in record]
+            if records:
+                try:
+                    records = func(records) if batch_size else [func(records[0])]
+                except Exception as e:
+                    for record in records:
+                        record["error"] = f"{type(e).__name__}: {e}"
+            for record in failed + records:
+                outbox.put(record)
+            if finished:
+                return
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    def close():
+        for thread in threads:
+            thread.join()
+        outbox.put(_DONE)
+
+    threading.Thread(target=close, daemon=True).start()
+
+
+def run_pipeline(
+    urls,
+    output_path,
+    scrape_workers=_DEFAULT_SCRAPE_WORKERS,
+    rewrite_workers=_DEFAULT_REWRITE_WORKERS,
+    rewrite_batch=_DEFAULT_REWRITE_BATCH,
+    queue_size=_DEFAULT_QUEUE_SIZE,
+    content_index=None,
+    force=False,
+):
+    """
+    Generates optimized product details for many URLs as concurrent stages.
+
+    Pages are scraped on one thread pool and rewritten with GPT-4 on another,
+    connected by bounded queues, so both external services are busy at the
+    same time and a slow stage holds back the ones before it instead of
+    letting work pile up in memory. Short descriptions waiting together are
+    rewritten in shared requests of up to `rewrite_batch`. The account
+    keywords do not depend on the product, so they are fetched once while the
+    first pages are scraped.
+
+    Every finished product is appended to `output_path` as one JSON line and
+    flushed right away. The file doubles as the checkpoint: products already
+    in it are skipped when the pipeline is started again.
+
+    Args:
+        urls (iterable of str): The product URLs, e.g. from read_urls().
+        output_path (str): The JSONL file to append results to.
+        scrape_workers (int): The number of pages fetched at once.
+        rewrite_workers (int): The number of OpenAI requests in flight at once.
+        rewrite_batch (int): The largest number of products rewritten together.
+        queue_size (int): The number of items allowed to wait between stages.
+        content_index (ContentIndex, optional): Reuses the stored content of
+            unchanged products. Defaults to CONTENT_INDEX_PATH.
+        force (bool): Regenerate unchanged products instead of reusing them.
+
+    Returns:
+        dict: The number of products "written", "failed" and "skipped".
+
+    Raises:
+        Exception: Whatever reading `urls` raised, e.g. a sitemap that cannot be
+            downloaded, after the products read before it have been written.
+    """
+    content_index = content_index or ContentIndex()
+    done = load_checkpoint(output_path)
+    summary = {"written": 0, "failed": 0, "skipped": 0}
+
+    keyword_executor = ThreadPoolExecutor(max_workers=1)
+    keywords_future = keyword_executor.submit(
+        lambda: fetch_keyword_ideas(create_google_ads_client(), os.getenv("ACCOUNT_ID"))
+    )
+
+    def scrape(record):
+        product_details = fetch_product_details(record["product_link"])
+        if not product_details:
+            record["error"] = "Failed to fetch product details."
+            return record
+        record.update(product_details)
+
+        product_text = json.dumps(product_details, sort_keys=True)
+        stored = (
+            None
+            if force
+            else content_index.lookup(record["product_link"], product_text)
+        )
+        if stored:
+            record.update(stored)
+        return record
+
+    def rewrite(records):
+        # Records reused from the content index already have their rewrite
+        new_records = [r for r in records if "enhanced_description" not in r]
+        if not new_records:
+            return records
+        keyword_ideas = keywords_future.result()
+        if not keyword_ideas:
+            for record in new_records:
+                record["error"] = "Failed to fetch keyword ideas."
+            return records
+
+        enhanced_descriptions = rewrite_descriptions_with_highlights(
+            [record["product_description"] for record in new_records],
+            ", ".join(keyword_ideas),
+        )
+        for record, enhanced_description in zip(new_records, enhanced_descriptions):
+            if not enhanced_description:
+                record["error"] = "Failed to enhance product description."
+                continue
+
+            # The record still holds exactly the scraped product details here
+            content_index.store(
+                record["product_link"],
+                json.dumps(record, sort_keys=True),
+                {
+                    "enhanced_description": enhanced_description,
+                    "keywords": keyword_ideas,
+                },
+            )
+            record["enhanced_description"] = enhanced_description
+            record["keywords"] = keyword_ideas
+        return records
+
+    pending = queue.Queue(maxsize=queue_size)
+    scraped = queue.Queue(maxsize=queue_size)
+    finished = queue.Queue(maxsize=queue_size)
+    _start_stage(scrape, pending, scraped, scrape_workers)
+    _start_stage(rewrite, scraped, finished, rewrite_workers, rewrite_batch)
+
+    feed_errors = []
+
+    def feed():
+        try:
+            for url in urls:
+                if url in done:
+                    summary["skipped"] += 1
+                else:
+                    done.add(url)  # Also drops duplicates within the input
+                    pending.put({"product_link": url})
+        except Exception as e:
+            feed_errors.append(
+                e
+            )  # Raised again once the products in flight are written
+        finally:
+            pending.put(_DONE)
+
+    threading.Thread(target=feed, daemon=True).start()
+
+    try:
+        with open(output_path, "a", encoding="utf-8") as output:
+            # Start on a new line after a record that a crash cut short
+            if output.tell() and not _ends_with_newline(output_path):
+                output.write("\n")
+            while True:
+                record = finished.get()
+                if record is _DONE:
+                    break
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                if "error" in record:
+                    summary["failed"] += 1
+                    print(f"Failed {record['product_link']}: {record['error']}")
+                else:
+                    summary["written"] += 1
+                    print(f"Wrote {record['product_link']}")
+    finally:
+        keyword_executor.shutdown(wait=False)
+
+    if feed_errors:
+        print(
+            f"Pipeline stopped reading URLs: {summary['written']} written, "
+            f"{summary['failed']} failed, {summary['skipped']} already done."
+        )
+        raise feed_errors[0]
+
+    print(
+        f"Pipeline finished: {summary['written']} written, "
+        f"{summary['failed']} failed, {summary['skipped']} already done."
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate optimized product details for many product pages."
+    )
+    parser.add_argument(
+        "source", help="A text file of URLs, a CSV with a url column, or a sitemap"
+    )
+    parser.add_argument(
+        "--output",
+        help="JSONL file to append results to (default products.jsonl, or "
+        "products-YYYY-MM-DD.jsonl for sitemap runs)",
+    )
+    parser.add_argument("--scrape-workers", type=int, default=_DEFAULT_SCRAPE_WORKERS)
+    parser.add_argument("--rewrite-workers", type=int, default=_DEFAULT_REWRITE_WORKERS)
+    parser.add_argument(
+        "--rewrite-batch",
+        type=int,
+        default=_DEFAULT_REWRITE_BATCH,
+        help="Products whose descriptions may share one rewrite request",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate products whose pages are unchanged",
+    )
+    parser.add_argument(
+        "--all-pages",
+        action="store_true",
+        help="Process every sitemap page, not only new and changed ones",
+    )
+    args = parser.parse_args()
+
+    discovery = None
+    if is_sitemap(args.source) and not args.all_pages:
+        # Only pages whose <lastmod> changed since the last run are processed. A
+        # dated output file keeps pages written on earlier days from being skipped
+        # by the checkpoint when they change again.
+        discovery = SitemapDiscovery()
+        urls = discovery.discover(args.source)
+        output_path = args.output or f"products-{datetime.date.today()}.jsonl"
+    else:
+        urls = read_urls(args.source)
+        output_path = args.output or "products.jsonl"
+
+    run_pipeline(
+        urls,
+        output_path,
+        scrape_workers=args.scrape_workers,
+        rewrite_workers=args.rewrite_workers,
+        rewrite_batch=args.rewrite_batch,
+        force=args.force,
+    )
+    if discovery:
+        discovery.commit(load_checkpoint(output_path))
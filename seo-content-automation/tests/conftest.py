@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts are run from their own folder, so import them the same way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,103 @@
+import pytest
+
+from aigeneratecontent import parse_description_with_highlights
+
+
+def test_markdown_heading_is_the_title_and_not_in_the_description():
+    content = parse_description_with_highlights(
+        "# Rugged 5G Router RX-500 for Industrial IoT\n"
+        "\n"
+        "The RX-500 keeps remote sites online with dual SIM failover.\n"
+        "\n"
+        "**Product Highlights:**\n"
+        "- 5G SA/NSA with LTE fallback\n"
+        "- Dual SIM failover\n"
+    )
+
+    assert content["title"] == "Rugged 5G Router RX-500 for Industrial IoT"
+    assert content["rewritten_description"] == (
+        "The RX-500 keeps remote sites online with dual SIM failover."
+    )
+    assert content["highlights"] == ["5G SA/NSA with LTE fallback", "Dual SIM failover"]
+
+
+def test_inline_label_in_the_description_does_not_start_a_section():
+    content = parse_description_with_highlights(
+        "**Product Title:** Rugged Router\n"
+        "**Enhanced Description:** Built for harsh sites.\n"
+        "Specifications: IP67, -40 to 75 C, four GbE ports.\n"
+        "It ships with zero-touch provisioning.\n"
+        "**Key Specs and Features:**\n"
+        "- IP67 enclosure\n"
+    )
+
+    assert content["rewritten_description"] == (
+        "Built for harsh sites.\n"
+        "Specifications: IP67, -40 to 75 C, four GbE ports.\n"
+        "It ships with zero-touch provisioning."
+    )
+    assert content["highlights"] == ["IP67 enclosure"]
+
+
+@pytest.mark.parametrize(
+    "message_content",
+    [
+        "1. Product Title: Rugged Router\n2. Enhanced Description: Built for harsh sites.\n"
+        "3. Key Specs and Features:\n- IP67\n4. Meta Description: Meta text.\n5. Meta Title: Short",
+        "## Title\nRugged Router\n## Description\nBuilt for harsh sites.\n## Specifications\n"
+        "- IP67\n### Meta Description\nMeta text.\n### Meta Title\nShort",
+        "Title:\nRugged Router\nDescription:\nBuilt for harsh sites.\nHighlights:\n- IP67\n"
+        "Meta Description:\nMeta text.\nMeta Title:\nShort",
+        "**Title**: Rugged Router\n**Description**: Built for harsh sites.\n**Highlights**:\n"
+        "* IP67\n**Meta Description**: Meta text.\n**Meta Title**: Short",
+    ],
+    ids=["numbered", "headings", "standalone", "bold"],
+)
+def test_header_styles(message_content):
+    content = parse_description_with_highlights(message_content)
+
+    assert content["title"] == "Rugged Router"
+    assert content["rewritten_description"] == "Built for harsh sites."
+    assert content["highlights"] == ["IP67"]
+    assert content["meta_description"] == "Meta text."
+    assert content["meta_title"] == "Short"
+
+
+def test_plain_inline_labels_for_title_and_meta_fields():
+    content = parse_description_with_highlights(
+        "Title: Smart Switch\n"
+        "Control every outlet from your phone.\n"
+        "Highlights:\n"
+        "- Energy monitoring\n"
+        "Meta Description: Remote-controlled smart switch with energy monitoring.\n"
+        "Meta Title: Smart Switch | Remote Power\n"
+    )
+
+    assert content["title"] == "Smart Switch"
+    assert content["rewritten_description"] == "Control every outlet from your phone."
+    assert content["highlights"] == ["Energy monitoring"]
+    assert content["meta_description"] == (
+        "Remote-controlled smart switch with energy monitoring."
+    )
+    assert content["meta_title"] == "Smart Switch | Remote Power"
+    assert content["length_issues"] == []
+
+
+@pytest.mark.parametrize(
+    "line, field, value",
+    [
+        ("Meta Description: Meta text.", "meta_description", "Meta text."),
+        ("Meta Title: Short", "meta_title", "Short"),
+        ("Product Title: Rugged Router", "title", "Rugged Router"),
+    ],
+)
+def test_plain_inline_label_after_highlights(line, field, value):
+    content = parse_description_with_highlights(
+        "**Title:** Rugged Router\n"
+        "**Description:** Built for harsh sites.\n"
+        "**Highlights:**\n"
+        "- IP67\n" + line + "\n"
+    )
+
+    assert content[field] == value
+    assert content["highlights"] == ["IP67"]
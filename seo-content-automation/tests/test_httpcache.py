@@ -0,0 +1,237 @@
+import importlib.util
+import os
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import httpcache
+from httpcache import HttpCache, cached_get
+
+
+class _PageServer:
+    """
+    Serves `pages` (path -> dict with "body" and optional "etag"/"last_modified")
+    and answers conditional GETs with a 304 when the validators still match.
+    """
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append((self.path, dict(self.headers)))
+                page = server.pages.get(self.path)
+                if page is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                etag = page.get("etag")
+                last_modified = page.get("last_modified")
+                not_modified = (etag and self.headers.get("If-None-Match") == etag) or (
+                    last_modified
+                    and self.headers.get("If-Modified-Since") == last_modified
+                )
+                self.send_response(304 if not_modified else 200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                if etag:
+                    self.send_header("ETag", etag)
+                if last_modified:
+                    self.send_header("Last-Modified", last_modified)
+                body = b"" if not_modified else page["body"]
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self._server.server_address[1]}{path}"
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture(scope="module")
+def _page_server():
+    page_server = _PageServer()
+    yield page_server
+    page_server.stop()
+
+
+@pytest.fixture
+def server(_page_server):
+    _page_server.pages.clear()
+    _page_server.requests.clear()
+    return _page_server
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000000.0]
+    monkeypatch.setattr(httpcache.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return HttpCache(path=str(tmp_path / "http.sqlite3"), ttl=60)
+
+
+def test_fresh_pages_are_served_from_disk(server, cache, clock):
+    server.pages["/a"] = {"body": "<p>Café</p>".encode("utf-8")}
+
+    first = cache.get(server.url("/a"))
+    clock[0] += 59
+    second = cache.get(server.url("/a"))
+
+    assert first.from_cache is False
+    assert second.from_cache is True
+    assert second.status_code == 200
+    assert second.text == "<p>Café</p>"
+    assert second.headers["content-type"] == "text/html; charset=utf-8"
+    assert len(server.requests) == 1
+
+
+def test_stale_pages_are_revalidated_with_the_etag(server, cache, clock):
+    server.pages["/a"] = {"body": b"<p>v1</p>", "etag": '"v1"'}
+    cache.get(server.url("/a"))
+
+    clock[0] += 61
+    unchanged = cache.get(server.url("/a"))
+
+    assert server.requests[1][1]["If-None-Match"] == '"v1"'
+    assert unchanged.from_cache is True
+    assert unchanged.content == b"<p>v1</p>"
+
+    # The 304 restarted the TTL
+    clock[0] += 59
+    cache.get(server.url("/a"))
+    assert len(server.requests) == 2
+
+    server.pages["/a"] = {"body": b"<p>v2</p>", "etag": '"v2"'}
+    clock[0] += 61
+    changed = cache.get(server.url("/a"))
+
+    assert changed.from_cache is False
+    assert changed.content == b"<p>v2</p>"
+    clock[0] += 61
+    cache.get(server.url("/a"))
+    assert server.requests[-1][1]["If-None-Match"] == '"v2"'
+
+
+def test_stale_pages_are_revalidated_with_last_modified(server, cache, clock):
+    last_modified = "Wed, 21 Oct 2026 07:28:00 GMT"
+    server.pages["/a"] = {"body": b"<p>v1</p>", "last_modified": last_modified}
+    cache.get(server.url("/a"))
+
+    clock[0] += 61
+    response = cache.get(server.url("/a"))
+
+    headers = server.requests[1][1]
+    assert headers["If-Modified-Since"] == last_modified
+    assert "If-None-Match" not in headers
+    assert response.from_cache is True
+    assert response.content == b"<p>v1</p>"
+
+
+def test_pages_without_validators_are_fetched_again_when_stale(server, cache, clock):
+    server.pages["/a"] = {"body": b"<p>v1</p>"}
+    cache.get(server.url("/a"))
+
+    clock[0] += 61
+    response = cache.get(server.url("/a"))
+
+    assert response.from_cache is False
+    assert "If-None-Match" not in server.requests[1][1]
+    assert "If-Modified-Since" not in server.requests[1][1]
+
+
+def test_error_responses_are_not_cached(server, cache):
+    response = cache.get(server.url("/missing"))
+    server.pages["/missing"] = {"body": b"<p>Now here</p>"}
+
+    assert response.status_code == 404
+    assert cache.get(server.url("/missing")).content == b"<p>Now here</p>"
+    assert len(server.requests) == 2
+
+
+def test_least_recently_used_pages_are_evicted(server, tmp_path, clock):
+    # Incompressible bodies, so each page takes roughly 1 KB on disk
+    for path in ("/a", "/b", "/c"):
+        server.pages[path] = {"body": os.urandom(1000)}
+    size = len(zlib.compress(server.pages["/a"]["body"]))
+    cache = HttpCache(
+        path=str(tmp_path / "http.sqlite3"), ttl=60, max_bytes=2 * size + 50
+    )
+
+    cache.get(server.url("/a"))
+    clock[0] += 1
+    cache.get(server.url("/b"))
+    clock[0] += 1
+    cache.get(server.url("/a"))  # A cache hit makes /a the most recently used
+    clock[0] += 1
+    cache.get(server.url("/c"))
+    assert len(server.requests) == 3
+
+    assert cache.get(server.url("/a")).from_cache is True
+    assert cache.get(server.url("/c")).from_cache is True
+    assert cache.get(server.url("/b")).from_cache is False
+    assert len(server.requests) == 4
+
+
+def test_clear_removes_every_page(server, cache):
+    server.pages["/a"] = {"body": b"<p>v1</p>"}
+    cache.get(server.url("/a"))
+
+    cache.clear()
+
+    assert cache.get(server.url("/a")).from_cache is False
+    assert len(server.requests) == 2
+
+
+def test_cached_get_uses_the_session_and_the_given_cache(server, cache):
+    server.pages["/a"] = {"body": b"<p>v1</p>"}
+
+    with requests.Session() as session:
+        assert cached_get(server.url("/a"), session=session, cache=cache).ok
+        assert cached_get(server.url("/a"), session=session, cache=cache).from_cache
+
+    assert len(server.requests) == 1
+
+
+def _load_data_collection():
+    path = os.path.join(os.path.dirname(__file__), "..", "data-collection.py")
+    spec = importlib.util.spec_from_file_location("data_collection", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_data_collection_reads_pages_through_the_default_cache(
+    server, cache, monkeypatch
+):
+    data_collection = _load_data_collection()
+    monkeypatch.setattr(httpcache, "_default_cache", cache)
+    server.pages["/a"] = {
+        "body": b"<html><body><script>x()</script><p>Power switch</p></body></html>"
+    }
+
+    assert data_collection.fetch_and_clean_url_content(server.url("/a")) == (
+        "Power switch"
+    )
+    assert b"Power switch" in data_collection.fetch_url_content(server.url("/a"))
+    assert len(server.requests) == 1
+    assert data_collection.fetch_url_content(server.url("/missing")) == b""
@@ -0,0 +1,216 @@
+import itertools
+import os
+
+import pytest
+
+import llmcache
+from llmcache import (
+    FilesystemBackend,
+    LLMCache,
+    MemoryBackend,
+    SQLiteBackend,
+    create_backend,
+    request_key,
+)
+
+
+def _request(text, **options):
+    return {
+        "model": "gpt-4o",
+        "messages": [{"role": "user", "content": text}],
+        "temperature": 0.7,
+        **options,
+    }
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces time.time with a clock that ticks one second per call."""
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(llmcache.time, "time", lambda: float(next(ticks)))
+
+
+def test_request_key_ignores_field_order_and_unkeyed_fields():
+    data = _request("Hello", max_tokens=100)
+    reordered = dict(reversed(list(data.items())))
+
+    assert request_key(reordered) == request_key(data)
+    assert request_key({**data, "stream": True, "user": "u-1"}) == request_key(data)
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        {"model": "gpt-4o-mini"},
+        {"temperature": 0.9},
+        {"max_tokens": 10},
+        {"messages": [{"role": "user", "content": "hello"}]},
+        {"response_format": {"type": "json_object"}},
+    ],
+)
+def test_request_key_changes_with_generation_parameters(change):
+    data = _request("Hello")
+
+    assert request_key({**data, **change}) != request_key(data)
+
+
+def test_request_key_handles_non_ascii_text():
+    assert request_key(_request("Größe")) != request_key(_request("Grosse"))
+
+
+@pytest.fixture(params=["memory", "sqlite", "filesystem"])
+def backend_factory(request, tmp_path):
+    def create(max_entries=100):
+        return create_backend(
+            request.param, str(tmp_path / "cache"), max_entries=max_entries
+        )
+
+    return create
+
+
+def test_backends_store_and_delete(backend_factory):
+    backend = backend_factory()
+
+    backend.set("k1", "value 1")
+    value, stored_at = backend.get("k1")
+    assert value == "value 1" and stored_at > 0
+    assert backend.get("missing") is None
+
+    backend.set("k1", "value 2")
+    assert backend.get("k1")[0] == "value 2"
+
+    backend.delete("k1")
+    assert backend.get("k1") is None
+    backend.delete("k1")  # Deleting a missing key is a no-op
+
+
+def test_cache_counts_hits_and_misses(backend_factory):
+    cache = LLMCache(backend_factory())
+
+    assert cache.get(_request("Hello")) is None
+    cache.set(_request("Hello"), "Hi!")
+    assert cache.get(_request("Hello")) == "Hi!"
+    assert cache.get(_request("Hello", stream=True)) == "Hi!"
+
+    assert cache.stats() == {"hits": 2, "misses": 1, "hit_rate": 2 / 3}
+
+
+def test_expired_entries_are_misses_and_deleted(backend_factory, clock):
+    backend = backend_factory()
+    cache = LLMCache(backend, ttl=5)
+    cache.set(_request("Hello"), "Hi!")
+
+    assert cache.get(_request("Hello")) == "Hi!"  # A few ticks old
+    for _ in range(10):
+        llmcache.time.time()
+
+    assert cache.get(_request("Hello")) is None
+    assert backend.get(request_key(_request("Hello"))) is None
+
+
+def test_zero_ttl_never_expires(clock):
+    cache = LLMCache(MemoryBackend(), ttl=0)
+    cache.set(_request("Hello"), "Hi!")
+    for _ in range(100):
+        llmcache.time.time()
+
+    assert cache.get(_request("Hello")) == "Hi!"
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", "1")
+    backend.set("b", "2")
+    backend.get("a")  # "b" is now the least recently used
+
+    backend.set("c", "3")
+
+    assert backend.get("b") is None
+    assert backend.get("a")[0] == "1" and backend.get("c")[0] == "3"
+
+
+def test_sqlite_backend_evicts_least_recently_used(tmp_path, clock):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    for key in "abc":
+        backend.set(key, key.upper())
+    backend.get("a")  # "b" is now the least recently used
+
+    backend.set("d", "D")
+
+    assert backend.get("b") is None
+    assert [backend.get(key)[0] for key in "acd"] == ["A", "C", "D"]
+    (count,) = backend._connection.execute(
+        "SELECT COUNT(*) FROM completions"
+    ).fetchone()
+    assert count == 3
+
+
+def test_sqlite_backend_keeps_entries_across_connections(tmp_path):
+    path = str(tmp_path / "nested" / "cache.sqlite3")
+    SQLiteBackend(path).set("a", "A")
+
+    assert SQLiteBackend(path).get("a")[0] == "A"
+
+
+def _age_files(directory, seconds):
+    """Moves every cache file's modification time `seconds` into the past."""
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            mtime = os.path.getmtime(path) - seconds
+            os.utime(path, (mtime, mtime))
+
+
+def test_filesystem_backend_counts_entries(tmp_path):
+    directory = str(tmp_path / "cache")
+    backend = FilesystemBackend(directory, max_entries=100)
+
+    backend.set("aa1", "1")
+    backend.set("aa2", "2")
+    backend.set("bb1", "3")
+    backend.set("aa1", "updated")  # Replacing an entry does not add one
+    assert backend._count == 3
+
+    backend.delete("bb1")
+    backend.delete("bb1")
+    assert backend._count == 2
+
+    # A new instance counts the files already on disk
+    assert FilesystemBackend(directory)._count == 2
+    assert not [
+        name for _, _, files in os.walk(directory) for name in files if ".tmp" in name
+    ]
+
+
+def test_filesystem_backend_evicts_least_recently_used(tmp_path):
+    directory = str(tmp_path / "cache")
+    backend = FilesystemBackend(directory, max_entries=10)
+    keys = [f"{i:02}key" for i in range(10)]
+    for key in keys:
+        backend.set(key, key)
+        _age_files(directory, 10)  # Older entries end up further in the past
+    backend.get(keys[0])  # Refreshes the oldest entry
+
+    backend.set("new-key", "new")
+
+    # Eviction leaves 10% headroom: 9 of the 11 entries are kept
+    assert backend._count == 9
+    assert backend.get(keys[0])[0] == keys[0]
+    assert backend.get("new-key")[0] == "new"
+    assert backend.get(keys[1]) is None and backend.get(keys[2]) is None
+    assert all(backend.get(key) is not None for key in keys[3:])
+    assert len(backend._list_entries()) == 9
+
+
+def test_filesystem_backend_ignores_corrupt_files(tmp_path):
+    backend = FilesystemBackend(str(tmp_path / "cache"))
+    backend.set("abc", "value")
+    with open(backend._path("abc"), "w", encoding="utf-8") as f:
+        f.write("{not json")
+
+    assert backend.get("abc") is None
+
+
+def test_create_backend_rejects_unknown_names(tmp_path):
+    with pytest.raises(ValueError):
+        create_backend("redis", str(tmp_path / "cache"))
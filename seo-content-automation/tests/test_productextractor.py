@@ -0,0 +1,179 @@
+import os
+
+import pytest
+from lxml import etree
+
+import productextractor
+from productextractor import (
+    ProductExtractor,
+    benchmark,
+    css_to_xpath,
+    extract_json_ld_product,
+    load_corpus,
+    load_profiles,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+CORPUS = os.path.join(FIXTURES, "products")
+PROFILES = os.path.join(FIXTURES, "extraction_profiles.json")
+
+EXPECTED = {
+    "https://example.com/classic.html": {
+        "name": "Remote Power Switch RPS-8",
+        "product_description": "Eight-outlet remote power switch with per-outlet metering.",
+        "main_image": "https://example.com/img/rps-8.png",
+        "weight": "1.2 kg",
+        "search_keywords": "remote power switch, pdu, outlet metering",
+    },
+    "https://example.com/missing-weight.html": {
+        "name": "Power Monitor PM-1",
+        "product_description": "Single-phase power monitor with cloud dashboard.",
+        "main_image": "https://cdn.example.com/pm-1.jpg",
+        "weight": None,
+        "search_keywords": None,
+    },
+    "https://shop.example.com/json-ld.html": {
+        "name": "LTE Router LX-200",
+        "product_description": "Dual-SIM LTE router with failover & VPN for remote sites.",
+        "main_image": "https://shop.example.com/images/lx-200.jpg",
+        "weight": "0.8 kg",
+        "search_keywords": "lte router, dual sim router, failover",
+    },
+    "https://widgets.example.org/custom-markup.html": {
+        "name": "Widget Controller WC-3",
+        "product_description": "Controls up to three widgets over Modbus.",
+        "main_image": "https://widgets.example.org/media/wc-3.webp",
+        "weight": "350 g",
+        "search_keywords": None,
+    },
+}
+
+
+@pytest.fixture
+def pages():
+    return load_corpus(CORPUS)
+
+
+@pytest.fixture
+def extractor():
+    return ProductExtractor(load_profiles(PROFILES))
+
+
+@pytest.fixture(params=["lxml", "bs4"])
+def parser(request, monkeypatch):
+    if request.param == "bs4":
+        # Without lxml, only CSS rules run, on a BeautifulSoup tree
+        monkeypatch.setattr(productextractor, "etree", None)
+    return request.param
+
+
+def test_load_corpus_maps_directories_to_domains(pages):
+    assert [url for url, _ in pages] == sorted(EXPECTED)
+    assert all(isinstance(page, bytes) for _, page in pages)
+
+
+def test_profiles_extract_every_fixture(pages, parser):
+    extractor = ProductExtractor(load_profiles(PROFILES))
+
+    for url, page in pages:
+        details = extractor.extract(page, url)
+        expected = dict(EXPECTED[url])
+        if parser == "bs4" and url.startswith("https://widgets."):
+            expected["weight"] = None  # Its profile rule is XPath only
+        del details["product_link"]
+        assert details == expected, url
+
+
+def test_profiles_apply_to_subdomains(pages):
+    extractor = ProductExtractor(
+        {"example.com": {"name": [{"css": "p > span.weight"}]}}
+    )
+    page = dict(pages)["https://example.com/classic.html"]
+
+    assert extractor.extract(page, "https://www.example.com/a")["name"] == "1.2 kg"
+    assert extractor.extract(page, "https://shop.example.com/a")["name"] == "1.2 kg"
+    assert extractor.extract(page, "https://example.org/a")["name"] == (
+        "Remote Power Switch RPS-8"
+    )
+
+
+def test_json_ld_is_read_without_parsing_html(pages):
+    page = dict(pages)["https://shop.example.com/json-ld.html"]
+
+    fields = extract_json_ld_product(page)
+
+    assert fields["name"] == "LTE Router LX-200"
+    assert fields["main_image"] == "/images/lx-200.jpg"
+    assert (
+        extract_json_ld_product(dict(pages)["https://example.com/classic.html"]) == {}
+    )
+
+
+def _matches(xpath, page):
+    tree = etree.HTML(page)
+    return [etree.tostring(element) for element in tree.xpath(xpath)]
+
+
+@pytest.mark.parametrize(
+    "selector, count",
+    [
+        ("h1", 1),
+        ("span.weight", 1),
+        ('meta[name="description"]', 1),
+        ("meta[name='keywords']", 1),
+        ("div#main > h1", 1),
+        ("div#main h1", 1),
+        ("body > h1", 0),
+        ("img[alt]", 1),
+        ("[src]", 1),
+        ("*#main > p > span.weight", 1),
+    ],
+)
+def test_css_to_xpath_fallback(selector, count, monkeypatch, pages):
+    monkeypatch.setattr(productextractor, "GenericTranslator", None)
+    page = dict(pages)["https://example.com/classic.html"]
+
+    assert len(_matches(css_to_xpath(selector), page)) == count
+
+
+def test_css_to_xpath_fallback_matches_compound_classes(monkeypatch, pages):
+    monkeypatch.setattr(productextractor, "GenericTranslator", None)
+    page = dict(pages)["https://widgets.example.org/custom-markup.html"]
+
+    assert len(_matches(css_to_xpath("img.hero.main"), page)) == 1
+    assert len(_matches(css_to_xpath("img.main.missing"), page)) == 0
+    assert len(_matches(css_to_xpath("div#summary > p"), page)) == 1
+    assert len(_matches(css_to_xpath("table.specs td.spec-weight"), page)) == 1
+
+
+@pytest.mark.parametrize("selector", ["a:hover", "li:nth-child(2)", "a + b", ""])
+def test_css_to_xpath_fallback_rejects_unsupported_selectors(selector, monkeypatch):
+    monkeypatch.setattr(productextractor, "GenericTranslator", None)
+
+    with pytest.raises(ValueError):
+        css_to_xpath(selector)
+
+
+def test_css_to_xpath_fallback_agrees_with_cssselect(monkeypatch, pages):
+    pytest.importorskip("cssselect")
+    selectors = ["span.weight", 'meta[name="description"]', "div#main > h1", "img[alt]"]
+    page = dict(pages)["https://example.com/classic.html"]
+    expected = [_matches(css_to_xpath(selector), page) for selector in selectors]
+
+    monkeypatch.setattr(productextractor, "GenericTranslator", None)
+
+    assert [_matches(css_to_xpath(selector), page) for selector in selectors] == (
+        expected
+    )
+
+
+def test_benchmark_compares_methods_on_the_corpus(pages, extractor):
+    results = {result["method"]: result for result in benchmark(pages, extractor, 1)}
+
+    assert set(results) == {"soup.find", "profiles"}
+    # Only the classic page has every element the soup.find chain expects
+    assert results["soup.find"]["success_rate"] == 0.25
+    assert results["soup.find"]["field_rate"] == 0.25
+    assert results["profiles"]["success_rate"] == 1.0
+    assert results["profiles"]["field_rate"] == 17 / 20
+    assert all(result["pages_per_second"] > 0 for result in results.values())
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+import llmclient
+import seocontentautomation
+from llmcache import LLMCache, MemoryBackend
+
+
+class _Response:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body or {}
+        self.text = json.dumps(self._body)
+
+    def json(self):
+        return self._body
+
+
+def _completion(content):
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+def _packed_completion(rewrites):
+    return _completion(json.dumps({"rewrites": rewrites}))
+
+
+class _FakeSession:
+    """Answers packed requests with every id except `drop`, after `rate_limited` 429s."""
+
+    def __init__(self, rate_limited=0, drop=()):
+        self.rate_limited = rate_limited
+        self.drop = set(drop)
+        self.requests = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.requests.append(json)
+        if self.rate_limited:
+            self.rate_limited -= 1
+            return _Response(429, {"error": "rate limited"}, {"Retry-After": "0"})
+        if "response_format" not in json:
+            return _Response(200, _completion("Single rewrite"))
+        count = json["max_tokens"] // seocontentautomation._REWRITE_MAX_TOKENS
+        rewrites = [
+            {"id": i, "description": f"Packed rewrite {i}"}
+            for i in range(count)
+            if i not in self.drop
+        ]
+        return _Response(200, _packed_completion(rewrites))
+
+
+@pytest.fixture
+def session(monkeypatch):
+    def install(**kwargs):
+        fake = _FakeSession(**kwargs)
+        monkeypatch.setattr(llmclient, "get_session", lambda: fake)
+        monkeypatch.setattr(llmclient.time, "sleep", lambda seconds: None)
+        return fake
+
+    return install
+
+
+def _rewrite(descriptions):
+    return seocontentautomation.rewrite_descriptions_with_highlights(
+        descriptions,
+        "rugged router",
+        api_key="test-key",
+        cache=LLMCache(MemoryBackend()),
+    )
+
+
+def test_short_descriptions_share_requests(session):
+    fake = session()
+
+    results = _rewrite([f"Router {i}" for i in range(10)])
+
+    assert results == [f"Packed rewrite {i}" for i in range(8)] + [
+        "Packed rewrite 0",
+        "Packed rewrite 1",
+    ]
+    assert len(fake.requests) == 2
+
+
+def test_missing_ids_are_retried_alone(session):
+    fake = session(drop={1})
+
+    results = _rewrite([f"Router {i}" for i in range(3)])
+
+    assert results == ["Packed rewrite 0", "Single rewrite", "Packed rewrite 2"]
+    assert len(fake.requests) == 2
+
+
+def test_rate_limited_pack_is_retried_as_a_whole(session):
+    fake = session(rate_limited=2)
+
+    results = _rewrite([f"Router {i}" for i in range(8)])
+
+    assert results == [f"Packed rewrite {i}" for i in range(8)]
+    # Two 429s and one success, not one request per description
+    assert len(fake.requests) == 3
+    assert all("response_format" in request for request in fake.requests)
+
+
+def test_failed_pack_is_not_split(session):
+    fake = session(rate_limited=100)
+
+    results = _rewrite([f"Router {i}" for i in range(4)])
+
+    assert results == [None] * 4
+    assert len(fake.requests) == llmclient._DEFAULT_MAX_RETRIES + 1
@@ -0,0 +1,76 @@
+import json
+import threading
+
+import pytest
+
+import seopipeline
+
+
+class _MemoryIndex:
+    def lookup(self, url, product_text):
+        return None
+
+    def store(self, url, product_text, content):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fake_services(monkeypatch):
+    monkeypatch.setattr(seopipeline, "create_google_ads_client", lambda: None)
+    monkeypatch.setattr(
+        seopipeline, "fetch_keyword_ideas", lambda client, customer_id: ["router"]
+    )
+    monkeypatch.setattr(
+        seopipeline,
+        "fetch_product_details",
+        lambda url: {"product_description": f"About {url}"},
+    )
+    monkeypatch.setattr(
+        seopipeline,
+        "rewrite_descriptions_with_highlights",
+        lambda descriptions, keywords: [f"{d} ({keywords})" for d in descriptions],
+    )
+
+
+def _run_with_timeout(*args, **kwargs):
+    """Runs the pipeline on a thread so a hang fails the test instead of blocking it."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["summary"] = seopipeline.run_pipeline(*args, **kwargs)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), "run_pipeline did not finish"
+    return outcome
+
+
+def test_run_pipeline_writes_every_url(tmp_path):
+    output_path = tmp_path / "products.jsonl"
+    urls = [f"https://example.com/p/{i}" for i in range(20)]
+
+    outcome = _run_with_timeout(urls, str(output_path), content_index=_MemoryIndex())
+
+    assert outcome["summary"] == {"written": 20, "failed": 0, "skipped": 0}
+    assert seopipeline.load_checkpoint(str(output_path)) == set(urls)
+
+
+def test_run_pipeline_raises_when_reading_urls_fails(tmp_path):
+    output_path = tmp_path / "products.jsonl"
+
+    def urls():
+        yield "https://example.com/p/1"
+        raise OSError("Sitemap download failed")
+
+    outcome = _run_with_timeout(urls(), str(output_path), content_index=_MemoryIndex())
+
+    assert isinstance(outcome["error"], OSError)
+    # The URL read before the failure is still written and checkpointed
+    with open(output_path, encoding="utf-8") as f:
+        assert [json.loads(line)["product_link"] for line in f] == [
+            "https://example.com/p/1"
+        ]